@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+"""
+Measures the time needed to import the module used by the command line
+interface using python -X importtime and checks it against a budget.
+
+    python3 benchmarks/import_time.py [--budget MS] [--repeat N]
+
+Exits with a non-zero status if the import takes longer than the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULE = "diffkemp_htmlgen.htmlgen"
+
+
+def measure_import() -> Tuple[int, Dict[str, int]]:
+    """
+    Imports the module in a new interpreter and returns its cumulative import
+    time and the cumulative import times of the modules imported directly by
+    it (all in microseconds).
+    """
+    env = dict(os.environ)
+    # Byte-compiled files are used in regular installations.
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             "import " + MODULE],
+                            cwd=os.path.join(os.path.dirname(__file__), ".."),
+                            env=env, stderr=subprocess.PIPE,
+                            check=True).stderr.decode()
+
+    total = 0
+    children: Dict[str, int] = dict()
+    pending: List[Tuple[str, int]] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Modules are listed after their imports, the ones imported directly
+        # by the measured module are indented by exactly one more level.
+        if name.strip() == MODULE:
+            total = int(cumulative)
+            for child, time in pending:
+                children[child] = time
+            pending = []
+        elif name.startswith("   ") and not name.startswith("    "):
+            pending.append((name.strip(), int(cumulative)))
+        elif not name.startswith("  "):
+            pending = []
+    return total, children
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Checks the import time " +
+                                     "of " + MODULE + " against a budget.")
+    parser.add_argument("--budget", type=float, default=60.0,
+                        help="import time budget in milliseconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # The first run writes byte-compiled files.
+    measure_import()
+    total, children = min((measure_import() for _ in range(args.repeat)),
+                          key=lambda result: result[0])
+
+    for name, time in sorted(children.items(), key=lambda child: -child[1]):
+        print("{:30} {:8.1f} ms".format(name, time / 1000))
+    print("{:30} {:8.1f} ms (budget {:.1f} ms)".format(MODULE, total / 1000,
+                                                       args.budget))
+    if total / 1000 > args.budget:
+        sys.exit("error: import time exceeds the budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#! /usr/bin/env python3
+"""
+Measures the per-row cost of rendering graphical diffs and callstacks.
+
+The rows are rendered both by the current HTMLGenerator and by the original
+implementation that entered yattag's context managers for every element.
+Callstacks of both are checked to be identical, diffs to have the same rows
+(the current one renders line numbers and markers in separate cells). With
+--highlight-syntax, the numbers of characters passed to Pygments are printed.
+
+    python3 benchmarks/row_rendering.py [--rows N] [--highlight-syntax]
+"""
+import argparse
+import os
+import sys
+import timeit
+from functools import lru_cache
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from diffkemp_htmlgen.htmlgen import Call, Diff, HTMLGenerator, Location  # noqa
+from yattag import Doc  # type: ignore # noqa
+
+
+def make_diff(rows: int) -> str:
+    """Generates a context diff with the given number of rows."""
+    lines_left = []
+    lines_right = []
+    for i in range(rows):
+        if i % 3 == 0:
+            lines_left.append("!     x = kmalloc(size, flags & GFP_DMA);")
+            lines_right.append("!     x = kmalloc(size, flags);")
+        else:
+            lines_left.append("      if (x < SIZE && y > 0) {")
+            lines_right.append("      if (x < SIZE && y > 0) {")
+    return "\n".join(["*************** kmalloc_node",
+                      "*** 1,{} ***".format(rows)] + lines_left +
+                     ["--- 1,{} ---".format(rows)] + lines_right)
+
+
+def make_callstack(rows: int) -> List[Call]:
+    """Generates a callstack with the given number of calls."""
+    return [Call("function_{}".format(i),
+                 Location("include/linux/slab.h", i))
+            for i in range(rows)]
+
+
+def legacy_diff_to_html(htmlgen: HTMLGenerator, diff_str: str) -> None:
+    """
+    The original implementation of HTMLGenerator._diff_to_html, limited to
+    the kinds of rows generated by make_diff.
+    """
+    tag = htmlgen.tag
+
+    def format(line: int) -> str:
+        return "{:4}".format(line)
+
+    with tag("table", klass="table diff-table"):
+        diff = Diff(diff_str)
+        for fragment in diff.fragments:
+            with tag("tr"):
+                with tag("td", klass="heading", colspan="2"):
+                    htmlgen._format_source(fragment.function_name)
+            index_left = 0
+            index_right = 0
+            while (index_left < len(fragment.lines_left) or
+                   index_right < len(fragment.lines_right)):
+                line_idx_left = fragment.start_line_left + index_left
+                line_idx_right = fragment.start_line_right + index_right
+                line_left = (fragment.lines_left[index_left]
+                             if index_left < len(fragment.lines_left) else "")
+                line_right = (fragment.lines_right[index_right]
+                              if index_right < len(fragment.lines_right)
+                              else "")
+                if line_left.startswith("!") and line_right.startswith("!"):
+                    with tag("tr"):
+                        with tag("td", klass="line removed"):
+                            htmlgen._format_source(" " +
+                                                   format(line_idx_left) +
+                                                   " - " + line_left[1:])
+                        with tag("td", klass="line added"):
+                            htmlgen._format_source(" " +
+                                                   format(line_idx_right) +
+                                                   " + " + line_right[1:])
+                    index_left += 1
+                    index_right += 1
+                    continue
+                with tag("tr"):
+                    with tag("td", klass="line"):
+                        htmlgen._format_source(" " + format(line_idx_left) +
+                                               "  " + line_left)
+                    with tag("td", klass="line"):
+                        htmlgen._format_source(" " + format(line_idx_right) +
+                                               "  " + line_right)
+                index_left += 1
+                index_right += 1
+
+
+def legacy_callstack_to_html(htmlgen: HTMLGenerator,
+                             callstack: List[Call]) -> None:
+    """The original implementation of HTMLGenerator._callstack_to_html."""
+    tag, text = htmlgen.tag, htmlgen.text
+    with tag("ul"):
+        for call in callstack:
+            with tag("li"):
+                text(call.symbol_name + " at " + str(call.location))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks rendering of " +
+                                     "diff and callstack rows.")
+    parser.add_argument("--rows", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--highlight-syntax", action="store_true")
+    args = parser.parse_args()
+
+    htmlgen = HTMLGenerator("", "", graphical_diff=True,
+                            highlight_syntax=args.highlight_syntax)
+    diff_str = make_diff(args.rows)
+    callstack = make_callstack(args.rows)
+
+    def render(function, *function_args):  # type: ignore
+        htmlgen.doc, htmlgen.tag, htmlgen.text = Doc().tagtext()
+        function(*function_args)
+        return htmlgen.doc.getvalue()
+
+    def same_rows(before: str, after: str) -> bool:
+        return before.count("<tr>") == after.count("<tr>")
+
+    def same(before: str, after: str) -> bool:
+        return before == after
+
+    cases: List[tuple] = [
+        ("diff rows", (legacy_diff_to_html, htmlgen, diff_str),
+         (htmlgen._diff_to_html, diff_str), same_rows),
+        ("callstack rows", (legacy_callstack_to_html, htmlgen, callstack),
+         (htmlgen._callstack_to_html, callstack), same),
+    ]
+    for name, before, after, check in cases:
+        if not check(render(*before), render(*after)):
+            sys.exit("error: {} differ between implementations".format(name))
+        times = []
+        for case in (before, after):
+            best = min(timeit.repeat(lambda: render(*case), number=1,
+                                     repeat=args.repeat))
+            times.append(best / args.rows * 1e6)
+        print("{:15} before: {:8.2f} us/row  after: {:8.2f} us/row  "
+              "({:.1f}x)".format(name, times[0], times[1],
+                                 times[0] / times[1]))
+
+    if args.highlight_syntax:
+        highlighted = []
+        for function, *function_args in [cases[0][1], cases[0][2]]:
+            sizes: List[int] = []
+            highlight: Callable[[str], str] = htmlgen._highlight_uncached
+
+            def counting_highlight(text: str) -> str:
+                sizes.append(len(text))
+                return highlight(text)
+            htmlgen._highlight = lru_cache(maxsize=None)(counting_highlight)
+            render(function, *function_args)
+            highlighted.append(sum(sizes))
+        print("{:15} before: {:8} chars   after: {:8} chars".format(
+            "Pygments input", *highlighted))
+
+
+if __name__ == "__main__":
+    main()
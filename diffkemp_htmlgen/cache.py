@@ -0,0 +1,194 @@
+import gc
+import os
+import struct
+from array import array
+from diffkemp_htmlgen.htmlgen import (Affection, Call, ExternalSymbol,
+                                      InternalSymbol, Location)
+from diffkemp_htmlgen.scan import ScannedDifference
+from typing import (Dict, Generic, Hashable, Iterator, List, Tuple,
+                    TypeVar)
+
+# The cache starts with the magic bytes and the version of the format, which
+# must be increased whenever the format or the cached classes change,
+# followed by a reserved field, the number of strings, the number of calls
+# and the number of integers.
+magic = b"DKHTMLGC"
+version = 1
+header_format = "<8sIIQQQ"
+digest_size = 16
+
+
+class CacheEntry:
+    """
+    Represents a cached scanned result with the modification time and size
+    of its file, which are used to decide whether it is still valid.
+    """
+    def __init__(self, filename: str, mtime_ns: int, size: int,
+                 difference: ScannedDifference):
+        self.filename = filename
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.difference = difference
+
+    def is_valid(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+
+K = TypeVar("K", bound=Hashable)
+
+
+class _Table(Generic[K]):
+    """Table of values, each of which is stored only once."""
+    def __init__(self) -> None:
+        self.index: Dict[K, int] = dict()
+        self.values: List[K] = []
+
+    def __call__(self, value: K) -> int:
+        index = self.index.get(value)
+        if index is None:
+            index = len(self.values)
+            self.index[value] = index
+            self.values.append(value)
+        return index
+
+
+def write_cache(path: str, entries: List[CacheEntry]) -> None:
+    """
+    Writes the entries into a cache file. All numbers are stored in a single
+    array of 64-bit integers, strings and calls are referenced by their
+    indices into tables, in which each of them is stored once.
+    """
+    strings: _Table[str] = _Table()
+    calls: _Table[Tuple[int, int, int]] = _Table()
+    numbers = array("q")
+    digests = bytearray()
+
+    def add_calls(callstack: List[Call]) -> None:
+        numbers.append(len(callstack))
+        numbers.extend(calls((strings(call.symbol_name),
+                              strings(call.location.filename),
+                              call.location.line))
+                       for call in callstack)
+
+    for entry in entries:
+        difference = entry.difference
+        numbers.extend([
+            strings(entry.filename), entry.mtime_ns, entry.size,
+            strings(difference.symbol_old.name),
+            int(difference.symbol_old.kind),
+            strings(difference.symbol_old.location.filename),
+            difference.symbol_old.location.line,
+            strings(difference.symbol_new.location.filename),
+            difference.symbol_new.location.line,
+            difference.diff_size(),
+            len(difference.affected_symbols)])
+        digests += difference.diff_digest()
+        for affection in difference.affected_symbols:
+            numbers.extend([strings(affection.symbol.name),
+                            int(affection.symbol.kind)])
+            add_calls(affection.callstack_old)
+            add_calls(affection.callstack_new)
+
+    encoded = [string.encode(errors="surrogatepass")
+               for string in strings.values]
+    lengths = array("q", map(len, encoded))
+    call_numbers = array("q", (number for call in calls.values
+                               for number in call))
+    # Write into a temporary file first, so that an interrupted run does not
+    # leave a broken cache behind.
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(struct.pack(header_format, magic, version, 0,
+                               len(encoded), len(calls.values),
+                               len(numbers)))
+        file.write(lengths.tobytes())
+        file.write(b"".join(encoded))
+        file.write(call_numbers.tobytes())
+        file.write(numbers.tobytes())
+        file.write(digests)
+    os.replace(temporary, path)
+
+
+def read_cache(path: str, directory: str) -> Dict[str, CacheEntry]:
+    """
+    Reads entries from a cache file, the scanned results refer to files in
+    the given directory. Returns no entries if the file does not exist or it
+    was written by an incompatible version.
+    """
+    # Lots of objects are created at once, do not let the garbage collector
+    # repeatedly traverse them.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as file:
+            content = file.read()
+        return _parse_cache(content, directory)
+    except (OSError, ValueError, IndexError, StopIteration, struct.error,
+            UnicodeDecodeError):
+        return dict()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _parse_cache(content: bytes, directory: str) -> Dict[str, CacheEntry]:
+    cache_magic, cache_version, _, string_count, call_count, number_count = \
+        struct.unpack_from(header_format, content)
+    if cache_magic != magic or cache_version != version:
+        raise ValueError("Incompatible cache")
+    offset = struct.calcsize(header_format)
+
+    lengths = array("q")
+    lengths.frombytes(content[offset:offset + 8 * string_count])
+    offset += 8 * string_count
+    strings = []
+    for length in lengths:
+        strings.append(content[offset:offset + length].decode(
+            errors="surrogatepass"))
+        offset += length
+    numbers = array("q")
+    numbers.frombytes(content[offset:offset + 8 * (3 * call_count +
+                                                   number_count)])
+    offset += 8 * (3 * call_count + number_count)
+    if len(numbers) != 3 * call_count + number_count:
+        raise ValueError("Truncated cache")
+
+    values: Iterator[int] = iter(numbers)
+    value = values.__next__
+    # Calls are shared by all callstacks containing them.
+    calls = [Call(strings[value()], Location(strings[value()], value()))
+             for _ in range(call_count)]
+    internal_kinds = list(InternalSymbol.Kind)
+    external_kinds = list(ExternalSymbol.Kind)
+
+    def read_calls() -> List[Call]:
+        return [calls[value()] for _ in range(value())]
+
+    entries = dict()
+    while offset < len(content):
+        filename = strings[value()]
+        mtime_ns, size = value(), value()
+        name = strings[value()]
+        kind = internal_kinds[value()]
+        location_old = Location(strings[value()], value())
+        location_new = Location(strings[value()], value())
+        diff_size = value()
+        affections = []
+        for _ in range(value()):
+            symbol = ExternalSymbol(strings[value()], external_kinds[value()])
+            callstack_old = read_calls()
+            affections.append(Affection(symbol, callstack_old, read_calls()))
+        digest = content[offset:offset + digest_size]
+        if len(digest) != digest_size:
+            raise ValueError("Truncated cache")
+        offset += digest_size
+
+        entries[filename] = CacheEntry(filename, mtime_ns, size,
+                                       ScannedDifference(
+                                           os.path.join(directory, filename),
+                                           InternalSymbol(name, kind,
+                                                          location_old),
+                                           InternalSymbol(name, kind,
+                                                          location_new),
+                                           affections, digest, diff_size))
+    return entries
@@ -0,0 +1,69 @@
+from diffkemp_htmlgen.htmlgen import Affection, Call, InternalSymbol
+from typing import Dict, Iterable, List, Tuple
+
+
+class CallGraph:
+    """
+    Represents callstacks leading from a KABI symbol to the internal symbols
+    affecting it merged into a single graph. Calls of the same symbol from
+    the same location are represented by a single node, so the size of the
+    graph grows with the number of unique calls rather than with the number
+    and depth of the callstacks.
+    """
+    def __init__(self) -> None:
+        # Calls of the nodes by their indices.
+        self.calls: List[Call] = []
+        self.node_index: Dict[Tuple[str, str, int], int] = dict()
+        # Indices of the nodes called by each node (dictionaries are used as
+        # ordered sets).
+        self.children: List[Dict[int, None]] = []
+        # Indices of the nodes called directly by the KABI symbol.
+        self.roots: Dict[int, None] = dict()
+        # Internal symbols whose callstacks end at each node.
+        self.targets: List[List[InternalSymbol]] = []
+        # Internal symbols with empty callstacks.
+        self.direct_targets: List[InternalSymbol] = []
+
+    @classmethod
+    def from_affections(cls, affections: Iterable[Affection],
+                        new: bool) -> 'CallGraph':
+        """
+        Merges the old or the new callstacks of affections whose symbols are
+        InternalSymbols.
+        """
+        graph = cls()
+        for affection in affections:
+            if not isinstance(affection.symbol, InternalSymbol):
+                raise ValueError("Affection not internal")
+            graph.add(affection.callstack_new if new
+                      else affection.callstack_old, affection.symbol)
+        return graph
+
+    def node(self, call: Call) -> int:
+        """Returns the index of the node of the call, creates it if needed."""
+        key = (call.symbol_name, call.location.filename, call.location.line)
+        index = self.node_index.get(key)
+        if index is None:
+            index = len(self.calls)
+            self.node_index[key] = index
+            self.calls.append(call)
+            self.children.append(dict())
+            self.targets.append([])
+        return index
+
+    def add(self, callstack: List[Call], target: InternalSymbol) -> None:
+        """Adds a callstack ending with a call of the target symbol."""
+        if not callstack:
+            self.direct_targets.append(target)
+            return
+        parent = self.node(callstack[0])
+        self.roots[parent] = None
+        for call in callstack[1:]:
+            index = self.node(call)
+            self.children[parent][index] = None
+            parent = index
+        self.targets[parent].append(target)
+
+    def __len__(self) -> int:
+        """Returns the number of nodes."""
+        return len(self.calls)
@@ -0,0 +1,214 @@
+import hashlib
+import os
+from diffkemp_htmlgen.filters import SymbolFilter
+from diffkemp_htmlgen.htmlgen import Difference, Failure, load_difference
+from diffkemp_htmlgen.scan import parse_header
+from enum import IntEnum
+from typing import List, Dict, Optional, Tuple
+
+
+class ResultFile:
+    """
+    Represents a YAML file generated by DiffKemp, identified by the symbol it
+    describes and by a hash of its content.
+    """
+    def __init__(self, path: str, symbol_name: str, digest: bytes,
+                 kind: str = "", filename: str = "", line: int = 0):
+        self.path = path
+        self.symbol_name = symbol_name
+        self.digest = digest
+        # Kind and old location of the symbol, which distinguish symbols with
+        # the same name (e.g. static functions in different files).
+        self.kind = kind
+        self.filename = filename
+        self.line = line
+
+    @classmethod
+    def from_file(cls, path: str) -> 'ResultFile':
+        with open(path, "rb") as file:
+            content = file.read()
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+
+        # Parse the file without the diff, which makes up most of it. Keys
+        # after the diff are parsed too if the symbol is described there.
+        header = parse_header(content, affections=False)
+        location = header["location-old"]
+        return cls(path, str(header["symbol"]), digest,
+                   str(header["diff-kind"]), str(location["file"]),
+                   int(location["line"]))
+
+    def load(self) -> Difference:
+        """Parses the file into a Difference object."""
+        return load_difference(self.path)
+
+
+class SymbolDelta:
+    """
+    Represents the change of the results for a single symbol between two runs
+    of DiffKemp.
+    """
+    class Status(IntEnum):
+        ADDED = 0
+        REMOVED = 1
+        CHANGED = 2
+        UNCHANGED = 3
+
+        def __str__(self) -> str:
+            dictionary = {
+                self.ADDED: "new",
+                self.REMOVED: "gone",
+                self.CHANGED: "changed",
+                self.UNCHANGED: "unchanged"
+            }
+            return dictionary[self]
+
+    def __init__(self, symbol_name: str, status: 'SymbolDelta.Status',
+                 changes: Optional[List[str]] = None,
+                 path: Optional[str] = None):
+        self.symbol_name = symbol_name
+        self.status = status
+        # Descriptions of what has changed (only for changed symbols).
+        self.changes = changes if changes is not None else []
+        # Path of the current result (None for symbols that are gone).
+        self.path = path
+
+
+ResultKey = Tuple[str, str, str, int]
+
+
+def scan_results(directory: str, failures: Optional[List[Failure]] = None,
+                 symbol_filter: Optional[SymbolFilter] = None)\
+        -> Dict[ResultKey, ResultFile]:
+    """
+    Hashes all YAML files in the given directory and returns them in a map
+    whose keys are the names, kinds and files of the symbols, so that
+    symbols with the same names (e.g. static functions in different files)
+    are compared separately. Lines are not part of the keys, so that moved
+    symbols are compared too. Symbols that are the same in all of these are
+    numbered in the order of their lines. If failures are given, files that
+    cannot be read are recorded there instead of raising an exception. If
+    a filter is given, only the selected symbols are returned.
+    """
+    results = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if symbol_filter and not symbol_filter.matches_file(path):
+            continue
+        try:
+            results.append(ResultFile.from_file(path))
+        except Exception as exception:
+            if failures is None:
+                raise
+            failures.append(Failure.from_exception(
+                path, Failure.Phase.PARSE, exception))
+    results.sort(key=lambda result: (result.symbol_name, result.kind,
+                                     result.filename, result.line))
+    keyed: Dict[ResultKey, ResultFile] = dict()
+    for result in results:
+        number = 0
+        while (result.symbol_name, result.kind, result.filename,
+               number) in keyed:
+            number += 1
+        keyed[(result.symbol_name, result.kind, result.filename,
+               number)] = result
+
+    return keyed
+
+
+def difference_changes(old: Difference, new: Difference) -> List[str]:
+    """Describes how the given differences of the same symbol differ."""
+    changes = []
+    if old.symbol_old.kind != new.symbol_old.kind:
+        changes.append("kind: {} -> {}".format(old.symbol_old.kind,
+                                               new.symbol_old.kind))
+    for side, symbol_old, symbol_new in [
+            ("old", old.symbol_old, new.symbol_old),
+            ("new", old.symbol_new, new.symbol_new)]:
+        if str(symbol_old.location) != str(symbol_new.location):
+            changes.append("{} location: {} -> {}".format(
+                side, symbol_old.location, symbol_new.location))
+    if old.diff != new.diff:
+        changes.append("diff")
+
+    def affections(difference: Difference) -> Dict[Tuple[str, str],
+                                                   Tuple[List[str],
+                                                         List[str]]]:
+        return {(aff.symbol.name, str(aff.symbol.kind)):
+                ([str(call.location) for call in aff.callstack_old],
+                 [str(call.location) for call in aff.callstack_new])
+                for aff in difference.affected_symbols}
+
+    affections_old = affections(old)
+    affections_new = affections(new)
+    for name, kind in sorted(affections_new.keys() - affections_old.keys()):
+        changes.append("newly affects {} {}".format(kind, name))
+    for name, kind in sorted(affections_old.keys() - affections_new.keys()):
+        changes.append("no longer affects {} {}".format(kind, name))
+    if any(affections_old[key] != affections_new[key]
+           for key in affections_old.keys() & affections_new.keys()):
+        changes.append("callstacks")
+
+    if not changes:
+        # The files differ only in formatting.
+        changes.append("formatting")
+    return changes
+
+
+def compare_results(old_dir: str, new_dir: str,
+                    new_differences: Optional[Dict[str, Difference]] = None,
+                    failures: Optional[List[Failure]] = None,
+                    symbol_filter: Optional[SymbolFilter] = None)\
+        -> List[SymbolDelta]:
+    """
+    Compares the results of DiffKemp in two directories. Symbols whose files
+    have the same content in both directories are not parsed at all. Already
+    parsed differences from the new directory can be passed in
+    new_differences (by the paths of their files) to avoid parsing them
+    again. If failures are given, files that cannot be parsed are recorded
+    there instead of raising an exception, changed symbols whose files
+    cannot be parsed are reported without details. If a filter is given,
+    only the selected symbols and their selected affections are compared.
+    """
+    old_results = scan_results(old_dir, failures, symbol_filter)
+    new_results = scan_results(new_dir, failures, symbol_filter)
+
+    def load(result: ResultFile) -> Difference:
+        difference = result.load()
+        if symbol_filter:
+            difference = symbol_filter.restrict(difference)
+        return difference
+
+    deltas = []
+    for key in sorted(old_results.keys() | new_results.keys()):
+        name = key[0]
+        old_result = old_results.get(key)
+        new_result = new_results.get(key)
+        if old_result is None:
+            deltas.append(SymbolDelta(name, SymbolDelta.Status.ADDED,
+                                      path=new_results[key].path))
+        elif new_result is None:
+            deltas.append(SymbolDelta(name, SymbolDelta.Status.REMOVED))
+        elif old_result.digest == new_result.digest:
+            deltas.append(SymbolDelta(name, SymbolDelta.Status.UNCHANGED,
+                                      path=new_result.path))
+        else:
+            # Path of the file being parsed, for reporting failures.
+            path = old_result.path
+            try:
+                old_difference = load(old_result)
+                path = new_result.path
+                if new_differences is not None and path in new_differences:
+                    new_difference = new_differences[path]
+                else:
+                    new_difference = load(new_result)
+                changes = difference_changes(old_difference, new_difference)
+            except Exception as exception:
+                if failures is None:
+                    raise
+                failures.append(Failure.from_exception(
+                    path, Failure.Phase.PARSE, exception))
+                changes = []
+            deltas.append(SymbolDelta(name, SymbolDelta.Status.CHANGED,
+                                      changes, new_result.path))
+
+    return deltas
@@ -27,6 +27,22 @@ htmlgen_css = """
 .diff-table td.line.empty {
     background-color: #f7f7f7;
 }
+
+.diff-table td.gutter {
+    padding: 0 .25rem;
+    border-top: none;
+    width: 1%;
+    color: #6c757d;
+    font-family: SFMono-Regular, Menlo, Monaco, Consolas, "Liberation Mono",
+        "Courier New", monospace;
+    font-size: 87.5%;
+    text-align: right;
+    white-space: pre;
+}
+
+.diff-table td.gutter::before {
+    content: attr(data-line) " " attr(data-marker);
+}
 """
 
 
@@ -35,3 +51,215 @@ htmlgen_css_maxwidth = """
     max-width: 1500px;
 }
 """
+
+
+# Subset of Bootstrap 4 covering the classes used by the generated pages. It is
+# used instead of the CDN version when assets are bundled.
+bootstrap_css = """
+*, ::after, ::before {
+    box-sizing: border-box;
+}
+
+body {
+    margin: 0;
+    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto,
+        "Helvetica Neue", Arial, sans-serif;
+    font-size: 1rem;
+    font-weight: 400;
+    line-height: 1.5;
+    color: #212529;
+    background-color: #fff;
+}
+
+h1, h2 {
+    margin-top: 0;
+    margin-bottom: .5rem;
+    font-weight: 500;
+    line-height: 1.2;
+}
+
+h1 {
+    font-size: 2.5rem;
+}
+
+h2 {
+    font-size: 2rem;
+}
+
+p, ul {
+    margin-top: 0;
+    margin-bottom: 1rem;
+}
+
+ul ul {
+    margin-bottom: 0;
+}
+
+a {
+    color: #007bff;
+    text-decoration: none;
+    background-color: transparent;
+}
+
+a:hover {
+    color: #0056b3;
+    text-decoration: underline;
+}
+
+pre {
+    margin-top: 0;
+    margin-bottom: 1rem;
+    overflow: auto;
+    font-family: SFMono-Regular, Menlo, Monaco, Consolas, "Liberation Mono",
+        "Courier New", monospace;
+    font-size: 87.5%;
+    color: #212529;
+}
+
+table {
+    border-collapse: collapse;
+}
+
+th {
+    text-align: inherit;
+}
+
+.container {
+    width: 100%;
+    padding-right: 15px;
+    padding-left: 15px;
+    margin-right: auto;
+    margin-left: auto;
+}
+
+@media (min-width: 576px) {
+    .container {
+        max-width: 540px;
+    }
+}
+
+@media (min-width: 768px) {
+    .container {
+        max-width: 720px;
+    }
+}
+
+@media (min-width: 992px) {
+    .container {
+        max-width: 960px;
+    }
+}
+
+@media (min-width: 1200px) {
+    .container {
+        max-width: 1140px;
+    }
+}
+
+.py-4 {
+    padding-top: 1.5rem !important;
+    padding-bottom: 1.5rem !important;
+}
+
+.table {
+    width: 100%;
+    margin-bottom: 1rem;
+    color: #212529;
+}
+
+.table td, .table th {
+    padding: .75rem;
+    vertical-align: top;
+    border-top: 1px solid #dee2e6;
+}
+
+.table thead th {
+    vertical-align: bottom;
+    border-bottom: 2px solid #dee2e6;
+}
+
+.form-control {
+    display: block;
+    width: 100%;
+    height: calc(1.5em + .75rem + 2px);
+    padding: .375rem .75rem;
+    margin: 0;
+    font-family: inherit;
+    font-size: 1rem;
+    font-weight: 400;
+    line-height: 1.5;
+    color: #495057;
+    background-color: #fff;
+    background-clip: padding-box;
+    border: 1px solid #ced4da;
+    border-radius: .25rem;
+    transition: border-color .15s ease-in-out, box-shadow .15s ease-in-out;
+}
+
+.form-control:focus {
+    color: #495057;
+    background-color: #fff;
+    border-color: #80bdff;
+    outline: 0;
+    box-shadow: 0 0 0 .2rem rgba(0, 123, 255, .25);
+}
+"""
+
+
+htmlgen_css_delta = """
+td.delta.new {
+    background-color: #e6ffed;
+}
+
+td.delta.gone {
+    background-color: #ffeef0;
+}
+
+td.delta.changed {
+    background-color: #fff5b1;
+}
+"""
+
+
+htmlgen_css_callstack_diff = """
+.callstack-table td {
+    padding: .10rem .75rem;
+    width: 50%;
+}
+
+.callstack-table tr.moved {
+    background-color: #f5f5f5;
+}
+
+.callstack-table tr.changed {
+    background-color: #fff5b1;
+}
+
+.callstack-table tr.removed td:first-child {
+    background-color: #ffeef0;
+}
+
+.callstack-table tr.added td:last-child {
+    background-color: #e6ffed;
+}
+"""
+
+
+htmlgen_css_views = """
+.view-switch + label {
+    margin: 0 1rem 0 .25rem;
+}
+
+.diff-view {
+    display: none;
+}
+"""
+
+
+# Shows the view of diffs whose switch is checked, formatted with the name of
+# the view.
+htmlgen_css_view_template = """
+#view-{0}:checked ~ .diff-views .view-{0} {{
+    display: block;
+}}
+"""
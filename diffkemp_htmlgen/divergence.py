@@ -0,0 +1,82 @@
+from difflib import SequenceMatcher
+from diffkemp_htmlgen.htmlgen import Call
+from enum import IntEnum
+from typing import List, Optional, Tuple
+
+
+class CallstackDivergence:
+    """
+    Represents the aligned difference between the old and the new callstack
+    of an affection. Calls are matched by the names of the called symbols,
+    since their locations usually move between versions.
+    """
+    class Status(IntEnum):
+        SAME = 0
+        MOVED = 1
+        CHANGED = 2
+        REMOVED = 3
+        ADDED = 4
+
+        def __str__(self) -> str:
+            dictionary = {
+                self.SAME: "same",
+                self.MOVED: "moved",
+                self.CHANGED: "changed",
+                self.REMOVED: "removed",
+                self.ADDED: "added"
+            }
+            return dictionary[self]
+
+    Row = Tuple['CallstackDivergence.Status', Optional[Call], Optional[Call]]
+
+    def __init__(self, callstack_old: List[Call], callstack_new: List[Call]):
+        # Aligned pairs of old and new calls with their statuses (one of the
+        # calls is None for removed and added calls).
+        self.rows: List[CallstackDivergence.Row] = []
+
+        names_old = [call.symbol_name for call in callstack_old]
+        names_new = [call.symbol_name for call in callstack_new]
+        # Stacks usually differ only in a few calls, so only the part between
+        # the common prefix and suffix is aligned using difflib.
+        shorter = min(len(names_old), len(names_new))
+        prefix = 0
+        while prefix < shorter and names_old[prefix] == names_new[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < shorter - prefix and
+               names_old[-1 - suffix] == names_new[-1 - suffix]):
+            suffix += 1
+        # Index of the first row in which the callstacks differ in symbols.
+        self.divergence: Optional[int] = None
+
+        self._add_same(callstack_old[:prefix], callstack_new[:prefix])
+        matcher = SequenceMatcher(
+            None, names_old[prefix:len(names_old) - suffix],
+            names_new[prefix:len(names_new) - suffix], autojunk=False)
+        for opcode, old_start, old_end, new_start, new_end \
+                in matcher.get_opcodes():
+            old = callstack_old[prefix + old_start:prefix + old_end]
+            new = callstack_new[prefix + new_start:prefix + new_end]
+            if opcode == "equal":
+                self._add_same(old, new)
+                continue
+            if self.divergence is None:
+                self.divergence = len(self.rows)
+            for index in range(max(len(old), len(new))):
+                if index >= len(new):
+                    self.rows.append((self.Status.REMOVED, old[index], None))
+                elif index >= len(old):
+                    self.rows.append((self.Status.ADDED, None, new[index]))
+                else:
+                    self.rows.append((self.Status.CHANGED, old[index],
+                                      new[index]))
+        self._add_same(callstack_old[len(callstack_old) - suffix:],
+                       callstack_new[len(callstack_new) - suffix:])
+
+    def _add_same(self, old: List[Call], new: List[Call]) -> None:
+        """Adds rows of calls of the same symbols."""
+        for call_old, call_new in zip(old, new):
+            moved = (call_old.location.filename != call_new.location.filename
+                     or call_old.location.line != call_new.location.line)
+            self.rows.append((self.Status.MOVED if moved else self.Status.SAME,
+                              call_old, call_new))
@@ -0,0 +1,68 @@
+import json
+from diffkemp_htmlgen.htmlgen import (Affection, Call, ExternalSymbol,
+                                      InternalSymbol)
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+
+def call_to_dict(call: Call) -> Dict[str, Any]:
+    """Converts a Call object into a dictionary in DiffKemp's YAML format."""
+    return {
+        "symbol": call.symbol_name,
+        "file": call.location.filename,
+        "line": call.location.line
+    }
+
+
+def affection_to_dict(affection: Affection) -> Dict[str, Any]:
+    """
+    Converts an Affection object whose symbol is an InternalSymbol into
+    a dictionary.
+    """
+    if not isinstance(affection.symbol, InternalSymbol):
+        raise ValueError("Affection not internal")
+
+    return {
+        "symbol": affection.symbol.name,
+        "kind": str(affection.symbol.kind),
+        "location": {
+            "file": affection.symbol.location.filename,
+            "line": affection.symbol.location.line
+        },
+        "callstack-old": [call_to_dict(call)
+                          for call in affection.callstack_old],
+        "callstack-new": [call_to_dict(call)
+                          for call in affection.callstack_new]
+    }
+
+
+def external_symbol_records(
+        external_symbols: Iterable[Tuple[ExternalSymbol, List[Affection]]])\
+        -> Iterator[Dict[str, Any]]:
+    """
+    Generates one record for each KABI symbol containing the internal symbols
+    affecting it (as collected by HTMLGenerator._collect_external_symbols).
+    """
+    for symbol, affections in external_symbols:
+        yield {
+            "symbol": symbol.name,
+            "kind": str(symbol.kind),
+            "affected-by": [affection_to_dict(affection)
+                            for affection in affections]
+        }
+
+
+def write_ndjson(
+        external_symbols: Iterable[Tuple[ExternalSymbol, List[Affection]]],
+        stream: TextIO) -> int:
+    """
+    Writes KABI symbols with the internal symbols affecting them into the
+    stream as newline-delimited JSON, one record per line. Records are
+    serialized and written one by one. Returns the number of records.
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    count = 0
+    for record in external_symbol_records(external_symbols):
+        stream.write(encoder.encode(record))
+        stream.write("\n")
+        count += 1
+    return count
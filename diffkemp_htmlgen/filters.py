@@ -0,0 +1,105 @@
+import copy
+import re
+from diffkemp_htmlgen.htmlgen import Difference, InternalSymbol
+from diffkemp_htmlgen.scan import read_header
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+class SymbolFilter:
+    """
+    Selects the differences to process by the names, kinds and locations of
+    their symbols and by the KABI symbols affected by them. A difference is
+    selected if it matches all given criteria and any of the values given
+    for each of them.
+    """
+    def __init__(self, names: Optional[Iterable[str]] = None,
+                 name_regex: Optional[str] = None,
+                 path_prefixes: Optional[Iterable[str]] = None,
+                 kinds: Optional[Iterable[InternalSymbol.Kind]] = None,
+                 kabi_symbols: Optional[Iterable[str]] = None):
+        # Glob patterns of symbol names.
+        self.names = list(names or [])
+        self.name_regex = (re.compile(name_regex) if name_regex is not None
+                           else None)
+        # Prefixes of the files in which the symbols are defined.
+        self.path_prefixes = tuple(path_prefixes or [])
+        self.kinds: Set[InternalSymbol.Kind] = set(kinds or [])
+        # Names of KABI symbols, only affections of them are kept.
+        self.kabi_symbols: Set[str] = set(kabi_symbols or [])
+
+    def __bool__(self) -> bool:
+        """Returns whether any criterion is given."""
+        return bool(self.names or self.name_regex or self.path_prefixes or
+                    self.kinds or self.kabi_symbols)
+
+    def matches_name(self, name: str) -> bool:
+        if self.names and not any(fnmatchcase(name, pattern)
+                                  for pattern in self.names):
+            return False
+        return self.name_regex is None or \
+            self.name_regex.search(name) is not None
+
+    def matches_header(self, header: Dict[str, Any]) -> bool:
+        """
+        Decides whether a difference is selected using the fields of a YAML
+        file generated by DiffKemp (the diff is not needed).
+        """
+        if not self.matches_name(str(header["symbol"])):
+            return False
+        if self.kinds and InternalSymbol.Kind.from_yaml(
+                header["diff-kind"]) not in self.kinds:
+            return False
+        if self.path_prefixes and not any(
+                str(header[key]["file"]).startswith(self.path_prefixes)
+                for key in ["location-old", "location-new"]):
+            return False
+        if self.kabi_symbols and not any(
+                affection["symbol"]["name"] in self.kabi_symbols
+                for affection in header["affected-symbols"] or []):
+            return False
+        return True
+
+    def matches_difference(self, difference: Difference) -> bool:
+        """Decides whether an already parsed difference is selected."""
+        symbol = difference.symbol_old
+        if not self.matches_name(symbol.name):
+            return False
+        if self.kinds and symbol.kind not in self.kinds:
+            return False
+        if self.path_prefixes and not any(
+                location.filename.startswith(self.path_prefixes)
+                for location in [symbol.location,
+                                 difference.symbol_new.location]):
+            return False
+        if self.kabi_symbols and not any(
+                affection.symbol.name in self.kabi_symbols
+                for affection in difference.affected_symbols):
+            return False
+        return True
+
+    def matches_file(self, path: str) -> bool:
+        """
+        Decides whether the difference in a YAML file is selected without
+        parsing its diff. Files that cannot be read are selected, so that
+        they are reported when they are parsed.
+        """
+        try:
+            # Affected symbols are parsed only if they are needed.
+            return self.matches_header(read_header(
+                path, affections=bool(self.kabi_symbols)))
+        except Exception:
+            return True
+
+    def restrict(self, difference: Difference) -> Difference:
+        """
+        Returns the difference without affections of KABI symbols that are
+        not selected. The given difference is not modified, a shallow copy is
+        returned if any affections are removed.
+        """
+        if self.kabi_symbols:
+            difference = copy.copy(difference)
+            difference.affected_symbols = [
+                affection for affection in difference.affected_symbols
+                if affection.symbol.name in self.kabi_symbols]
+        return difference
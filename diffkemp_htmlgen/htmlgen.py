@@ -1,13 +1,32 @@
 import argparse
+import hashlib
 import os
-import yaml
-from diffkemp_htmlgen import css
+import re
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from diffkemp_htmlgen import css, js
+from diffkemp_htmlgen.output import OutputWriter
+from diffkemp_htmlgen.pages import PageNames
 from enum import IntEnum
-from typing import List, Dict, Any, Union, Optional
-from pygments import highlight, lexers  # type: ignore
-from pygments.formatters.html import HtmlFormatter  # type: ignore
+from functools import lru_cache
+from html import escape
+from typing import (List, Dict, Any, Callable, Iterable, Iterator, Pattern,
+                    Set, Tuple, TypeVar, Union, Optional, TextIO,
+                    TYPE_CHECKING)
 from yattag import Doc, indent  # type: ignore
 
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from diffkemp_htmlgen.callgraph import CallGraph
+    from diffkemp_htmlgen.compare import SymbolDelta
+    from diffkemp_htmlgen.divergence import CallstackDivergence
+    from diffkemp_htmlgen.filters import SymbolFilter
+    from diffkemp_htmlgen.impact import ImpactStatistics
+    from diffkemp_htmlgen.search import SearchIndex
+    from diffkemp_htmlgen.sources import SourceTree
+
 
 class Location:
     """Represents a line in a specific file in the kernel source code."""
@@ -109,7 +128,7 @@ class ExternalSymbol:
         return self.name == other.name and self.kind == other.kind
 
     def __hash__(self) -> int:
-        return hash(self.name) ^ hash(str(self.kind))
+        return hash((self.name, int(self.kind)))
 
     @classmethod
     def from_yaml(cls, yaml: Dict[str, Any]) -> 'ExternalSymbol':
@@ -149,6 +168,19 @@ class Difference:
 
         return cls(symbol_old, symbol_new, diff, affected_symbols)
 
+    def diff_digest(self) -> bytes:
+        """Returns a hash identifying the diff."""
+        return diff_digest(self.diff.strip())
+
+    def diff_size(self) -> int:
+        """Returns the length of the diff."""
+        return len(self.diff)
+
+
+def diff_digest(diff: str) -> bytes:
+    """Returns a hash identifying a diff."""
+    return hashlib.blake2b(diff.encode(), digest_size=16).digest()
+
 
 class Call:
     """
@@ -190,6 +222,34 @@ class Affection:
 
 class Diff:
     """Represents a source code difference."""
+    class Lines:
+        """
+        Represents lines of one side of a diff fragment. The lines are stored
+        as offsets into the diff text, which takes a fraction of the memory
+        needed for separate strings.
+        """
+        def __init__(self, text: str):
+            self.text = text
+            # Start and end offsets of the lines.
+            self.bounds = array("Q")
+
+        def append(self, start: int, end: int) -> None:
+            self.bounds.append(start)
+            self.bounds.append(end)
+
+        def __len__(self) -> int:
+            return len(self.bounds) // 2
+
+        def __getitem__(self, index: int) -> str:
+            if not 0 <= index < len(self):
+                raise IndexError("line index out of range")
+            return self.text[self.bounds[2 * index]:
+                             self.bounds[2 * index + 1]]
+
+        def __iter__(self) -> Iterator[str]:
+            for index in range(len(self)):
+                yield self[index]
+
     class Fragment:
         """
         Represents a diff fragment, i.e. a continuous section of corresponding
@@ -197,27 +257,45 @@ class Diff:
         """
         def __init__(self, function_name: str,
                      start_line_left: int = -1,
-                     start_line_right: int = -1):
+                     start_line_right: int = -1,
+                     text: str = ""):
             self.function_name = function_name
             self.start_line_left = start_line_left
             self.start_line_right = start_line_right
-            self.lines_left: List[str] = []
-            self.lines_right: List[str] = []
+            self.lines_left = Diff.Lines(text)
+            self.lines_right = Diff.Lines(text)
 
     def __init__(self, input: str):
-        lines = input.split("\n")
+        self.fragments: List['Diff.Fragment'] = list(
+            self.iter_fragments(input))
+
+    @staticmethod
+    def iter_fragments(input: str) -> Iterator['Diff.Fragment']:
+        """
+        Parses the diff lazily, yielding fragments one by one as they are
+        completed. Lines of the input are not split all at once.
+        """
         current_fragment = None
         state: Optional[str] = None
-        self.fragments: List['Diff.Fragment'] = []
-
-        for line in lines:
+        offset = 0
+        position = 0
+
+        while position <= len(input):
+            line_end = input.find("\n", position)
+            if line_end == -1:
+                line_end = len(input)
+            line_start = position
+            position = line_end + 1
+            line = input[line_start:line_end]
             sline = line.lstrip()
 
             if sline.startswith("*************** "):
                 # New fragment.
+                if current_fragment is not None:
+                    yield current_fragment
                 current_fragment = Diff.Fragment(
-                    sline[len("*************** "):])
-                self.fragments.append(current_fragment)
+                    sline[len("*************** "):], text=input)
+                state = None
                 continue
 
             if current_fragment is None:
@@ -244,10 +322,85 @@ class Diff:
             if state is None:
                 raise ValueError("Invalid diff format")
 
+            start = min(line_start + offset, line_end)
             if state == "left_line":
-                current_fragment.lines_left.append(line[offset:])
+                current_fragment.lines_left.append(start, line_end)
             if state == "right_line":
-                current_fragment.lines_right.append(line[offset:])
+                current_fragment.lines_right.append(start, line_end)
+
+        if current_fragment is not None:
+            yield current_fragment
+
+
+class Failure:
+    """
+    Represents a failure to process a single input file, which is recorded
+    instead of aborting the whole run when the generator is tolerant.
+    """
+    class Phase(IntEnum):
+        PARSE = 0
+        RENDER = 1
+
+        def __str__(self) -> str:
+            dictionary = {
+                self.PARSE: "parse",
+                self.RENDER: "render"
+            }
+            return dictionary[self]
+
+    def __init__(self, filename: str, phase: 'Failure.Phase', error: str):
+        self.filename = filename
+        self.phase = phase
+        self.error = error
+
+    @classmethod
+    def from_exception(cls, filename: str, phase: 'Failure.Phase',
+                       exception: Exception) -> 'Failure':
+        return cls(filename, phase,
+                   type(exception).__name__ + ": " + str(exception))
+
+
+class Fallback:
+    """
+    Represents a diff rendered as plain text instead of the requested view,
+    since rendering it would exceed the budget of its page.
+    """
+    def __init__(self, page: str, symbol_name: str, reason: str):
+        # Path of the page relative to the output directory.
+        self.page = page
+        self.symbol_name = symbol_name
+        self.reason = reason
+
+
+class _BudgetExceeded(Exception):
+    """Raised when rendering a diff takes longer than the page budget."""
+
+
+@lru_cache(maxsize=None)
+def c_lexer() -> Any:
+    """
+    Returns the Pygments lexer for C. Pygments is imported on the first call
+    since importing it takes a significant part of the startup time.
+    """
+    from pygments import lexers  # type: ignore
+    return lexers.get_lexer_by_name("c", stripnl=False)
+
+
+@lru_cache(maxsize=None)
+def html_formatter() -> Any:
+    """Returns the Pygments HTML formatter."""
+    from pygments.formatters.html import HtmlFormatter  # type: ignore
+    return HtmlFormatter()
+
+
+def load_difference(path: str) -> Difference:
+    """Parses a YAML file generated by DiffKemp into a Difference object."""
+    import yaml
+    with open(path, "r") as file:
+        return Difference.from_yaml(yaml.safe_load(file))
+
+
+T = TypeVar("T")
 
 
 class HTMLGenerator:
@@ -257,32 +410,209 @@ class HTMLGenerator:
     bootstrap = ("https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/"
                  "bootstrap.min.css")
     main_page_title = "DiffKemp results"
+    delta_page_title = "Changes since previous results"
+    delta_page = "delta.html"
+    ndjson_file = "kabi.ndjson"
+    report_page_title = "Run report"
+    report_page = "report.html"
+    cache_file = ".htmlgen-cache"
+    search_page_title = "Search in diffs"
+    search_page = "search.html"
+    # Directory with the files of the search index and the names of its
+    # shards (see SearchIndex.write).
+    search_dir = "search"
+    search_shard_pattern = re.compile(r"shard-[0-9]+\.js")
     home_link_text = "go back"
     internal_symbol_heading = "differing symbols:"
     external_symbol_heading = "affected KABI symbols:"
+    most_impacted_heading = "most impacted KABI symbols:"
+    # Number of KABI symbols listed as the most impacted ones.
+    most_impacted_count = 10
+    bootstrap_style = "bootstrap.css"
     htmlgen_style = "htmlgen.css"
     pygments_style = "pygments.css"
+    # Templates for the rows of graphical diffs and callstacks, which are the
+    # hot paths when rendering big results. The arguments must be already
+    # escaped HTML.
+    diff_heading_template = ('<tr><td class="heading" colspan="4">{}</td>'
+                             '</tr>')
+    diff_row_template = "<tr>{}{}</tr>"
+    # Line numbers and change markers are shown by the stylesheet from the
+    # attributes of the gutter cells, so that they are not highlighted and
+    # not copied with the code.
+    diff_side_template = ('<td class="gutter" data-line="{}" '
+                          'data-marker="{}"></td><td class="{}">{}</td>')
+    diff_empty_side = '<td class="gutter"></td><td class="line empty"></td>'
+    callstack_row_template = "<li>{}</li>"
+    callstack_excerpt_template = "<details><summary>{}</summary>{}</details>"
+    callstack_diff_row_template = ('<tr class="{}"><td>{}</td><td>{}</td>'
+                                   '</tr>')
+    call_graph_node_template = '<li id="{}">{}</li>'
+    call_graph_branch_template = ("<details open><summary>{}</summary>"
+                                  "<ul>{}</ul></details>")
+    call_graph_link_template = '<li><a href="#{}">{}</a> (see above)</li>'
+    # Document that is being generated with its tag and text functions.
+    doc: Any
+    tag: Any
+    text: Any
+    # Maximum number of highlighted pieces of code kept in the cache.
+    highlight_cache_size = 65536
+    batch_page_title = "DiffKemp results overview"
+    # Number of hexadecimal digits of the content hash in bundled assets.
+    asset_hash_length = 12
+    # Diffs longer than this number of characters are not rendered into the
+    # page document, but written into the page file row by row in place of
+    # the placeholder.
+    stream_diff_size = 1024 * 1024
+    stream_diff_placeholder = "<!--diffkemp-htmlgen:diff-->"
+    # Views of diffs that can be rendered together with the values of
+    # graphical_diff and highlight_syntax used for them.
+    view_options = {
+        "plain": (False, False),
+        "highlighted": (False, True),
+        "graphical": (True, False),
+        "graphical-highlighted": (True, True)
+    }
+    # Number of characters of a plain diff escaped at once when streaming.
+    stream_chunk_size = 64 * 1024
+    # Number of highlighted tokens between checks of the render budget.
+    budget_check_interval = 256
 
     def __init__(self, input_dir: str, output_dir: str,
-                 graphical_diff: bool = False, highlight_syntax: bool = False):
+                 graphical_diff: bool = False, highlight_syntax: bool = False,
+                 bundle_assets: bool = False,
+                 compare_dir: Optional[str] = None,
+                 html: bool = True, ndjson: bool = False,
+                 keep_going: bool = False, jobs: int = 1,
+                 old_source_dir: Optional[str] = None,
+                 new_source_dir: Optional[str] = None,
+                 callstack_graph: bool = False, callstack_diff: bool = False,
+                 views: Optional[List[str]] = None,
+                 symbol_filter: Optional['SymbolFilter'] = None,
+                 cache_results: bool = False,
+                 page_time_budget: Optional[float] = None,
+                 page_size_budget: Optional[int] = None,
+                 search_index: bool = False,
+                 output: Optional[OutputWriter] = None):
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.graphical_diff = graphical_diff
         self.highlight_syntax = highlight_syntax
-        self.lexer = lexers.get_lexer_by_name("c", stripnl=False)
-        self.formatter = HtmlFormatter()
-
-    def _format_source(self, text: str) -> None:
+        self.bundle_assets = bundle_assets
+        # Directory with previous results to which input_dir is compared.
+        self.compare_dir = compare_dir
+        # Output formats to generate.
+        self.html = html
+        self.ndjson = ndjson
+        # Record failures to process input files and skip the files instead
+        # of aborting.
+        self.keep_going = keep_going
+        self.failures: List[Failure] = []
+        # Number of processes used to parse the input files.
+        self.jobs = jobs
+        # Kernel source trees used to show the code of symbols and calls.
+        self.old_source_dir = old_source_dir
+        self.new_source_dir = new_source_dir
+        self.old_sources: Optional['SourceTree'] = None
+        self.new_sources: Optional['SourceTree'] = None
+        # Merge callstacks on pages of KABI symbols into graphs.
+        self.callstack_graph = callstack_graph
+        # Keep the scanned results in a cache in the output directory and
+        # reuse them for unchanged input files.
+        self.cache_results = cache_results
+        # Selection of the differences to process.
+        self.symbol_filter = symbol_filter
+        # Limits of the time in seconds spent on rendering the diffs of a page
+        # and of the number of characters of a diff rendered in the selected
+        # view. Diffs exceeding them are rendered as plain text.
+        self.page_time_budget = page_time_budget
+        self.page_size_budget = page_size_budget
+        self.fallbacks: List[Fallback] = []
+        # Time by which the diffs of the current page must be rendered and
+        # the time checked when rendering a diff (None outside of it).
+        self._page_deadline: Optional[float] = None
+        self._deadline: Optional[float] = None
+        # Reasons of fallbacks on the current page.
+        self._page_fallbacks: List[str] = []
+        # Keys of diffs (see _diff_key) that exceeded the time budget.
+        self._over_budget: Set[bytes] = set()
+        # Index the diffs for the search page, the diff of the current page
+        # is added to the index when the page is written.
+        self.search_index = search_index
+        self._search: Optional['SearchIndex'] = None
+        self._page_diff = ""
+        # Names of views of diffs (see view_options) rendered on each page
+        # instead of the single one given by graphical_diff and
+        # highlight_syntax.
+        self.views = views or []
+        # Show callstacks side by side with their differences marked.
+        self.callstack_diff = callstack_diff
+        # Aligned callstacks by the ids of the callstacks (see
+        # _callstack_divergence).
+        self._divergence_cache: Dict[
+            Tuple[int, int],
+            Tuple[List[Call], List[Call], 'CallstackDivergence']] = dict()
+        # Input files from which the differences were parsed.
+        self._difference_files: Dict[str, str] = dict()
+        # Pages of internal symbols (the old symbols of differences) and
+        # KABI symbols, and the pages of differences by their input files.
+        self._pages = self._page_names()
+        self._file_pages: Dict[str, str] = dict()
+        # Pool of processes shared by all runs of a batch.
+        self._executor: Optional['Executor'] = None
+        # Highlighted source code is cached since the same lines often appear
+        # in many diffs.
+        self._highlight = lru_cache(maxsize=self.highlight_cache_size)(
+            self._highlight_uncached)
+        # Rendered diffs by their keys (see _diff_key) and numbers of their
+        # occurrences.
+        self._diff_cache: Dict[bytes, str] = dict()
+        self._diff_counts: Dict[bytes, int] = dict()
+        # Diffs of the current page to be written by _write_page with their
+        # rendering options.
+        self._streamed_diffs: List[Tuple[str, bool, bool]] = []
+        # Diff whose views are being rendered and its fragments, which are
+        # parsed once for all graphical views (see _diff_views_to_html).
+        self._view_fragments: Optional[Tuple[str, List[Diff.Fragment]]] = \
+            None
+        # Writer of all output files, which counts written and unchanged
+        # files. Other writers pass the files to a function or write them
+        # into an archive.
+        self.output = output if output is not None else OutputWriter()
+        # Numbers of symbols found by the last run.
+        self.difference_count = 0
+        self.external_symbol_count = 0
+        self._pygments_css: Optional[str] = None
+        # Names of files under which the stylesheets are written.
+        self._asset_files: Dict[str, str] = dict()
+        # Generated head contents for each relative path to the output root.
+        self._head_cache: Dict[str, str] = dict()
+
+    @property
+    def lexer(self) -> Any:
+        return c_lexer()
+
+    @property
+    def formatter(self) -> Any:
+        return html_formatter()
+
+    def _source_to_html(self, text: str) -> str:
         """
         Formats C code using pre and highlights it if highlighting is enabled.
+        Returns the resulting HTML as a string.
         """
         if not self.highlight_syntax:
             # Do not highlight syntax, use a simple pre block instead.
-            with self.tag("pre"):
-                self.text(text)
-            return
+            return "<pre>" + escape(text, quote=False) + "</pre>"
+        return self._highlight(text)
 
-        txt = highlight(text, self.lexer, self.formatter).rstrip()
+    def _highlight_uncached(self, text: str) -> str:
+        """Highlights C code, use _highlight that caches the results."""
+        from pygments import format as format_tokens, lex
+        tokens = lex(text, self.lexer)
+        if self._deadline is not None:
+            tokens = self._budgeted_tokens(tokens)
+        txt = format_tokens(tokens, self.formatter).rstrip()
 
         # Replace spaces outside tags with &#32; and EOLs with &#10; to protect
         # them from yattag's indent function, which would otherwise destroy
@@ -301,22 +631,208 @@ class HTMLGenerator:
             else:
                 txt_parsed.append(ch)
 
-        self.doc.asis("".join(txt_parsed))
+        return "".join(txt_parsed)
+
+    def _budgeted_tokens(self, tokens: Iterable[T]) -> Iterator[T]:
+        """Passes highlighted tokens through while checking the deadline."""
+        for index, token in enumerate(tokens):
+            if index % self.budget_check_interval == 0:
+                self._check_deadline()
+            yield token
+
+    def _check_deadline(self) -> None:
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise _BudgetExceeded()
+
+    def _format_source(self, text: str) -> None:
+        """
+        Formats C code using pre and highlights it if highlighting is enabled.
+        """
+        self.doc.asis(self._source_to_html(text))
 
     def _collect_differences(self, directory: str) -> Dict[str, Difference]:
         """
         Parses all YAML files in the given directory into a map whose keys
-        are symbols and values are Difference objects.
+        are names of the pages of symbols and values are Difference objects.
+        Files that cannot be parsed are recorded in self.failures when
+        the generator is tolerant.
         """
-        differences = dict()
-        for filename in os.listdir(directory):
-            with open(os.path.join(directory, filename), "r") as file:
-                parsed_file = yaml.safe_load(file)
-                difference = Difference.from_yaml(parsed_file)
-                differences[difference.symbol_old.name] = difference
-
+        # Files are processed in a fixed order, so that the output does not
+        # depend on the file system.
+        file_paths = {filename: os.path.join(directory, filename)
+                      for filename in sorted(os.listdir(directory))}
+        stats: Dict[str, os.stat_result] = dict()
+        cached: Dict[str, Difference] = dict()
+        # Number of entries in the cache.
+        cache_size = 0
+        if self.cache_results:
+            from diffkemp_htmlgen.cache import read_cache
+            stats = {filename: os.stat(path)
+                     for filename, path in file_paths.items()}
+            entries = read_cache(os.path.join(self.output_dir,
+                                              self.cache_file), directory)
+            cached = {filename: entry.difference
+                      for filename, entry in entries.items()
+                      if filename in stats and entry.is_valid(stats[filename])}
+            cache_size = len(entries)
+
+        paths = [path for filename, path in file_paths.items()
+                 if filename not in cached]
+        if self.symbol_filter:
+            # Skip the files of differences that are not selected before
+            # parsing them.
+            paths = [path for path, selected in zip(
+                paths, self._map(self.symbol_filter.matches_file, paths))
+                if selected]
+        # Only the headers are parsed, diffs are read when they are needed.
+        from diffkemp_htmlgen.scan import (scan_difference,
+                                           scan_difference_tolerant)
+        load: Callable[[str], Union[Difference, Failure]] = \
+            scan_difference_tolerant if self.keep_going else scan_difference
+        scanned = dict(zip(paths, self._map(load, paths)))
+
+        if self.cache_results and (scanned or len(cached) != cache_size):
+            # Some files were added, changed or removed.
+            self._write_cache(file_paths, cached, scanned, stats)
+
+        results: List[Tuple[str, Difference]] = []
+        for filename, path in file_paths.items():
+            result = cached.get(filename) or scanned.get(path)
+            if result is None:
+                # Not selected.
+                continue
+            if isinstance(result, Failure):
+                self.failures.append(result)
+                continue
+            if self.symbol_filter:
+                # Scanned files were selected by their headers already, but
+                # checking the parsed difference is cheap.
+                if not self.symbol_filter.matches_difference(result):
+                    continue
+                result = self.symbol_filter.restrict(result)
+            results.append((path, result))
+        return self._key_differences(results)
+
+    def _load_differences(
+            self, items: Iterable[Union[Difference, Dict[str, Any]]])\
+            -> Dict[str, Difference]:
+        """
+        Collects already loaded differences into a map like
+        _collect_differences. Dictionaries are converted into Difference
+        objects, the ones that cannot be converted are recorded in
+        self.failures when the generator is tolerant.
+        """
+        results: List[Tuple[str, Difference]] = []
+        for index, item in enumerate(items):
+            # Differences are identified by their positions in reports.
+            name = "<difference {}>".format(index)
+            if isinstance(item, Difference):
+                difference = item
+            else:
+                try:
+                    difference = Difference.from_yaml(item)
+                except Exception as exception:
+                    if not self.keep_going:
+                        raise
+                    self.failures.append(Failure.from_exception(
+                        name, Failure.Phase.PARSE, exception))
+                    continue
+            if self.symbol_filter:
+                if not self.symbol_filter.matches_difference(difference):
+                    continue
+                difference = self.symbol_filter.restrict(difference)
+            results.append((name, difference))
+        return self._key_differences(results)
+
+    def _key_differences(self, results: List[Tuple[str, Difference]])\
+            -> Dict[str, Difference]:
+        """
+        Assigns pages to the differences parsed from the given files and
+        returns them in a map whose keys are the names of the pages.
+        """
+        # Order the differences by their symbols, so that the same symbols
+        # always get the same pages. Symbols with the same names (e.g. static
+        # functions in different files) are distinguished by locations.
+        keys = sorted((difference.symbol_old.name,
+                       int(difference.symbol_old.kind),
+                       difference.symbol_old.location.filename,
+                       difference.symbol_old.location.line, index)
+                      for index, (_, difference) in enumerate(results))
+        differences: Dict[str, Difference] = dict()
+        for *_, index in keys:
+            path, difference = results[index]
+            key = self._add_page(difference.symbol_old)
+            self._file_pages[path] = self._pages[difference.symbol_old]
+            differences[key] = difference
+            self._difference_files[key] = path
         return differences
 
+    def _page_names(self) -> PageNames:
+        """
+        Creates names of pages of symbols, which differ from the names of
+        the other pages of the output.
+        """
+        return PageNames(os.path.splitext(page)[0] for page in [
+            "index.html", self.delta_page, self.report_page,
+            self.search_page])
+
+    def _add_page(self, symbol: Union[InternalSymbol, ExternalSymbol])\
+            -> str:
+        """
+        Assigns a page to the symbol, returns its name without the extension.
+        """
+        if isinstance(symbol, ExternalSymbol):
+            name = symbol.name + "-" + str(symbol.kind)
+            return self._pages.add(symbol, name, name, "kabi/")
+        return self._pages.add(
+            symbol, symbol.name, "{}\0{}\0{}".format(symbol.name, symbol.kind,
+                                                     symbol.location))
+
+    def _page(self, symbol: Union[InternalSymbol, ExternalSymbol]) -> str:
+        """
+        Returns the path of the page of the symbol relative to the output
+        directory.
+        """
+        if symbol not in self._pages:
+            self._add_page(symbol)
+        return self._pages[symbol]
+
+    def _write_cache(self, file_paths: Dict[str, str],
+                     cached: Dict[str, Difference],
+                     scanned: Dict[str, Union[Difference, Failure]],
+                     stats: Dict[str, os.stat_result]) -> None:
+        """
+        Writes the valid cached and the newly scanned differences into the
+        cache in the output directory.
+        """
+        from diffkemp_htmlgen.cache import CacheEntry, write_cache
+        from diffkemp_htmlgen.scan import ScannedDifference
+        entries = []
+        for filename, stat in stats.items():
+            result = cached.get(filename) or scanned.get(file_paths[filename])
+            if isinstance(result, ScannedDifference):
+                entries.append(CacheEntry(filename, stat.st_mtime_ns,
+                                          stat.st_size, result))
+        write_cache(os.path.join(self.output_dir, self.cache_file), entries)
+
+    def _map(self, function: Callable[[str], T], paths: List[str])\
+            -> Iterable[T]:
+        """
+        Applies the function to the paths, in parallel if more jobs are
+        allowed.
+        """
+        chunksize = max(1, len(paths) // (self.jobs * 4))
+        if self._executor is not None:
+            # Shared pool of a batch.
+            return list(self._executor.map(function, paths,
+                                           chunksize=chunksize))
+        if self.jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(self.jobs) as executor:
+                return list(executor.map(function, paths,
+                                         chunksize=chunksize))
+        return map(function, paths)
+
     def _collect_external_symbols(self, differences: Dict[str, Difference])\
             -> Dict[ExternalSymbol, List[Affection]]:
         """
@@ -336,7 +852,13 @@ class HTMLGenerator:
                     Affection(difference.symbol_old, affection.callstack_old,
                               affection.callstack_new))
 
-        return external_symbol_map
+        # Order the symbols by their names and kinds, only the keys are
+        # sorted. Affections keep the order of the differences.
+        symbols = list(external_symbol_map)
+        keys = sorted((symbol.name, int(symbol.kind), index)
+                      for index, symbol in enumerate(symbols))
+        return {symbols[index]: external_symbol_map[symbols[index]]
+                for _, _, index in keys}
 
     def _difference_to_html(self, difference: Difference) -> None:
         """Converts a Difference object into HTML."""
@@ -355,9 +877,24 @@ class HTMLGenerator:
                 text("old location: " + str(difference.symbol_old.location))
             with tag("li"):
                 text("new location: " + str(difference.symbol_new.location))
+            for side, sources, symbol in [
+                    ("old", self.old_sources, difference.symbol_old),
+                    ("new", self.new_sources, difference.symbol_new)]:
+                body = sources.symbol_body(symbol) if sources else None
+                if body is not None:
+                    with tag("li"):
+                        text(side + " source: ")
+                        self._source_lines_to_html(*body)
             with tag("li"):
                 text("difference: ")
-                self._diff_to_html(difference.diff.strip())
+                diff_str = difference.diff.strip()
+                self._page_diff = diff_str
+                if self.views:
+                    self._diff_views_to_html(diff_str,
+                                             difference.diff_digest())
+                else:
+                    self._page_diff_to_html(diff_str,
+                                            difference.diff_digest())
             with tag("li"):
                 text("affects symbols:")
                 with tag("ul"):
@@ -374,17 +911,10 @@ class HTMLGenerator:
         if not isinstance(affection.symbol, ExternalSymbol):
             raise ValueError("Affection not external")
 
-        href = ("kabi/" + affection.symbol.name + "-" +
-                str(affection.symbol.kind) + ".html")
-        with tag("a", href=href):
+        with tag("a", href=self._page(affection.symbol)):
             text(affection.symbol.name)
         with tag("ul"):
-            with tag("li"):
-                text("old callstack:")
-                self._callstack_to_html(affection.callstack_old)
-            with tag("li"):
-                text("new callstack:")
-                self._callstack_to_html(affection.callstack_new)
+            self._callstacks_to_html(affection)
 
     def _affection_internal_to_html(self, affection: Affection) -> None:
         """
@@ -395,27 +925,106 @@ class HTMLGenerator:
         if not isinstance(affection.symbol, InternalSymbol):
             raise ValueError("Incorrent affection type")
 
-        href = "../" + affection.symbol.name + ".html"
-        with tag("a", href=href):
+        with tag("a", href="../" + self._page(affection.symbol)):
             text(affection.symbol.name)
         with tag("ul"):
             with tag("li"):
                 text("location: " + str(affection.symbol.location))
-            with tag("li"):
-                text("old callstack:")
-                self._callstack_to_html(affection.callstack_old)
-            with tag("li"):
-                text("new callstack:")
-                self._callstack_to_html(affection.callstack_new)
+            self._callstacks_to_html(affection)
 
-    def _callstack_to_html(self, callstack: List[Call]) -> None:
-        """Converts a callstack (i.e. a list of Call objects) into HTML."""
+    def _callstacks_to_html(self, affection: Affection) -> None:
+        """
+        Converts the old and the new callstack of an affection into list
+        items, either as two lists or side by side with their differences
+        marked.
+        """
         tag, text = self.tag, self.text
+        if self.callstack_diff:
+            with tag("li"):
+                text("callstacks (old and new):")
+                self._callstack_divergence_to_html(affection)
+            return
 
-        with tag("ul"):
-            for call in callstack:
-                with tag("li"):
-                    text(call.symbol_name + " at " + str(call.location))
+        with tag("li"):
+            text("old callstack:")
+            self._callstack_to_html(affection.callstack_old, self.old_sources)
+        with tag("li"):
+            text("new callstack:")
+            self._callstack_to_html(affection.callstack_new, self.new_sources)
+
+    def _call_html(self, call: Call,
+                   sources: Optional['SourceTree'] = None) -> str:
+        """
+        Converts a call into HTML. If the source tree is given, the call is
+        expandable to show the code around it.
+        """
+        call_html = escape(call.symbol_name + " at " + str(call.location),
+                           quote=False)
+        excerpt = sources.excerpt(call.location) if sources else None
+        if excerpt is not None:
+            call_html = self.callstack_excerpt_template.format(
+                call_html, self._source_lines_html(*excerpt))
+        return call_html
+
+    def _callstack_to_html(self, callstack: List[Call],
+                           sources: Optional['SourceTree'] = None) -> None:
+        """
+        Converts a callstack (i.e. a list of Call objects) into HTML. If the
+        source tree is given, calls are expandable to show the code around
+        them.
+        """
+        rows = [self.callstack_row_template.format(self._call_html(call,
+                                                                   sources))
+                for call in callstack]
+        self.doc.asis("<ul>" + "".join(rows) + "</ul>")
+
+    def _callstack_divergence(self, affection: Affection)\
+            -> 'CallstackDivergence':
+        """
+        Returns the aligned difference of the callstacks of an affection.
+        It is computed once for each pair of callstacks, which are shared by
+        the affection on the page of the difference and of the KABI symbol.
+        """
+        from diffkemp_htmlgen.divergence import CallstackDivergence
+        key = (id(affection.callstack_old), id(affection.callstack_new))
+        cached = self._divergence_cache.get(key)
+        if cached is None:
+            # The callstacks are stored too so that their ids are not reused.
+            cached = (affection.callstack_old, affection.callstack_new,
+                      CallstackDivergence(affection.callstack_old,
+                                          affection.callstack_new))
+            self._divergence_cache[key] = cached
+        return cached[2]
+
+    def _callstack_divergence_to_html(self, affection: Affection) -> None:
+        """
+        Converts the callstacks of an affection into a table with aligned
+        old and new calls, in which changed calls are marked.
+        """
+        rows = []
+        for status, call_old, call_new in self._callstack_divergence(
+                affection).rows:
+            rows.append(self.callstack_diff_row_template.format(
+                status,
+                self._call_html(call_old, self.old_sources) if call_old
+                else "",
+                self._call_html(call_new, self.new_sources) if call_new
+                else ""))
+        self.doc.asis('<table class="table callstack-table">' +
+                      "".join(rows) + "</table>")
+
+    def _source_lines_html(self, start: int, lines: List[str]) -> str:
+        """
+        Formats lines of source code starting at the given line number as
+        an HTML string.
+        """
+        return self._source_to_html("\n".join(
+            " {:4}  {}".format(number, line)
+            for number, line in enumerate(lines, start)))
+
+    def _source_lines_to_html(self, start: int, lines: List[str]) -> None:
+        """Formats lines of source code starting at the given line number."""
+        self.doc.asis(self._source_lines_html(start, lines))
 
     def _external_symbol_to_html(
             self, symbol: ExternalSymbol,
@@ -435,6 +1044,9 @@ class HTMLGenerator:
         with tag("ul"):
             with tag("li"):
                 text("kind: " + str(symbol.kind))
+            if self.callstack_graph:
+                self._external_symbol_graphs_to_html(affections)
+                return
             with tag("li"):
                 text("affected by symbols:")
                 with tag("ul"):
@@ -442,210 +1054,951 @@ class HTMLGenerator:
                         with tag("li"):
                             self._affection_internal_to_html(affection)
 
+    def _external_symbol_graphs_to_html(
+            self, affections: List[Affection]) -> None:
+        """
+        Converts the internal symbols affecting an external symbol into HTML
+        with their old and new callstacks merged into graphs.
+        """
+        from diffkemp_htmlgen.callgraph import CallGraph
+        tag, text = self.tag, self.text
+
+        with tag("li"):
+            text("affected by symbols:")
+            with tag("ul"):
+                for affection in affections:
+                    assert isinstance(affection.symbol, InternalSymbol)
+                    with tag("li"):
+                        with tag("a",
+                                 href="../" + self._page(affection.symbol)):
+                            text(affection.symbol.name)
+                        text(" at " + str(affection.symbol.location))
+        for side, new in [("old", False), ("new", True)]:
+            with tag("li"):
+                text(side + " call graph:")
+                self._call_graph_to_html(
+                    CallGraph.from_affections(affections, new), side)
+
+    def _call_graph_to_html(self, graph: 'CallGraph', id_prefix: str) -> None:
+        """
+        Converts a call graph into a collapsible tree. Every node is rendered
+        only once, its later occurrences link to it.
+        """
+        rendered = bytearray(len(graph))
+
+        def targets_html(targets: List[InternalSymbol]) -> str:
+            return ", ".join('<a href="../{}">{}</a>'.format(
+                escape(self._page(target)), escape(target.name, quote=False))
+                for target in targets)
+
+        # Branches are opened before their children and closed after them.
+        branch_start, branch_end = self.call_graph_node_template.format(
+            "{}", self.call_graph_branch_template.format("{}", "\0")).split(
+                "\0")
+        rows = []
+        if graph.direct_targets:
+            rows.append(self.callstack_row_template.format(
+                "directly: " + targets_html(graph.direct_targets)))
+
+        # The graph is traversed using a stack of nodes, each with a flag
+        # telling whether its branch is being closed, since callstacks can be
+        # deeper than the recursion limit.
+        stack = [(root, False) for root in reversed(graph.roots)]
+        while stack:
+            index, closing = stack.pop()
+            if closing:
+                rows.append(branch_end)
+                continue
+            call = graph.calls[index]
+            label = escape(call.symbol_name + " at " + str(call.location),
+                           quote=False)
+            node_id = "{}-call-{}".format(id_prefix, index)
+            if rendered[index]:
+                rows.append(self.call_graph_link_template.format(node_id,
+                                                                 label))
+                continue
+            rendered[index] = 1
+
+            if graph.targets[index]:
+                label += " &rarr; " + targets_html(graph.targets[index])
+            if not graph.children[index]:
+                rows.append(self.call_graph_node_template.format(node_id,
+                                                                 label))
+                continue
+            rows.append(branch_start.format(node_id, label))
+            stack.append((index, True))
+            stack.extend((child, False)
+                         for child in reversed(graph.children[index]))
+        self.doc.asis("<ul>" + "".join(rows) + "</ul>")
+
+    def _page_diff_to_html(self, diff_str: str,
+                           digest: Optional[bytes] = None) -> None:
+        """
+        Converts the diff of a difference page into HTML, diffs that are too
+        large are streamed when the page is written (see _write_page). Diffs
+        exceeding the budget of the page are rendered as plain text.
+        """
+        fallback = self._budget_fallback(diff_str, digest)
+        if fallback is not None:
+            self._page_fallbacks.append(fallback)
+            with self._diff_options(False, False):
+                self._page_diff_to_html(diff_str, digest)
+        elif len(diff_str) > self.stream_diff_size:
+            # The rows of streamed diffs are written directly into the page,
+            # the time budget is checked then (see _write_budgeted_diff).
+            self.doc.asis(self.stream_diff_placeholder)
+            self._streamed_diffs.append((diff_str, self.graphical_diff,
+                                         self.highlight_syntax))
+        elif self._page_deadline is None or not (self.graphical_diff or
+                                                 self.highlight_syntax):
+            self._cached_diff_to_html(diff_str, digest)
+        else:
+            self._budgeted_diff_to_html(diff_str, digest)
+
+    def _budget_fallback(self, diff_str: str,
+                         digest: Optional[bytes] = None) -> Optional[str]:
+        """
+        Returns why the diff cannot be rendered in the current view within
+        the budget of the page, or None if it can be tried.
+        """
+        if not self.graphical_diff and not self.highlight_syntax:
+            return None
+        if self.page_size_budget is not None and \
+                len(diff_str) > self.page_size_budget:
+            return "the diff has {} characters, more than {}".format(
+                len(diff_str), self.page_size_budget)
+        if self._page_deadline is not None and (
+                time.monotonic() > self._page_deadline or
+                digest is not None and
+                self._diff_key(digest) in self._over_budget):
+            return self._time_fallback()
+        return None
+
+    def _time_fallback(self) -> str:
+        return "rendering took more than {} s".format(self.page_time_budget)
+
+    def _budgeted_diff_to_html(self, diff_str: str,
+                               digest: Optional[bytes] = None) -> None:
+        """
+        Converts a diff into HTML using _cached_diff_to_html unless it takes
+        longer than the time left for the page, the diff is rendered as
+        plain text then.
+        """
+        doc, tag, text = self.doc, self.tag, self.text
+        self.doc, self.tag, self.text = Doc().tagtext()
+        self._deadline = self._page_deadline
+        html: Optional[str] = None
+        try:
+            self._cached_diff_to_html(diff_str, digest)
+            html = self.doc.getvalue()
+        except _BudgetExceeded:
+            if digest is not None:
+                self._over_budget.add(self._diff_key(digest))
+        finally:
+            self._deadline = None
+            self.doc, self.tag, self.text = doc, tag, text
+        if html is not None:
+            self.doc.asis(html)
+            return
+        self._page_fallbacks.append(self._time_fallback())
+        with self._diff_options(False, False):
+            self._cached_diff_to_html(diff_str, digest)
+
+    @contextmanager
+    def _diff_options(self, graphical_diff: bool,
+                      highlight_syntax: bool) -> Iterator[None]:
+        """Temporarily sets the options affecting the rendering of diffs."""
+        options = self.graphical_diff, self.highlight_syntax
+        self.graphical_diff, self.highlight_syntax = (graphical_diff,
+                                                      highlight_syntax)
+        try:
+            yield
+        finally:
+            self.graphical_diff, self.highlight_syntax = options
+
+    def _diff_option_sets(self) -> List[Tuple[bool, bool]]:
+        """Returns the options of all rendered variants of diffs."""
+        if self.views:
+            return [self.view_options[view] for view in self.views]
+        return [(self.graphical_diff, self.highlight_syntax)]
+
+    def _diff_views_to_html(self, diff_str: str,
+                            digest: Optional[bytes] = None) -> None:
+        """
+        Converts a diff into HTML once for each view with radio buttons to
+        switch between the views (see _views_css). The diff is parsed once
+        for all graphical views, except for streamed diffs, whose fragments
+        are not kept in memory.
+        """
+        doc, tag, text = self.doc, self.tag, self.text
+        for index, view in enumerate(self.views):
+            checked = [("checked", "checked")] if index == 0 else []
+            doc.stag("input", *checked, type="radio", name="view",
+                     id="view-" + view, klass="view-switch")
+            with tag("label", ("for", "view-" + view)):
+                text(view)
+        graphical_views = sum(1 for view in self.views
+                              if self.view_options[view][0])
+        if graphical_views > 1 and len(diff_str) <= self.stream_diff_size:
+            self._view_fragments = (diff_str,
+                                    list(Diff.iter_fragments(diff_str)))
+        try:
+            with tag("div", klass="diff-views"):
+                for view in self.views:
+                    with tag("div", klass="diff-view view-" + view):
+                        with self._diff_options(*self.view_options[view]):
+                            self._page_diff_to_html(diff_str, digest)
+        finally:
+            self._view_fragments = None
+
+    def _fragments(self, diff_str: str) -> Iterable[Diff.Fragment]:
+        """
+        Returns the fragments of the diff, the ones already parsed for the
+        views of the diff if there are any.
+        """
+        if self._view_fragments is not None and \
+                self._view_fragments[0] is diff_str:
+            return self._view_fragments[1]
+        return Diff.iter_fragments(diff_str)
+
+    def _views_css(self) -> str:
+        """Returns the stylesheet showing the view selected on the page."""
+        return css.htmlgen_css_views + "".join(
+            css.htmlgen_css_view_template.format(view)
+            for view in self.views)
+
+    def _diff_key(self, digest: bytes) -> bytes:
+        """
+        Returns a key identifying the rendering of a diff with the given
+        hash, i.e. the hash and the options affecting the rendering.
+        """
+        options = "{:d}{:d}".format(self.graphical_diff, self.highlight_syntax)
+        return options.encode() + digest
+
+    def _cached_diff_to_html(self, diff_str: str,
+                             digest: Optional[bytes] = None) -> None:
+        """
+        Converts a diff into HTML using _diff_to_html. Diffs occurring more
+        than once in the results (see _count_diffs) are rendered only once.
+        The hash of the diff is computed if it is not given.
+        """
+        key = self._diff_key(digest if digest is not None
+                             else diff_digest(diff_str))
+        html = self._diff_cache.get(key)
+        if html is None and self._diff_counts.get(key, 0) > 1:
+            # Render into a separate document to get the HTML.
+            doc, tag, text = self.doc, self.tag, self.text
+            self.doc, self.tag, self.text = Doc().tagtext()
+            try:
+                self._diff_to_html(diff_str)
+                html = self.doc.getvalue()
+            finally:
+                self.doc, self.tag, self.text = doc, tag, text
+            self._diff_cache[key] = html
+        if html is None:
+            self._diff_to_html(diff_str)
+        else:
+            self.doc.asis(html)
+
+    def _count_diffs(self, differences: Iterable[Difference]) -> None:
+        """
+        Counts how many times each diff occurs in the differences. Only
+        renderings of diffs that occur multiple times are cached.
+        """
+        self._diff_counts = Counter()
+        digests = [difference.diff_digest() for difference in differences
+                   if difference.diff_size() <= self.stream_diff_size]
+        for options in self._diff_option_sets():
+            with self._diff_options(*options):
+                self._diff_counts.update(self._diff_key(digest)
+                                         for digest in digests)
+        self._diff_cache = dict()
+
     def _diff_to_html(self, diff_str: str) -> None:
         """Converts a diff to a graphical representation."""
-        tag = self.tag
-
         if not self.graphical_diff:
             # Use the original diff output.
             self._format_source(diff_str)
             return
 
-        def format(line: int) -> str:
-            return "{:4}".format(line)
-
-        with tag("table", klass="table diff-table"):
-            diff = Diff(diff_str)
-            for fragment in diff.fragments:
-                # Heading
-                with tag("tr"):
-                    with tag("td", klass="heading", colspan="2"):
-                        self._format_source(fragment.function_name)
-                # The actual diff
-                index_left = 0
-                index_right = 0
-                while (index_left < len(fragment.lines_left) or
-                       index_right < len(fragment.lines_right)):
-                    line_idx_left = fragment.start_line_left + index_left
-                    line_idx_right = fragment.start_line_right + index_right
-
-                    if index_left < len(fragment.lines_left):
-                        line_left = fragment.lines_left[index_left]
-                    else:
-                        line_left = ""
-                    if index_right < len(fragment.lines_right):
-                        line_right = fragment.lines_right[index_right]
-                    else:
-                        line_right = ""
-
-                    if (line_left.startswith("!") and
-                            line_right.startswith("!")):
-                        with tag("tr"):
-                            with tag("td", klass="line removed"):
-                                self._format_source(" " + format(line_idx_left)
-                                                    + " - " + line_left[1:])
-                            with tag("td", klass="line added"):
-                                self._format_source(" " +
-                                                    format(line_idx_right) +
-                                                    " + " + line_right[1:])
-                        index_left += 1
-                        index_right += 1
-                        continue
+        # Rows are inserted as pre-escaped strings at once, entering yattag's
+        # context managers for every cell is too slow for big diffs.
+        with self.tag("table", klass="table diff-table"):
+            self.doc.asis("".join(self._diff_rows(diff_str)))
 
-                    if len(line_left) and line_left[0] in ["!", "-"]:
-                        with tag("tr"):
-                            with tag("td", klass="line removed"):
-                                self._format_source(" " +
-                                                    format(line_idx_left) +
-                                                    " - " + line_left[1:])
-                            with tag("td", klass="line empty"):
-                                pass
-                        index_left += 1
-                        continue
+    def _write_diff(self, stream: TextIO, diff_str: str) -> None:
+        """
+        Writes the HTML of a diff into the stream without building it in
+        memory, the same as _diff_to_html up to whitespace between tags.
+        """
+        if not self.graphical_diff:
+            if self.highlight_syntax:
+                # Pygments needs the whole text, but do not keep the result
+                # in the cache.
+                stream.write(self._highlight_uncached(diff_str))
+                return
+            stream.write("<pre>")
+            for start in range(0, len(diff_str), self.stream_chunk_size):
+                stream.write(escape(
+                    diff_str[start:start + self.stream_chunk_size],
+                    quote=False))
+            stream.write("</pre>")
+            return
 
-                    if len(line_right) and line_right[0] in ["!", "+"]:
-                        with tag("tr"):
-                            with tag("td", klass="line empty"):
-                                pass
-                            with tag("td", klass="line added"):
-                                self._format_source(" " +
-                                                    format(line_idx_right) +
-                                                    " + " + line_right[1:])
-                        index_right += 1
-                        continue
+        stream.write('<table class="table diff-table">\n')
+        for row in self._diff_rows(diff_str):
+            stream.write(row)
+            stream.write("\n")
+        stream.write("</table>")
 
-                    # Handle cases when the context line is only on one side.
-                    if index_left >= len(fragment.lines_left):
-                        with tag("td", klass="line"):
-                            self._format_source(" " + format(line_idx_left) +
-                                                "  " + line_right)
-                        with tag("td", klass="line"):
-                            self._format_source(" " + format(line_idx_right) +
-                                                "  " + line_right)
-                        index_left += 1
-                        index_right += 1
-                        continue
-                    if index_right >= len(fragment.lines_right):
-                        with tag("td", klass="line"):
-                            self._format_source(" " + format(line_idx_left) +
-                                                "  " + line_left)
-                        with tag("td", klass="line"):
-                            self._format_source(" " + format(line_idx_right) +
-                                                "  " + line_left)
-                        index_left += 1
-                        index_right += 1
-                        continue
+    def _write_page(self, path: str) -> None:
+        """
+        Writes the generated document into a file. Diffs that are too large
+        to be rendered in memory are streamed in place of their placeholders.
+        """
+        page = indent(self.doc.getvalue())
+        if not self._streamed_diffs:
+            self.output.write(path, page)
+            return
+        with self.output.open(path) as f:
+            parts = page.split(self.stream_diff_placeholder,
+                               len(self._streamed_diffs))
+            for part, (diff_str, *options) in zip(parts,
+                                                  self._streamed_diffs):
+                f.write(part)
+                with self._diff_options(*options):
+                    self._write_budgeted_diff(f, diff_str)
+            f.write(parts[-1])
+
+    def _write_budgeted_diff(self, stream: TextIO, diff_str: str) -> None:
+        """
+        Writes a diff using _write_diff unless it takes longer than the time
+        left for the page, the diff is written as plain text then. Rows of a
+        graphical diff that were already written are kept.
+        """
+        if self._page_deadline is None or not (self.graphical_diff or
+                                               self.highlight_syntax):
+            self._write_diff(stream, diff_str)
+            return
+        if time.monotonic() <= self._page_deadline:
+            self._deadline = self._page_deadline
+            try:
+                self._write_diff(stream, diff_str)
+                return
+            except _BudgetExceeded:
+                if self.graphical_diff:
+                    stream.write("</table>")
+            finally:
+                self._deadline = None
+        self._page_fallbacks.append(self._time_fallback())
+        with self._diff_options(False, False):
+            self._write_diff(stream, diff_str)
+
+    def _diff_rows(self, diff_str: str) -> Iterator[str]:
+        """
+        Generates the rows of the graphical representation of a diff as
+        escaped HTML. The diff is parsed lazily, fragment by fragment, unless
+        it was already parsed for all views of the diff.
+        """
+        source = self._source_to_html
+
+        def side(marker: str, klass: str) -> str:
+            return self.diff_side_template.format("{}", marker, klass, "{}")
+        # Templates of whole rows, so that every row is formatted at once.
+        row = self.diff_row_template
+        changed = row.format(side("-", "line removed"),
+                             side("+", "line added"))
+        removed = row.format(side("-", "line removed"), self.diff_empty_side)
+        added = row.format(self.diff_empty_side, side("+", "line added"))
+        context_side = side(" ", "line")
+        context = row.format(context_side, context_side)
+
+        for fragment in self._fragments(diff_str):
+            self._check_deadline()
+            # Heading
+            yield self.diff_heading_template.format(
+                source(fragment.function_name))
+            # The actual diff, lines start with a marker of the change and
+            # a space.
+            index_left = 0
+            index_right = 0
+            while (index_left < len(fragment.lines_left) or
+                   index_right < len(fragment.lines_right)):
+                line_idx_left = fragment.start_line_left + index_left
+                line_idx_right = fragment.start_line_right + index_right
+
+                if index_left < len(fragment.lines_left):
+                    line_left = fragment.lines_left[index_left]
+                else:
+                    line_left = ""
+                if index_right < len(fragment.lines_right):
+                    line_right = fragment.lines_right[index_right]
+                else:
+                    line_right = ""
+
+                if line_left.startswith("!") and line_right.startswith("!"):
+                    yield changed.format(line_idx_left, source(line_left[2:]),
+                                         line_idx_right,
+                                         source(line_right[2:]))
+                    index_left += 1
+                    index_right += 1
+                    continue
 
-                    # Regular line (diff context)
-                    with tag("tr"):
-                        with tag("td", klass="line"):
-                            self._format_source(" " + format(line_idx_left) +
-                                                "  " + line_left)
-                        with tag("td", klass="line"):
-                            self._format_source(" " + format(line_idx_right) +
-                                                "  " + line_right)
+                if len(line_left) and line_left[0] in ["!", "-"]:
+                    yield removed.format(line_idx_left, source(line_left[2:]))
+                    index_left += 1
+                    continue
 
+                if len(line_right) and line_right[0] in ["!", "+"]:
+                    yield added.format(line_idx_right, source(line_right[2:]))
+                    index_right += 1
+                    continue
+
+                # Handle cases when the context line is only on one side.
+                if index_left >= len(fragment.lines_left):
+                    yield context_side.format(line_idx_left,
+                                              source(line_right[2:]))
+                    yield context_side.format(line_idx_right,
+                                              source(line_right[2:]))
+                    index_left += 1
+                    index_right += 1
+                    continue
+                if index_right >= len(fragment.lines_right):
+                    yield context_side.format(line_idx_left,
+                                              source(line_left[2:]))
+                    yield context_side.format(line_idx_right,
+                                              source(line_left[2:]))
                     index_left += 1
                     index_right += 1
+                    continue
+
+                # Regular line (diff context)
+                yield context.format(line_idx_left, source(line_left[2:]),
+                                     line_idx_right, source(line_right[2:]))
+
+                index_left += 1
+                index_right += 1
 
     def _generate_head(self, path: str = "") -> None:
         """Generates meta tags and the stylesheet link."""
-        self.doc.stag("meta", charset="utf-8")
-        self.doc.stag("link", rel="stylesheet", href=self.bootstrap)
-        self.doc.stag("link", rel="stylesheet",
-                      href=os.path.join(path, self.pygments_style))
-        self.doc.stag("link", rel="stylesheet",
-                      href=os.path.join(path, self.htmlgen_style))
+        head = self._head_cache.get(path)
+        if head is None:
+            # The head is the same for all pages on the same level, generate
+            # it only once.
+            doc = Doc()
+            doc.stag("meta", charset="utf-8")
+            if not self.bundle_assets:
+                doc.stag("link", rel="stylesheet", href=self.bootstrap)
+            for style in self._assets():
+                href = self._asset_files.get(style, style)
+                doc.stag("link", rel="stylesheet",
+                         href=os.path.join(path, href))
+            head = doc.getvalue()
+            self._head_cache[path] = head
+        self.doc.asis(head)
+
+    def _assets(self) -> Dict[str, str]:
+        """
+        Returns the stylesheets used by the generated pages as a map from
+        their names to their contents.
+        """
+        assets = dict()
+        if self.bundle_assets:
+            assets[self.bootstrap_style] = css.bootstrap_css
+
+        option_sets = self._diff_option_sets()
+        if self.highlight_syntax or any(highlight
+                                        for _, highlight in option_sets):
+            if self._pygments_css is None:
+                style = self.formatter.get_style_defs(
+                    '.highlight').split("\n")
+                # Remove lines with background-color since we want to set
+                # that separately.
+                style = list(filter(lambda x: "background:" not in x, style))
+                self._pygments_css = "\n".join(style)
+            assets[self.pygments_style] = self._pygments_css
+
+        assets[self.htmlgen_style] = css.htmlgen_css
+        if any(graphical for graphical, _ in option_sets):
+            assets[self.htmlgen_style] += css.htmlgen_css_maxwidth
+        if self.compare_dir is not None:
+            assets[self.htmlgen_style] += css.htmlgen_css_delta
+        if self.callstack_diff:
+            assets[self.htmlgen_style] += css.htmlgen_css_callstack_diff
+        if self.views:
+            assets[self.htmlgen_style] += self._views_css()
+        return assets
+
+    def _asset_filename(self, name: str, content: str) -> str:
+        """
+        Returns the name of the file to which the asset is written. Bundled
+        assets contain a hash of their content in the name so that they can be
+        cached by browsers indefinitely.
+        """
+        if not self.bundle_assets:
+            return name
+        root, ext = os.path.splitext(name)
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        return root + "." + digest[:self.asset_hash_length] + ext
+
+    def _asset_pattern(self) -> Pattern[str]:
+        """
+        Returns a pattern matching the names of files of all assets, also
+        bundled ones (see _asset_filename).
+        """
+        roots = "|".join(re.escape(os.path.splitext(name)[0])
+                         for name in [self.bootstrap_style,
+                                      self.htmlgen_style,
+                                      self.pygments_style])
+        return re.compile(r"(?:{})(?:\.[0-9a-f]{{{}}})?\.css".format(
+            roots, self.asset_hash_length))
+
+    def _write_asset(self, filename: str, content: str) -> None:
+        """Writes an asset to the output directory unless it is unchanged."""
+        path = os.path.join(self.output_dir, filename)
+        if self.bundle_assets and self.output.exists(path):
+            # The name of the file is derived from its content.
+            self.output.skipped += 1
+            return
+        self.output.write(path, content)
 
     def _generate_internal_symbol_table(
-            self, differences: Dict[str, Difference]) -> None:
-        """Generates a table listing all differences with links to them."""
+            self, differences: Dict[str, Difference],
+            impact: Optional['ImpactStatistics'] = None) -> None:
+        """
+        Generates a table listing all differences with links to them. If
+        impact statistics are given, the table is sortable and contains
+        the number of affected KABI symbols.
+        """
         line, tag = self.doc.line, self.tag
 
-        with tag("table", klass="table"):
+        with tag("table", klass="table sortable" if impact else "table"):
             with tag("thead"):
                 with tag("tr"):
                     line("th", "symbol", scope="col")
                     line("th", "kind", scope="col")
+                    if impact:
+                        line("th", "affected KABI symbols", scope="col")
             with tag("tbody"):
-                for difference in differences.values():
-                    href = difference.symbol_old.name + ".html"
+                for name, difference in differences.items():
+                    href = self._page(difference.symbol_old)
                     with tag("tr"):
                         with tag("td"):
                             line("a", difference.symbol_old.name, href=href)
                         line("td", difference.symbol_old.kind)
+                        if impact:
+                            line("td", str(impact.fan_out[
+                                impact.difference_index[name]]))
 
     def _generate_external_symbol_table(
             self,
-            external_symbols: Dict[ExternalSymbol, List[Affection]]) -> None:
+            external_symbols: Iterable[ExternalSymbol],
+            impact: Optional['ImpactStatistics'] = None) -> None:
+        """
+        Generates a table listing KABI symbols with links to them. If impact
+        statistics are given, the table is sortable and contains the number
+        of differences affecting the symbols and the shortest callstacks.
+        """
         line, tag = self.doc.line, self.tag
 
-        with tag("table", klass="table"):
+        with tag("table", klass="table sortable" if impact else "table"):
             with tag("thead"):
                 with tag("tr"):
                     line("th", "symbol", scope="col")
                     line("th", "kind", scope="col")
+                    if impact:
+                        line("th", "differing symbols", scope="col")
+                        line("th", "min. callstack depth", scope="col")
             with tag("tbody"):
-                for symbol in external_symbols.keys():
-                    href = ("kabi/" + symbol.name + "-" + str(symbol.kind) +
-                            ".html")
+                for symbol in external_symbols:
+                    href = self._page(symbol)
                     with tag("tr"):
                         with tag("td"):
                             line("a", symbol.name, href=href)
                         line("td", symbol.kind)
+                        if impact:
+                            index = impact.external_symbol_index[symbol]
+                            line("td", str(impact.fan_in[index]))
+                            line("td", impact.depth(index))
+
+    def _generate_impact_summary(self, impact: 'ImpactStatistics') -> None:
+        """
+        Generates totals of symbols by kinds and a list of the most impacted
+        KABI symbols.
+        """
+        tag, text = self.tag, self.text
+        kind_totals: List[Tuple[str, Dict[Any, int]]] = [
+            ("differing", impact.internal_kind_totals),
+            ("affected KABI", impact.external_kind_totals)]
+
+        with tag("li"):
+            text("totals:")
+            with tag("ul"):
+                for heading, totals in kind_totals:
+                    with tag("li"):
+                        text("{} symbols: {}".format(
+                            heading, ", ".join(
+                                "{} {}".format(count, kind)
+                                for kind, count in totals.items() if count)
+                            or "0"))
+        with tag("li"):
+            text(self.most_impacted_heading)
+            self._generate_external_symbol_table(
+                [impact.external_symbols[index] for index in
+                 impact.most_impacted(self.most_impacted_count)], impact)
+
+    def _generate_delta_table(self, deltas: List['SymbolDelta']) -> None:
+        """
+        Generates a table listing the symbols whose results have changed
+        since the previous run, with links to the current ones.
+        """
+        from diffkemp_htmlgen.compare import SymbolDelta
+        line, tag, text = self.doc.line, self.tag, self.text
+
+        with tag("table", klass="table"):
+            with tag("thead"):
+                with tag("tr"):
+                    line("th", "symbol", scope="col")
+                    line("th", "change", scope="col")
+                    line("th", "details", scope="col")
+            with tag("tbody"):
+                for delta in deltas:
+                    if delta.status == SymbolDelta.Status.UNCHANGED:
+                        continue
+                    page = (self._file_pages.get(delta.path)
+                            if delta.path is not None else None)
+                    with tag("tr"):
+                        with tag("td"):
+                            if page is None:
+                                text(delta.symbol_name)
+                            else:
+                                line("a", delta.symbol_name, href=page)
+                        line("td", str(delta.status),
+                             klass="delta " + str(delta.status))
+                        with tag("td"):
+                            text(", ".join(delta.changes))
+
+    def _generate_delta_page(self, deltas: List['SymbolDelta']) -> None:
+        """Generates a page with changes since the previous results."""
+        from diffkemp_htmlgen.compare import SymbolDelta
+        self.doc, self.tag, self.text = Doc().tagtext()
+
+        with self.tag("html", lang="en"):
+            with self.tag("head"):
+                with self.tag("title"):
+                    self.text(self.delta_page_title)
+                self._generate_head()
+            with self.tag("body", klass="py-4"):
+                with self.tag("div", klass="container"):
+                    with self.tag("h1"):
+                        self.text(self.delta_page_title)
+                    with self.tag("p"):
+                        with self.tag("a", href="index.html"):
+                            self.text(self.home_link_text)
+                    with self.tag("ul"):
+                        for status in SymbolDelta.Status:
+                            with self.tag("li"):
+                                self.text("{}: {}".format(
+                                    status, sum(1 for delta in deltas
+                                                if delta.status == status)))
+                    self._generate_delta_table(deltas)
+
+        self.output.write(os.path.join(self.output_dir, self.delta_page),
+                          indent(self.doc.getvalue()))
+
+    def _generate_report_page(self) -> None:
+        """Generates a page listing the input files that failed."""
+        self.doc, self.tag, self.text = Doc().tagtext()
+        line, tag, text = self.doc.line, self.tag, self.text
+
+        with tag("html", lang="en"):
+            with tag("head"):
+                with tag("title"):
+                    text(self.report_page_title)
+                self._generate_head()
+            with tag("body", klass="py-4"):
+                with tag("div", klass="container"):
+                    with tag("h1"):
+                        text(self.report_page_title)
+                    with tag("p"):
+                        with tag("a", href="index.html"):
+                            text(self.home_link_text)
+                    with tag("p"):
+                        text("{} file(s) could not be processed.".format(
+                            len(self.failures)))
+                    with tag("table", klass="table"):
+                        with tag("thead"):
+                            with tag("tr"):
+                                line("th", "file", scope="col")
+                                line("th", "phase", scope="col")
+                                line("th", "error", scope="col")
+                        with tag("tbody"):
+                            for failure in self.failures:
+                                with tag("tr"):
+                                    line("td", failure.filename)
+                                    line("td", str(failure.phase))
+                                    with tag("td"):
+                                        line("pre", failure.error)
+                    if self.fallbacks:
+                        self._generate_fallback_table()
+
+        self.output.write(os.path.join(self.output_dir, self.report_page),
+                          indent(self.doc.getvalue()))
+
+    def _generate_search_page(self) -> None:
+        """
+        Generates a page searching the diffs and writes the index it uses.
+        """
+        assert self._search is not None
+        self.doc, self.tag, self.text = Doc().tagtext()
+        tag, text = self.tag, self.text
+
+        with tag("html", lang="en"):
+            with tag("head"):
+                with tag("title"):
+                    text(self.search_page_title)
+                self._generate_head()
+            with tag("body", klass="py-4"):
+                with tag("div", klass="container"):
+                    with tag("h1"):
+                        text(self.search_page_title)
+                    with tag("p"):
+                        with tag("a", href="index.html"):
+                            text(self.home_link_text)
+                    self.doc.stag("input", type="search", id="search-input",
+                                  placeholder="identifiers, e.g. GFP_DMA",
+                                  klass="form-control")
+                    self.doc.line("p", "", id="search-status")
+                    self.doc.line("ul", "", id="search-results")
+                with tag("script"):
+                    self.doc.asis(js.search_js)
+                self.doc.line("script", "",
+                              src=self.search_dir + "/documents.js")
+
+        self.output.write(os.path.join(self.output_dir, self.search_page),
+                          indent(self.doc.getvalue()))
+
+        search_dir = os.path.join(self.output_dir, self.search_dir)
+        self.output.make_directory(search_dir)
+        written = []
+
+        def write(filename: str, content: str) -> None:
+            written.append(filename)
+            self.output.write(os.path.join(search_dir, filename), content)
+        self._search.write(write)
+        # Remove shards of previous runs with more shards.
+        self.output.remove_others(search_dir, self.search_shard_pattern,
+                                  written)
+
+    def _generate_fallback_table(self) -> None:
+        """
+        Generates a table listing the diffs rendered as plain text since they
+        exceeded the budget of their pages.
+        """
+        line, tag, text = self.doc.line, self.tag, self.text
+
+        with tag("p"):
+            text("{} diff(s) were rendered as plain text.".format(
+                len(self.fallbacks)))
+        with tag("table", klass="table"):
+            with tag("thead"):
+                with tag("tr"):
+                    line("th", "symbol", scope="col")
+                    line("th", "reason", scope="col")
+            with tag("tbody"):
+                for fallback in self.fallbacks:
+                    with tag("tr"):
+                        with tag("td"):
+                            line("a", fallback.symbol_name,
+                                 href=fallback.page)
+                        line("td", fallback.reason)
 
     def generate(self) -> None:
         """
-        Converts YAMLs in self.input_dir into HTML files and puts them into
-        self.output_dir.
+        Converts YAMLs in self.input_dir into HTML files (and other enabled
+        output formats) and puts them into self.output_dir.
         """
-        if not os.path.exists(self.output_dir):
-            os.mkdir(self.output_dir)
-        kabi_output_dir = os.path.join(self.output_dir, "kabi")
-        if not os.path.exists(kabi_output_dir):
-            os.mkdir(kabi_output_dir)
+        self._start_run()
+        self._generate(self._collect_differences(self.input_dir))
+
+    def generate_from(
+            self,
+            differences: Iterable[Union[Difference, Dict[str, Any]]]) -> None:
+        """
+        Converts differences that are already loaded into HTML files (and
+        other enabled output formats) written by self.output into
+        self.output_dir. The differences are either Difference objects or
+        dictionaries in the format of the YAML files generated by DiffKemp.
+        Comparing to previous results is not supported.
+        """
+        if self.compare_dir is not None:
+            raise ValueError("Previous results can only be compared to an "
+                             "input directory")
+        self._start_run()
+        self._generate(self._load_differences(differences))
+
+    def _start_run(self) -> None:
+        self.output.make_directory(self.output_dir)
+        self.failures = []
+        self.fallbacks = []
+        self._over_budget = set()
+        self._difference_files = dict()
+        self._pages = self._page_names()
+        self._file_pages = dict()
+
+    def _generate(self, differences: Dict[str, Difference]) -> None:
+        """Generates the output from the collected differences."""
+        external_symbols = self._collect_external_symbols(differences)
+        self.difference_count = len(differences)
+        self.external_symbol_count = len(external_symbols)
+
+        if self.ndjson:
+            from diffkemp_htmlgen.export import write_ndjson
+            with self.output.open(os.path.join(self.output_dir,
+                                               self.ndjson_file)) as f:
+                write_ndjson(external_symbols.items(), f)
+        if not self.html:
+            return
+
+        if self.old_source_dir is not None or self.new_source_dir is not None:
+            from diffkemp_htmlgen.sources import SourceTree
+            if self.old_source_dir is not None:
+                self.old_sources = SourceTree(self.old_source_dir)
+            if self.new_source_dir is not None:
+                self.new_sources = SourceTree(self.new_source_dir)
+        try:
+            self._generate_html(differences, external_symbols)
+        finally:
+            for sources in [self.old_sources, self.new_sources]:
+                if sources is not None:
+                    sources.close()
+            self.old_sources = self.new_sources = None
+
+    def _generate_html(
+            self, differences: Dict[str, Difference],
+            external_symbols: Dict[ExternalSymbol, List[Affection]]) -> None:
+        """Generates the HTML pages, stylesheets included."""
+        self.output.make_directory(os.path.join(self.output_dir, "kabi"))
+
+        assets = self._assets()
+        self._asset_files = {name: self._asset_filename(name, content)
+                             for name, content in assets.items()}
+        self._head_cache = dict()
+        # Pages of KABI symbols are assigned in their order, so that they do
+        # not depend on the order in which the differences link them.
+        for symbol in external_symbols:
+            self._add_page(symbol)
+
+        if self.search_index:
+            from diffkemp_htmlgen.search import SearchIndex
+            self._search = SearchIndex()
 
         # Create pages with found differences.
-        differences = self._collect_differences(self.input_dir)
-        for difference in differences.values():
+        self._count_diffs(differences.values())
+        failed = []
+        for name, difference in differences.items():
             self.doc, self.tag, self.text = Doc().tagtext()
-
-            self.doc.asis('<!DOCTYPE html>')
-            with self.tag("html", lang="en"):
-                with self.tag("head"):
-                    with self.tag("title"):
-                        self.text(difference.symbol_old.name)
-                    self._generate_head()
-                with self.tag("body", klass="py-4"):
-                    with self.tag("div", klass="container"):
-                        self._difference_to_html(difference)
-
-            with open(os.path.join(self.output_dir,
-                                   difference.symbol_old.name + ".html"),
-                      "w") as f:
-                f.write(indent(self.doc.getvalue()))
+            self._streamed_diffs = []
+            self._page_fallbacks = []
+            if self.page_time_budget is not None:
+                self._page_deadline = time.monotonic() + self.page_time_budget
+            path = os.path.join(self.output_dir,
+                                self._page(difference.symbol_old))
+
+            try:
+                self.doc.asis('<!DOCTYPE html>')
+                with self.tag("html", lang="en"):
+                    with self.tag("head"):
+                        with self.tag("title"):
+                            self.text(difference.symbol_old.name)
+                        self._generate_head()
+                    with self.tag("body", klass="py-4"):
+                        with self.tag("div", klass="container"):
+                            self._difference_to_html(difference)
+                self._write_page(path)
+                if self._search is not None:
+                    self._search.add(difference.symbol_old.name,
+                                     self._page(difference.symbol_old),
+                                     self._page_diff)
+                self.fallbacks.extend(
+                    Fallback(self._page(difference.symbol_old),
+                             difference.symbol_old.name, reason)
+                    for reason in self._page_fallbacks)
+            except Exception as exception:
+                if not self.keep_going:
+                    raise
+                self.failures.append(Failure.from_exception(
+                    self._difference_files.get(name, name),
+                    Failure.Phase.RENDER, exception))
+                failed.append(name)
+        self._streamed_diffs = []
+        self._page_deadline = None
+        self._page_diff = ""
+
+        if failed:
+            # Do not link pages of differences that failed to render.
+            for name in failed:
+                del differences[name]
+                self._file_pages.pop(self._difference_files.get(name, name),
+                                     None)
+            external_symbols = self._collect_external_symbols(differences)
+
+        # Rendered diffs are not needed anymore.
+        self._diff_cache = dict()
+        self._diff_counts = dict()
 
         # Create pages with KABI symbols.
-        external_symbols = self._collect_external_symbols(differences)
+        failed_symbols = []
         for symbol, affections in external_symbols.items():
             self.doc, self.tag, self.text = Doc().tagtext()
 
-            self.doc.asis('<!DOCTYPE html>')
-            with self.tag("html", lang="en"):
-                with self.tag("head"):
-                    with self.tag("title"):
-                        self.text(symbol.name)
-                    self._generate_head(path="..")
-                with self.tag("body", klass="py-4"):
-                    with self.tag("div", klass="container"):
-                        self._external_symbol_to_html(symbol, affections)
-
-            with open(os.path.join(kabi_output_dir, symbol.name + "-" +
-                                   str(symbol.kind) + ".html"),
-                      "w") as f:
-                f.write(indent(self.doc.getvalue()))
+            try:
+                self.doc.asis('<!DOCTYPE html>')
+                with self.tag("html", lang="en"):
+                    with self.tag("head"):
+                        with self.tag("title"):
+                            self.text(symbol.name)
+                        self._generate_head(path="..")
+                    with self.tag("body", klass="py-4"):
+                        with self.tag("div", klass="container"):
+                            self._external_symbol_to_html(symbol, affections)
+
+                self.output.write(os.path.join(self.output_dir,
+                                               self._page(symbol)),
+                                  indent(self.doc.getvalue()))
+            except Exception as exception:
+                if not self.keep_going:
+                    raise
+                # There is no input file of the page, report the page.
+                self.failures.append(Failure.from_exception(
+                    self._page(symbol), Failure.Phase.RENDER, exception))
+                failed_symbols.append(symbol)
+        # Do not link pages of KABI symbols that failed to render.
+        for symbol in failed_symbols:
+            del external_symbols[symbol]
+
+        # Aligned callstacks are not needed anymore.
+        self._divergence_cache = dict()
+
+        deltas: List['SymbolDelta'] = []
+        if self.compare_dir is not None:
+            from diffkemp_htmlgen.compare import compare_results
+            # Files of the input directory that failed are already recorded.
+            compare_failures: List[Failure] = []
+            deltas = compare_results(
+                self.compare_dir, self.input_dir,
+                {path: differences[key]
+                 for key, path in self._difference_files.items()
+                 if key in differences},
+                compare_failures if self.keep_going else None,
+                self.symbol_filter)
+            recorded = set(failure.filename for failure in self.failures)
+            self.failures.extend(failure for failure in compare_failures
+                                 if failure.filename not in recorded)
 
         # Create main page.
+        from diffkemp_htmlgen.impact import ImpactStatistics
+        impact = ImpactStatistics(differences)
         self.doc, self.tag, self.text = Doc().tagtext()
 
         with self.tag("html", lang="en"):
@@ -657,51 +2010,300 @@ class HTMLGenerator:
                 with self.tag("div", klass="container"):
                     with self.tag("h1"):
                         self.text(self.main_page_title)
+                    if self.compare_dir is not None:
+                        with self.tag("p"):
+                            with self.tag("a", href=self.delta_page):
+                                self.text(self.delta_page_title)
+                    if self.failures:
+                        with self.tag("p"):
+                            with self.tag("a", href=self.report_page):
+                                self.text("{} file(s) could not be "
+                                          "processed".format(
+                                              len(self.failures)))
+                    if self._search is not None:
+                        with self.tag("p"):
+                            with self.tag("a", href=self.search_page):
+                                self.text(self.search_page_title)
+                    if self.fallbacks:
+                        with self.tag("p"):
+                            with self.tag("a", href=self.report_page):
+                                self.text("{} diff(s) rendered as plain "
+                                          "text".format(len(self.fallbacks)))
                     with self.tag("ul"):
+                        self._generate_impact_summary(impact)
                         with self.tag("li"):
                             self.text(self.internal_symbol_heading)
-                            self._generate_internal_symbol_table(differences)
+                            self._generate_internal_symbol_table(differences,
+                                                                 impact)
                         with self.tag("li"):
                             self.text(self.external_symbol_heading)
                             self._generate_external_symbol_table(
-                                external_symbols)
+                                external_symbols.keys(), impact)
+                    with self.tag("script"):
+                        self.doc.asis(js.sortable_tables_js)
 
         # Create index page.
-        with open(os.path.join(self.output_dir, "index.html"), "w") as f:
-            f.write(indent(self.doc.getvalue()))
-
-        # Generate pygments style.
-        with open(os.path.join(self.output_dir, self.pygments_style),
-                  "w") as f:
-            style = self.formatter.get_style_defs('.highlight').split("\n")
-            # Remove lines with background-color since we want to set that
-            # separately.
-            style = list(filter(lambda x: "background:" not in x, style))
-            f.write("\n".join(style))
-
-        # Write htmlgen style.
-        with open(os.path.join(self.output_dir, self.htmlgen_style),
-                  "w") as f:
-            f.write(css.htmlgen_css)
-            if self.graphical_diff:
-                f.write(css.htmlgen_css_maxwidth)
+        self.output.write(os.path.join(self.output_dir, "index.html"),
+                          indent(self.doc.getvalue()))
+
+        if self.keep_going or self.fallbacks:
+            self._generate_report_page()
+
+        if self._search is not None:
+            self._generate_search_page()
+            self._search = None
+
+        if self.compare_dir is not None:
+            self._generate_delta_page(deltas)
+
+        # Write stylesheets and remove the ones of previous runs, bundled
+        # stylesheets of previous runs have different names.
+        for name, content in assets.items():
+            self._write_asset(self._asset_files[name], content)
+        self.output.remove_others(self.output_dir, self._asset_pattern(),
+                                  self._asset_files.values())
+
+    def generate_batch(self, pairs: List[Tuple[str, str]],
+                       index_path: Optional[str] = None) -> None:
+        """
+        Runs generate for each pair of input and output directories. All runs
+        share this generator, including its highlighting cache and pool of
+        processes. If index_path is given, a page linking the results of all
+        runs is created there.
+        """
+        if self.jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(self.jobs)
+
+        summaries = []
+        try:
+            for input_dir, output_dir in pairs:
+                self.input_dir = input_dir
+                self.output_dir = output_dir
+                self.generate()
+                summaries.append((input_dir, output_dir,
+                                  self.difference_count,
+                                  self.external_symbol_count,
+                                  len(self.failures)))
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+        if index_path is None:
+            return
+
+        # Create the overview page.
+        self.doc, self.tag, self.text = Doc().tagtext()
+        line, tag, text = self.doc.line, self.tag, self.text
+        index_dir = os.path.dirname(os.path.abspath(index_path))
+
+        with tag("html", lang="en"):
+            with tag("head"):
+                with tag("title"):
+                    text(self.batch_page_title)
+                self.doc.stag("meta", charset="utf-8")
+                if not self.bundle_assets:
+                    self.doc.stag("link", rel="stylesheet",
+                                  href=self.bootstrap)
+            with tag("body", klass="py-4"):
+                with tag("div", klass="container"):
+                    with tag("h1"):
+                        text(self.batch_page_title)
+                    with tag("table", klass="table"):
+                        with tag("thead"):
+                            with tag("tr"):
+                                line("th", "results", scope="col")
+                                line("th", "differing symbols", scope="col")
+                                line("th", "affected KABI symbols",
+                                     scope="col")
+                                line("th", "failed files", scope="col")
+                        with tag("tbody"):
+                            for (input_dir, output_dir, differences,
+                                 external_symbols, failures) in summaries:
+                                href = os.path.relpath(
+                                    os.path.join(os.path.abspath(output_dir),
+                                                 "index.html"), index_dir)
+                                with tag("tr"):
+                                    with tag("td"):
+                                        line("a", input_dir, href=href)
+                                    line("td", str(differences))
+                                    line("td", str(external_symbols))
+                                    line("td", str(failures))
+
+        self.output.write(index_path, indent(self.doc.getvalue()))
+
+
+def read_manifest(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads a manifest with pairs of input and output directories separated by
+    whitespace, one pair per line. Empty lines and lines starting with # are
+    ignored. Relative paths are relative to the directory of the manifest.
+    """
+    base = os.path.dirname(path)
+    pairs = []
+    with open(path, "r") as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split()
+            if len(fields) != 2:
+                raise ValueError("{}:{}: expected an input and an output "
+                                 "directory".format(path, number))
+            pairs.append((os.path.join(base, fields[0]),
+                          os.path.join(base, fields[1])))
+    return pairs
+
+
+def parse_views(views: str) -> List[str]:
+    """Parses a comma-separated list of views of diffs."""
+    result = [view.strip() for view in views.split(",")]
+    for view in result:
+        if view not in HTMLGenerator.view_options:
+            raise argparse.ArgumentTypeError("unknown view: " + view)
+    return result
+
+
+def symbol_filter_from_args(args: argparse.Namespace)\
+        -> Optional['SymbolFilter']:
+    """Creates a filter from the command line arguments if any is given."""
+    kabi_symbols = list(args.kabi or [])
+    if args.kabi_list is not None:
+        with open(args.kabi_list, "r") as f:
+            kabi_symbols += [line.strip() for line in f if line.strip()]
+    if not (args.name or args.name_regex or args.path or args.kind or
+            kabi_symbols):
+        return None
+
+    from diffkemp_htmlgen.filters import SymbolFilter
+    return SymbolFilter(args.name, args.name_regex, args.path,
+                        [InternalSymbol.Kind.from_yaml(kind)
+                         for kind in args.kind or []],
+                        kabi_symbols)
 
 
 def run_from_cli() -> None:
     parser = argparse.ArgumentParser(description="Converts YAML files" +
                                      " generated by DiffKemp into " +
                                      "human-readable HTML pages.")
-    parser.add_argument("input_dir", help="directory containing YAML files" +
-                                          " generated by DiffKemp")
-    parser.add_argument("output_dir", help="directory where the HTML output" +
-                                           " will be generated")
+    parser.add_argument("input_dir", nargs="?",
+                        help="directory containing YAML files generated by " +
+                             "DiffKemp")
+    parser.add_argument("output_dir", nargs="?",
+                        help="directory where the HTML output will be " +
+                             "generated")
     parser.add_argument("--graphical-diffs", help="parse and format diffs",
                         action="store_true")
     parser.add_argument("--highlight-syntax",
                         help="enable diff syntax highlighting",
                         action="store_true")
+    parser.add_argument("--bundle-assets",
+                        help="use bundled stylesheets instead of a CDN and " +
+                             "name them by their content hash",
+                        action="store_true")
+    parser.add_argument("--compare-to", metavar="PREVIOUS_INPUT_DIR",
+                        help="generate a page with changes since the " +
+                             "results in the given directory")
+    parser.add_argument("--ndjson",
+                        help="export KABI symbols with the symbols " +
+                             "affecting them as newline-delimited JSON",
+                        action="store_true")
+    parser.add_argument("--no-html", help="do not generate HTML pages",
+                        action="store_true")
+    parser.add_argument("--keep-going",
+                        help="skip files that cannot be processed and list " +
+                             "them in " + HTMLGenerator.report_page,
+                        action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of processes used to parse input files")
+    parser.add_argument("--old-src", metavar="DIR",
+                        help="old kernel source tree, used to show the " +
+                             "code of symbols and calls")
+    parser.add_argument("--new-src", metavar="DIR",
+                        help="new kernel source tree, used to show the " +
+                             "code of symbols and calls")
+    parser.add_argument("--callstack-graph",
+                        help="merge callstacks on pages of KABI symbols " +
+                             "into call graphs",
+                        action="store_true")
+    parser.add_argument("--callstack-diff",
+                        help="show old and new callstacks side by side " +
+                             "with changed calls marked",
+                        action="store_true")
+    parser.add_argument("--views", type=parse_views, metavar="VIEW,...",
+                        help="render the given views of diffs on each page " +
+                             "with a switch between them (views: " +
+                             ", ".join(HTMLGenerator.view_options) + ")")
+    parser.add_argument("--name", metavar="GLOB", action="append",
+                        help="process only symbols whose names match " +
+                             "the pattern (can be used multiple times)")
+    parser.add_argument("--name-regex", metavar="REGEX",
+                        help="process only symbols whose names match " +
+                             "the regular expression")
+    parser.add_argument("--path", metavar="PREFIX", action="append",
+                        help="process only symbols defined in files " +
+                             "starting with the prefix (can be used " +
+                             "multiple times)")
+    parser.add_argument("--kind", action="append",
+                        choices=["function", "macro", "type"],
+                        help="process only symbols of the kind (can be " +
+                             "used multiple times)")
+    parser.add_argument("--kabi", metavar="SYMBOL", action="append",
+                        help="process only differences affecting the KABI " +
+                             "symbol (can be used multiple times)")
+    parser.add_argument("--kabi-list", metavar="FILE",
+                        help="file with names of KABI symbols to process, " +
+                             "one per line")
+    parser.add_argument("--cache",
+                        help="keep the parsed results in a cache in the " +
+                             "output directory and reuse them for " +
+                             "unchanged input files",
+                        action="store_true")
+    parser.add_argument("--page-time-budget", type=float, metavar="SECONDS",
+                        help="render diffs of pages that take longer as " +
+                             "plain text and list them in " +
+                             HTMLGenerator.report_page)
+    parser.add_argument("--page-size-budget", type=int, metavar="CHARS",
+                        help="render longer diffs as plain text and list " +
+                             "them in " + HTMLGenerator.report_page)
+    parser.add_argument("--search-index",
+                        help="index the diffs and create a page searching " +
+                             "them by identifiers",
+                        action="store_true")
+    parser.add_argument("--batch", nargs=2, action="append", default=[],
+                        metavar=("INPUT_DIR", "OUTPUT_DIR"),
+                        help="process another pair of directories with the " +
+                             "same options in the same process (can be " +
+                             "used multiple times)")
+    parser.add_argument("--manifest", metavar="FILE",
+                        help="file with pairs of input and output " +
+                             "directories to process, one pair per line")
+    parser.add_argument("--batch-index", metavar="FILE",
+                        help="create a page linking the results of all " +
+                             "processed directories")
     args = parser.parse_args()
 
-    generator = HTMLGenerator(args.input_dir, args.output_dir,
-                              args.graphical_diffs, args.highlight_syntax)
-    generator.generate()
+    pairs = list(args.batch)
+    if args.input_dir is not None and args.output_dir is not None:
+        pairs.insert(0, (args.input_dir, args.output_dir))
+    elif args.input_dir is not None:
+        parser.error("output_dir is required")
+    if args.manifest is not None:
+        pairs += read_manifest(args.manifest)
+    if not pairs:
+        parser.error("input_dir and output_dir or --manifest is required")
+
+    generator = HTMLGenerator("", "",
+                              args.graphical_diffs, args.highlight_syntax,
+                              args.bundle_assets, args.compare_to,
+                              not args.no_html, args.ndjson,
+                              args.keep_going, args.jobs, args.old_src,
+                              args.new_src, args.callstack_graph,
+                              args.callstack_diff, args.views,
+                              symbol_filter_from_args(args), args.cache,
+                              args.page_time_budget, args.page_size_budget,
+                              args.search_index)
+    generator.generate_batch(pairs, args.batch_index)
+    print("{} files written, {} unchanged".format(generator.output.written,
+                                                  generator.output.skipped))
@@ -0,0 +1,73 @@
+import heapq
+from array import array
+from diffkemp_htmlgen.htmlgen import Difference, ExternalSymbol, InternalSymbol
+from typing import Dict, List
+
+
+class ImpactStatistics:
+    """
+    Statistics of how the differences affect KABI symbols. All of them are
+    computed in a single pass over the affections and stored in arrays indexed
+    by the positions of the differences and KABI symbols.
+    """
+    # Depth of KABI symbols with no callstacks.
+    no_depth = 0xFFFFFFFF
+
+    def __init__(self, differences: Dict[str, Difference]):
+        # Keys of the differences and KABI symbols by their indices.
+        self.difference_names: List[str] = list(differences.keys())
+        self.external_symbols: List[ExternalSymbol] = []
+        self.external_symbol_index: Dict[ExternalSymbol, int] = dict()
+        self.difference_index = {name: index for index, name
+                                 in enumerate(self.difference_names)}
+        # Number of KABI symbols affected by each difference.
+        self.fan_out = array("I", bytes(4 * len(differences)))
+        # Number of differences affecting each KABI symbol.
+        self.fan_in = array("I")
+        # Length of the shortest callstack leading to each KABI symbol.
+        self.min_depth = array("I")
+        self.internal_kind_totals = {kind: 0 for kind in InternalSymbol.Kind}
+        self.external_kind_totals = {kind: 0 for kind in ExternalSymbol.Kind}
+        self.affection_count = 0
+
+        # Index of the last difference affecting each KABI symbol, used to
+        # count every difference only once.
+        last_difference = array("i")
+        for index, difference in enumerate(differences.values()):
+            self.internal_kind_totals[difference.symbol_old.kind] += 1
+            for affection in difference.affected_symbols:
+                symbol = affection.symbol
+                assert isinstance(symbol, ExternalSymbol)
+
+                symbol_index = self.external_symbol_index.get(symbol)
+                if symbol_index is None:
+                    symbol_index = len(self.external_symbols)
+                    self.external_symbol_index[symbol] = symbol_index
+                    self.external_symbols.append(symbol)
+                    self.external_kind_totals[symbol.kind] += 1
+                    self.fan_in.append(0)
+                    self.min_depth.append(self.no_depth)
+                    last_difference.append(-1)
+
+                self.affection_count += 1
+                # The new callstack is used, unless it is missing.
+                depth = len(affection.callstack_new or affection.callstack_old)
+                if depth < self.min_depth[symbol_index]:
+                    self.min_depth[symbol_index] = depth
+                if last_difference[symbol_index] != index:
+                    last_difference[symbol_index] = index
+                    self.fan_in[symbol_index] += 1
+                    self.fan_out[index] += 1
+
+    def most_impacted(self, count: int) -> List[int]:
+        """
+        Returns indices of the given number of KABI symbols affected by the
+        most differences.
+        """
+        return heapq.nlargest(count, range(len(self.external_symbols)),
+                              key=self.fan_in.__getitem__)
+
+    def depth(self, symbol_index: int) -> str:
+        """Returns the minimum callstack depth of a KABI symbol as text."""
+        depth = self.min_depth[symbol_index]
+        return "" if depth == self.no_depth else str(depth)
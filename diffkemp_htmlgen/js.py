@@ -0,0 +1,154 @@
+# Makes tables with the sortable class sortable by clicking on the column
+# headers. Numeric columns are sorted by value.
+sortable_tables_js = """
+document.querySelectorAll("table.sortable th").forEach(function (th) {
+    th.style.cursor = "pointer";
+    th.addEventListener("click", function () {
+        var body = th.closest("table").tBodies[0];
+        var column = Array.prototype.indexOf.call(th.parentNode.children, th);
+        var descending = th.dataset.order !== "desc";
+        th.dataset.order = descending ? "desc" : "asc";
+        var rows = Array.prototype.slice.call(body.rows);
+        rows.sort(function (a, b) {
+            var x = a.cells[column].textContent;
+            var y = b.cells[column].textContent;
+            var result = x.localeCompare(y);
+            if (!isNaN(parseFloat(x)) && !isNaN(parseFloat(y))) {
+                result = parseFloat(x) - parseFloat(y);
+            }
+            return descending ? -result : result;
+        });
+        rows.forEach(function (row) {
+            body.appendChild(row);
+        });
+    });
+});
+"""
+
+
+# Searches the index written by search.SearchIndex. Documents and shards are
+# JavaScript files calling setDocuments and addShard, so that they can be
+# loaded by script elements also from a local file system. The shard of a
+# token is computed the same way as by search.shard_of.
+search_js = """
+var diffkempSearch = (function () {
+    var documents = null;
+    var shardCount = 1;
+    var shards = {};
+    var callbacks = {};
+    var input = document.getElementById("search-input");
+    var status = document.getElementById("search-status");
+    var results = document.getElementById("search-results");
+
+    function shardOf(token) {
+        var value = 0x811c9dc5;
+        for (var i = 0; i < token.length; i++) {
+            value = Math.imul((value ^ token.charCodeAt(i)) >>> 0,
+                              0x01000193) >>> 0;
+        }
+        return value % shardCount;
+    }
+
+    function loadShard(index, callback) {
+        if (shards[index] !== undefined) {
+            callback();
+            return;
+        }
+        if (callbacks[index] !== undefined) {
+            callbacks[index].push(callback);
+            return;
+        }
+        callbacks[index] = [callback];
+        var script = document.createElement("script");
+        script.src = "search/shard-" + index + ".js";
+        document.body.appendChild(script);
+    }
+
+    function occurrences(token) {
+        var postings = shards[shardOf(token)][token] || [];
+        var lines = new Map();
+        for (var i = 0; i < postings.length; i += 2) {
+            if (!lines.has(postings[i])) {
+                lines.set(postings[i], []);
+            }
+            lines.get(postings[i]).push(postings[i + 1]);
+        }
+        return lines;
+    }
+
+    function show(tokens) {
+        var found = null;
+        tokens.forEach(function (token) {
+            var lines = occurrences(token);
+            if (found === null) {
+                found = lines;
+                return;
+            }
+            found.forEach(function (documentLines, id) {
+                if (lines.has(id)) {
+                    lines.get(id).forEach(function (line) {
+                        documentLines.push(line);
+                    });
+                } else {
+                    found.delete(id);
+                }
+            });
+        });
+        results.textContent = "";
+        status.textContent = found.size + " difference(s) found";
+        found.forEach(function (lines, id) {
+            var item = document.createElement("li");
+            var link = document.createElement("a");
+            link.href = documents[id][1];
+            link.textContent = documents[id][0];
+            item.appendChild(link);
+            lines.sort(function (a, b) { return a - b; });
+            lines = lines.filter(function (line, index) {
+                return index === 0 || line !== lines[index - 1];
+            });
+            item.appendChild(document.createTextNode(
+                " (lines of the diff: " + lines.join(", ") + ")"));
+            results.appendChild(item);
+        });
+    }
+
+    function search() {
+        var tokens = input.value.match(/[A-Za-z_][A-Za-z0-9_]+/g) || [];
+        if (documents === null) {
+            // Searched again when the documents are loaded.
+            return;
+        }
+        if (!tokens.length) {
+            results.textContent = "";
+            status.textContent = "";
+            return;
+        }
+        var query = input.value;
+        var remaining = tokens.length;
+        tokens.forEach(function (token) {
+            loadShard(shardOf(token), function () {
+                remaining -= 1;
+                if (remaining === 0 && input.value === query) {
+                    show(tokens);
+                }
+            });
+        });
+    }
+
+    input.addEventListener("input", search);
+    return {
+        setDocuments: function (loaded, count) {
+            documents = loaded;
+            shardCount = count;
+            search();
+        },
+        addShard: function (index, shard) {
+            shards[index] = shard;
+            (callbacks[index] || []).forEach(function (callback) {
+                callback();
+            });
+            delete callbacks[index];
+        }
+    };
+})();
+"""
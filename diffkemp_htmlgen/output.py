@@ -0,0 +1,183 @@
+import io
+import os
+from contextlib import contextmanager
+from typing import (Any, BinaryIO, Callable, Iterable, Iterator, Pattern,
+                    TextIO, Union)
+
+
+class OutputWriter:
+    """
+    Writes output files only if their content has changed, so that unchanged
+    files keep their modification times. Files are written into temporary
+    files first and atomically renamed, so that readers never see partially
+    written files.
+    """
+    # Size of blocks in which files are compared.
+    block_size = 1024 * 1024
+
+    def __init__(self) -> None:
+        # Numbers of written files, of files skipped since they have not
+        # changed and of removed files.
+        self.written = 0
+        self.skipped = 0
+        self.removed = 0
+
+    def _unchanged(self, path: str, content: bytes) -> bool:
+        try:
+            if os.stat(path).st_size != len(content):
+                return False
+            with open(path, "rb") as file:
+                return file.read() == content
+        except OSError:
+            return False
+
+    def _files_equal(self, path: str, other_path: str) -> bool:
+        try:
+            if os.stat(path).st_size != os.stat(other_path).st_size:
+                return False
+            with open(path, "rb") as file, open(other_path, "rb") as other:
+                while True:
+                    block = file.read(self.block_size)
+                    if block != other.read(self.block_size):
+                        return False
+                    if not block:
+                        return True
+        except OSError:
+            return False
+
+    def _temporary(self, path: str) -> str:
+        """
+        Returns the path of a temporary file next to the given path, which is
+        unique for this process.
+        """
+        directory, filename = os.path.split(path)
+        return os.path.join(directory,
+                            ".{}.{}.tmp".format(filename, os.getpid()))
+
+    def write(self, path: str, content: str) -> bool:
+        """
+        Writes the content into the file unless it already contains it.
+        Returns whether the file was written.
+        """
+        data = content.encode()
+        if self._unchanged(path, data):
+            self.skipped += 1
+            return False
+
+        temporary = self._temporary(path)
+        try:
+            with open(temporary, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        self.written += 1
+        return True
+
+    def make_directory(self, path: str) -> None:
+        """Creates a directory for output files unless it exists."""
+        if not os.path.exists(path):
+            os.mkdir(path)
+
+    def exists(self, path: str) -> bool:
+        """Returns whether the output file was written before."""
+        return os.path.exists(path)
+
+    def remove_others(self, directory: str, pattern: Pattern[str],
+                      kept: Iterable[str]) -> None:
+        """
+        Removes files in the directory whose names match the pattern except
+        for the kept ones, i.e. the files of previous runs that were not
+        written again.
+        """
+        kept = set(kept)
+        for filename in os.listdir(directory):
+            if pattern.fullmatch(filename) and filename not in kept:
+                os.remove(os.path.join(directory, filename))
+                self.removed += 1
+
+    @contextmanager
+    def open(self, path: str) -> Iterator[TextIO]:
+        """
+        Opens a temporary file for writing text that replaces the file on the
+        given path when it is closed, unless the content is the same.
+        """
+        temporary = self._temporary(path)
+        try:
+            with open(temporary, "w", encoding="utf-8") as file:
+                yield file
+            if self._files_equal(temporary, path):
+                os.remove(temporary)
+                self.skipped += 1
+                return
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        self.written += 1
+
+
+class CallbackWriter(OutputWriter):
+    """
+    Passes output files to a function instead of writing them, which is
+    called with the path and the content of every file. Generate into an
+    empty output directory to get paths relative to the root of the output.
+    """
+    def __init__(self, callback: Callable[[str, str], Any]):
+        super().__init__()
+        self.callback = callback
+
+    def write(self, path: str, content: str) -> bool:
+        self.callback(path, content)
+        self.written += 1
+        return True
+
+    def make_directory(self, path: str) -> None:
+        pass
+
+    def exists(self, path: str) -> bool:
+        return False
+
+    def remove_others(self, directory: str, pattern: Pattern[str],
+                      kept: Iterable[str]) -> None:
+        # There are no files of previous runs.
+        pass
+
+    @contextmanager
+    def open(self, path: str) -> Iterator[TextIO]:
+        file = io.StringIO()
+        yield file
+        self.write(path, file.getvalue())
+
+
+class ZipWriter(CallbackWriter):
+    """
+    Writes output files into a ZIP archive, which must be closed when the
+    output is generated. Entries have a fixed time, so that archives of the
+    same output are identical.
+    """
+    date_time = (1980, 1, 1, 0, 0, 0)
+
+    def __init__(self, file: Union[str, BinaryIO]):
+        import zipfile
+        self.archive = zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED)
+        super().__init__(self._write_entry)
+
+    def _write_entry(self, path: str, content: str) -> None:
+        import zipfile
+        entry = zipfile.ZipInfo(path.replace(os.sep, "/"),
+                                date_time=self.date_time)
+        entry.compress_type = zipfile.ZIP_DEFLATED
+        self.archive.writestr(entry, content)
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def __enter__(self) -> 'ZipWriter':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
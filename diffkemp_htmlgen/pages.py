@@ -0,0 +1,68 @@
+import hashlib
+from typing import Dict, Hashable, Iterable, Set
+
+
+class PageNames:
+    """
+    Assigns unique file names to the pages of symbols and looks them up when
+    generating links. A page is named after its symbol unless the name is
+    already taken (also when ignoring case, for case-insensitive file
+    systems) or too long. Then a short id derived from the identity of the
+    symbol (its name, kind and location) is appended to the name, which is
+    shortened if needed. Names of other pages in the output directory can be
+    reserved, so that no symbol gets them.
+    """
+    extension = ".html"
+    # Maximum length of a name in bytes, file systems usually limit file
+    # names to 255 bytes.
+    max_name_length = 200
+    # Number of hexadecimal digits of the id.
+    id_length = 8
+
+    def __init__(self, reserved: Iterable[str] = ()) -> None:
+        # Paths of pages relative to the output directory by their keys.
+        self.pages: Dict[Hashable, str] = dict()
+        self._taken: Set[str] = set(name.casefold() for name in reserved)
+
+    def _shorten(self, name: str) -> str:
+        encoded = name.encode()
+        if len(encoded) <= self.max_name_length:
+            return name
+        return encoded[:self.max_name_length].decode(errors="ignore")
+
+    def _take(self, directory: str, name: str) -> bool:
+        taken = (directory + name).casefold()
+        if taken in self._taken:
+            return False
+        self._taken.add(taken)
+        return True
+
+    def add(self, key: Hashable, name: str, identity: str,
+            directory: str = "") -> str:
+        """
+        Assigns a page to the key and returns its name without the directory
+        and the extension. The identity must distinguish symbols with the
+        same name.
+        """
+        if len(name.encode()) > self.max_name_length or \
+                not self._take(directory, name):
+            short_id = hashlib.blake2b(
+                identity.encode(errors="surrogatepass"),
+                digest_size=self.id_length // 2).hexdigest()
+            base = self._shorten(name) + "-" + short_id
+            name = base
+            # The identities of symbols are the same only if the same
+            # difference was found in several files.
+            suffix = 1
+            while not self._take(directory, name):
+                suffix += 1
+                name = "{}-{}".format(base, suffix)
+        self.pages[key] = directory + name + self.extension
+        return name
+
+    def __getitem__(self, key: Hashable) -> str:
+        """Returns the path of the page relative to the output directory."""
+        return self.pages[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.pages
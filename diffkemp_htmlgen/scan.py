@@ -0,0 +1,149 @@
+import hashlib
+import re
+from diffkemp_htmlgen.htmlgen import (Affection, Difference, Failure,
+                                      InternalSymbol, Location)
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Top-level key of the diff and the start of the next top-level key.
+diff_key_pattern = re.compile(rb"^diff:", re.MULTILINE)
+top_level_pattern = re.compile(rb"^\S", re.MULTILINE)
+# Keys describing the symbol of a difference, which DiffKemp writes before
+# the diff.
+symbol_keys = ("symbol", "diff-kind", "location-old", "location-new")
+
+
+def safe_load(content: bytes) -> Any:
+    """Parses YAML using the LibYAML-based loader if it is available."""
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(content, Loader=loader)
+
+
+def find_diff(content: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Returns the start and the end of the diff key with its value in a YAML
+    file generated by DiffKemp. The diff block is found by its indentation.
+    """
+    diff_key = diff_key_pattern.search(content)
+    if diff_key is None:
+        return None
+    next_key = top_level_pattern.search(content, diff_key.end())
+    return (diff_key.start(),
+            next_key.start() if next_key is not None else len(content))
+
+
+def parse_header(content: bytes, affections: bool = True) -> Dict[str, Any]:
+    """
+    Parses the content of a YAML file generated by DiffKemp except for the
+    diff, which makes up most of the file. Without affections, everything
+    after the diff is skipped too, unless some keys describing the symbol
+    come after the diff (e.g. in files written by other tools).
+    """
+    diff = find_diff(content)
+    if diff is None:
+        return _parse_mapping(content)
+    start, end = diff
+    if not affections:
+        header = safe_load(content[:start])
+        if isinstance(header, dict) and \
+                all(key in header for key in symbol_keys):
+            return header
+    return _parse_mapping(content[:start] + content[end:])
+
+
+def _parse_mapping(content: bytes) -> Dict[str, Any]:
+    mapping = safe_load(content)
+    if not isinstance(mapping, dict):
+        raise ValueError("Invalid result format")
+    return mapping
+
+
+def read_header(path: str, affections: bool = True) -> Dict[str, Any]:
+    """Parses a YAML file generated by DiffKemp except for the diff."""
+    with open(path, "rb") as file:
+        return parse_header(file.read(), affections)
+
+
+def read_diff(path: str) -> str:
+    """Parses only the diff from a YAML file generated by DiffKemp."""
+    with open(path, "rb") as file:
+        content = file.read()
+    diff = find_diff(content)
+    if diff is None:
+        raise KeyError("diff")
+    return str(safe_load(content[diff[0]:diff[1]])["diff"])
+
+
+class ScannedDifference(Difference):
+    """
+    Represents a difference whose diff is read from its file only when it is
+    needed, i.e. when its page is rendered. The diff is not kept in memory.
+    """
+    def __init__(self, path: str, symbol_old: InternalSymbol,
+                 symbol_new: InternalSymbol,
+                 affected_symbols: List[Affection],
+                 digest: bytes, size: int):
+        self.path = path
+        self._diff: Optional[str] = None
+        # Hash and length of the YAML representation of the diff.
+        self._digest = digest
+        self._size = size
+        super().__init__(symbol_old, symbol_new, "", affected_symbols)
+
+    @property
+    def diff(self) -> str:
+        if self._diff is not None:
+            return self._diff
+        return read_diff(self.path)
+
+    @diff.setter
+    def diff(self, diff: str) -> None:
+        # An empty diff is set by the constructor.
+        self._diff = diff or None
+
+    def diff_digest(self) -> bytes:
+        if self._diff is not None:
+            return super().diff_digest()
+        return self._digest
+
+    def diff_size(self) -> int:
+        if self._diff is not None:
+            return super().diff_size()
+        return self._size
+
+
+def scan_difference(path: str) -> ScannedDifference:
+    """
+    Parses a YAML file generated by DiffKemp into a Difference object without
+    parsing its diff.
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+    header = parse_header(content)
+    diff = find_diff(content)
+    if diff is None:
+        raise KeyError("diff")
+    block = content[diff[0]:diff[1]].rstrip()
+
+    kind = InternalSymbol.Kind.from_yaml(header["diff-kind"])
+    return ScannedDifference(
+        path,
+        InternalSymbol(header["symbol"], kind,
+                       Location.from_yaml(header["location-old"])),
+        InternalSymbol(header["symbol"], kind,
+                       Location.from_yaml(header["location-new"])),
+        [Affection.from_yaml(affection)
+         for affection in header["affected-symbols"]],
+        hashlib.blake2b(block, digest_size=16).digest(), len(block))
+
+
+def scan_difference_tolerant(path: str) -> Union[ScannedDifference, Failure]:
+    """
+    Scans a YAML file generated by DiffKemp using scan_difference, returns
+    a Failure object instead of raising an exception if that is not
+    possible.
+    """
+    try:
+        return scan_difference(path)
+    except Exception as exception:
+        return Failure.from_exception(path, Failure.Phase.PARSE, exception)
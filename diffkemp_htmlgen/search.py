@@ -0,0 +1,84 @@
+import json
+import re
+from array import array
+from typing import Callable, Dict, List, Tuple
+
+# Identifiers of at least two characters, shorter ones are too common to be
+# worth searching for.
+token_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]+")
+# C keywords, which appear in most diffs.
+stop_words = frozenset([
+    "auto", "break", "case", "char", "const", "continue", "default", "do",
+    "double", "else", "enum", "extern", "float", "for", "goto", "if",
+    "inline", "int", "long", "register", "restrict", "return", "short",
+    "signed", "sizeof", "static", "struct", "switch", "typedef", "union",
+    "unsigned", "void", "volatile", "while"])
+
+
+def shard_of(token: str, shard_count: int) -> int:
+    """
+    Returns the shard containing the token, computed from the FNV-1a hash of
+    the token the same way as by js.search_js.
+    """
+    value = 0x811c9dc5
+    for byte in token.encode():
+        value = ((value ^ byte) * 0x01000193) & 0xFFFFFFFF
+    return value % shard_count
+
+
+class SearchIndex:
+    """
+    Inverted index mapping the tokens of diffs to the documents (pages of
+    differences) and the lines of the diffs in which they occur. The index is
+    written as shards of JavaScript files, so that the search page loads only
+    the shards of the searched tokens, also when opened from a local file.
+    """
+    # Approximate number of occurrences stored in a shard.
+    shard_postings = 16384
+    max_shard_count = 4096
+
+    def __init__(self) -> None:
+        # Names of symbols and paths of their pages by document ids.
+        self.documents: List[Tuple[str, str]] = []
+        # Pairs of document ids and line numbers by tokens.
+        self.postings: Dict[str, 'array[int]'] = dict()
+        self.posting_count = 0
+
+    def add(self, name: str, page: str, text: str) -> None:
+        """Adds the diff of a page to the index."""
+        document = len(self.documents)
+        self.documents.append((name, page))
+        postings = self.postings
+        for number, line in enumerate(text.split("\n"), 1):
+            for token in set(token_pattern.findall(line)) - stop_words:
+                occurrences = postings.get(token)
+                if occurrences is None:
+                    occurrences = postings[token] = array("I")
+                occurrences.append(document)
+                occurrences.append(number)
+                self.posting_count += 1
+
+    def shard_count(self) -> int:
+        return max(1, min(self.max_shard_count,
+                          self.posting_count // self.shard_postings))
+
+    def write(self, write_file: Callable[[str, str], object]) -> None:
+        """
+        Writes the index using the given function, which is called with the
+        names of the files and their contents.
+        """
+        shard_count = self.shard_count()
+        shards: List[List[str]] = [[] for _ in range(shard_count)]
+        for token in sorted(self.postings):
+            shards[shard_of(token, shard_count)].append(token)
+
+        write_file("documents.js", "diffkempSearch.setDocuments({}, {});\n"
+                   .format(json.dumps(self.documents, separators=(",", ":")),
+                           shard_count))
+        for index, tokens in enumerate(shards):
+            write_file("shard-{}.js".format(index),
+                       "diffkempSearch.addShard({}, {});\n".format(
+                           index, json.dumps(
+                               {token: self.postings[token].tolist()
+                                for token in tokens},
+                               separators=(",", ":"))))
@@ -0,0 +1,152 @@
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+from diffkemp_htmlgen.htmlgen import InternalSymbol, Location
+from typing import List, Optional, Set, Tuple, Union
+
+
+class SourceFile:
+    """
+    Represents a source file that is memory-mapped and indexed by lines, so
+    that its parts can be read repeatedly without reading the whole file.
+    The mapping holds a file descriptor until the file is closed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Union[mmap.mmap, bytes]
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size > 0:
+                # The mapping stays valid after the file is closed.
+                self._data = mmap.mmap(file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            else:
+                # Empty files cannot be mapped.
+                self._data = b""
+        # Offsets of the starts of lines, built on the first access.
+        self._offsets: Optional['array[int]'] = None
+
+    def _line_offsets(self) -> 'array[int]':
+        if self._offsets is None:
+            offsets = array("Q", [0])
+            data = self._data
+            position = data.find(b"\n")
+            while position != -1:
+                offsets.append(position + 1)
+                position = data.find(b"\n", position + 1)
+            if offsets[-1] != len(data):
+                offsets.append(len(data))
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self) -> int:
+        """Returns the number of lines in the file."""
+        return len(self._line_offsets()) - 1
+
+    def lines(self, start: int, end: int) -> List[str]:
+        """
+        Returns lines with numbers from start (inclusive) to end (exclusive),
+        numbered from 1.
+        """
+        offsets = self._line_offsets()
+        start = max(start, 1)
+        end = min(end, len(offsets))
+        if start >= end:
+            return []
+        text = self._data[offsets[start - 1]:offsets[end - 1]].decode(
+            errors="replace")
+        if text.endswith("\n"):
+            text = text[:-1]
+        return text.split("\n")
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class SourceTree:
+    """
+    Represents a kernel source tree. The files are opened on the first access
+    and shared by subsequent lookups. Only the most recently used files are
+    kept open, so that callstacks covering many files do not exhaust file
+    descriptors.
+    """
+    # Maximum number of lines of a symbol body.
+    max_body_lines = 2000
+    # Maximum number of files kept open.
+    max_open_files = 128
+
+    def __init__(self, root: str):
+        self.root = root
+        self._files: 'OrderedDict[str, SourceFile]' = OrderedDict()
+        self._missing: Set[str] = set()
+
+    def file(self, filename: str) -> Optional[SourceFile]:
+        """
+        Returns the file with the given path, None if it does not exist. The
+        file may be closed by later lookups of other files.
+        """
+        file = self._files.get(filename)
+        if file is not None:
+            self._files.move_to_end(filename)
+            return file
+        if filename in self._missing:
+            return None
+        path = os.path.join(self.root, filename)
+        if not os.path.isfile(path):
+            self._missing.add(filename)
+            return None
+        if len(self._files) >= self.max_open_files:
+            self._files.popitem(last=False)[1].close()
+        file = self._files[filename] = SourceFile(path)
+        return file
+
+    def excerpt(self, location: Location, context: int = 3)\
+            -> Optional[Tuple[int, List[str]]]:
+        """
+        Returns the lines around the given location and the number of the
+        first one.
+        """
+        file = self.file(location.filename)
+        if file is None or not 0 < location.line <= len(file):
+            return None
+        start = max(location.line - context, 1)
+        return start, file.lines(start, location.line + context + 1)
+
+    def symbol_body(self, symbol: InternalSymbol)\
+            -> Optional[Tuple[int, List[str]]]:
+        """
+        Returns the lines of the definition of the symbol starting at its
+        location and the number of the first one.
+        """
+        file = self.file(symbol.location.filename)
+        if file is None or not 0 < symbol.location.line <= len(file):
+            return None
+        start = symbol.location.line
+        lines = file.lines(start, start + self.max_body_lines)
+
+        if symbol.kind == InternalSymbol.Kind.MACRO:
+            # The macro continues as long as lines end with a backslash.
+            for length, line in enumerate(lines, 1):
+                if not line.rstrip().endswith("\\"):
+                    return start, lines[:length]
+            return start, lines
+
+        # Functions and types end with the brace matching the first one.
+        depth = 0
+        opened = False
+        for length, line in enumerate(lines, 1):
+            depth += line.count("{") - line.count("}")
+            opened = opened or "{" in line
+            if not opened and ";" in line:
+                # Declaration only.
+                return start, lines[:length]
+            if opened and depth <= 0:
+                return start, lines[:length]
+        return start, lines
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+        self._files = OrderedDict()
+        self._missing = set()
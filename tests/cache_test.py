@@ -0,0 +1,75 @@
+from diffkemp_htmlgen.cache import *
+from diffkemp_htmlgen.scan import scan_difference
+import os
+import pytest
+
+
+@pytest.fixture
+def test_dir(request):
+    return request.fspath.dirname
+
+
+@pytest.fixture
+def entry(test_dir):
+    directory = os.path.join(test_dir, "differences")
+    difference = scan_difference(os.path.join(directory,
+                                              "kmalloc_node.diff.yaml"))
+    return CacheEntry("kmalloc_node.diff.yaml", 1234567890123456789, 4096,
+                      difference)
+
+
+def test_write_read_cache(tmpdir, test_dir, entry):
+    path = os.path.join(tmpdir, "cache")
+    write_cache(path, [entry])
+    entries = read_cache(path, os.path.join(test_dir, "differences"))
+
+    assert list(entries) == ["kmalloc_node.diff.yaml"]
+    cached = entries["kmalloc_node.diff.yaml"]
+    assert cached.mtime_ns == entry.mtime_ns
+    assert cached.size == entry.size
+
+    original, difference = entry.difference, cached.difference
+    assert difference.path == original.path
+    for symbol in ["symbol_old", "symbol_new"]:
+        assert getattr(difference, symbol).name == \
+            getattr(original, symbol).name
+        assert getattr(difference, symbol).kind == \
+            getattr(original, symbol).kind
+        assert str(getattr(difference, symbol).location) == \
+            str(getattr(original, symbol).location)
+    assert difference.diff_digest() == original.diff_digest()
+    assert difference.diff_size() == original.diff_size()
+    assert difference.diff == original.diff
+    for cached_affection, affection in zip(difference.affected_symbols,
+                                           original.affected_symbols):
+        assert cached_affection.symbol == affection.symbol
+        for side in ["callstack_old", "callstack_new"]:
+            assert [(call.symbol_name, str(call.location))
+                    for call in getattr(cached_affection, side)] == \
+                [(call.symbol_name, str(call.location))
+                 for call in getattr(affection, side)]
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda content: b"",
+    lambda content: content[:len(content) // 2],
+    lambda content: content[:8] + b"\xff" + content[9:],
+])
+def test_read_cache_invalid(tmpdir, entry, corrupt):
+    path = os.path.join(tmpdir, "cache")
+    write_cache(path, [entry])
+    with open(path, "rb") as f:
+        content = f.read()
+    with open(path, "wb") as f:
+        f.write(corrupt(content))
+
+    assert read_cache(path, str(tmpdir)) == dict()
+
+
+def test_read_cache_missing(tmpdir):
+    assert read_cache(os.path.join(tmpdir, "cache"), str(tmpdir)) == dict()
+
+
+def test_is_valid(entry):
+    stat = os.stat_result((0, 0, 0, 0, 0, 0, 4096, 0, 0, 0))
+    assert not entry.is_valid(stat)
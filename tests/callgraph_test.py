@@ -0,0 +1,51 @@
+from diffkemp_htmlgen.htmlgen import *
+from diffkemp_htmlgen.callgraph import *
+import pytest
+
+
+@pytest.fixture
+def affections():
+    def call(name, line):
+        return Call(name, Location("mm/slab.c", line))
+
+    def symbol(name):
+        return InternalSymbol(name, InternalSymbol.Kind.FUNCTION,
+                              Location("mm/slab.c", 1))
+
+    return [
+        Affection(symbol("kmalloc_node"),
+                  [call("kzalloc", 10), call("kmalloc_node", 20)],
+                  [call("kzalloc", 11), call("kmalloc_node", 21)]),
+        Affection(symbol("__kmalloc"),
+                  [call("kzalloc", 10), call("kmalloc_node", 20),
+                   call("__kmalloc", 30)],
+                  [call("kzalloc", 11), call("__kmalloc", 31)]),
+        Affection(symbol("kmalloc"), [], []),
+    ]
+
+
+def test_from_affections(affections):
+    graph = CallGraph.from_affections(affections, new=False)
+
+    assert len(graph) == 3
+    assert list(graph.roots) == [0]
+    assert [list(children) for children in graph.children] == [[1], [2], []]
+    assert [[target.name for target in targets]
+            for targets in graph.targets] == [[], ["kmalloc_node"],
+                                              ["__kmalloc"]]
+    assert [target.name for target in graph.direct_targets] == ["kmalloc"]
+
+
+def test_from_affections_new(affections):
+    graph = CallGraph.from_affections(affections, new=True)
+
+    assert len(graph) == 3
+    assert [list(children) for children in graph.children] == [[1, 2], [],
+                                                               []]
+
+
+def test_from_affections_external():
+    affection = Affection(ExternalSymbol("kmalloc",
+                                         ExternalSymbol.Kind.FUNCTION), [], [])
+    with pytest.raises(ValueError):
+        CallGraph.from_affections([affection], new=True)
@@ -0,0 +1,202 @@
+from diffkemp_htmlgen.compare import *
+from diffkemp_htmlgen.htmlgen import HTMLGenerator
+import os
+import pytest
+import shutil
+import tempfile
+
+
+@pytest.fixture
+def test_dir(request):
+    """Gets the current test directory."""
+    return request.fspath.dirname
+
+
+@pytest.fixture
+def result_dirs(test_dir):
+    """
+    Creates directories with old and new results, where kmalloc_node is
+    changed, kzalloc_node is unchanged, kfree is gone and kmalloc is new.
+    """
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as file:
+        content = file.read()
+
+    def write(directory, symbol, text):
+        with open(os.path.join(directory, symbol + ".diff.yaml"), "w") as f:
+            f.write(text.replace("symbol: kmalloc_node",
+                                 "symbol: " + symbol, 1))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old_dir = os.path.join(tmpdir, "old")
+        new_dir = os.path.join(tmpdir, "new")
+        os.mkdir(old_dir)
+        os.mkdir(new_dir)
+        for symbol in ["kmalloc_node", "kzalloc_node", "kfree"]:
+            write(old_dir, symbol, content)
+        write(new_dir, "kmalloc_node",
+              content.replace("line: 578", "line: 580").replace(
+                  "line: 4117", "line: 4118"))
+        write(new_dir, "kzalloc_node", content)
+        write(new_dir, "kmalloc", content)
+        yield old_dir, new_dir
+
+
+def test_result_file_from_file(test_dir):
+    result = ResultFile.from_file(os.path.join(test_dir, "differences",
+                                               "kmalloc_node.diff.yaml"))
+    assert result.symbol_name == "kmalloc_node"
+    assert result.load().symbol_old.name == "kmalloc_node"
+
+
+def test_scan_results(result_dirs):
+    old_dir, new_dir = result_dirs
+    results = scan_results(old_dir)
+
+    assert sorted(results.keys()) == [
+        ("kfree", "function", "include/linux/slab.h", 0),
+        ("kmalloc_node", "function", "include/linux/slab.h", 0),
+        ("kzalloc_node", "function", "include/linux/slab.h", 0)]
+    assert results[("kfree", "function", "include/linux/slab.h", 0)].digest \
+        != results[("kmalloc_node", "function", "include/linux/slab.h",
+                    0)].digest
+
+
+def test_compare_results_same_names(result_dirs):
+    """Symbols with the same names in different files are not mixed up."""
+    old_dir, new_dir = result_dirs
+    for directory in [old_dir, new_dir]:
+        with open(os.path.join(directory, "kzalloc_node.diff.yaml"),
+                  "r") as f:
+            content = f.read()
+        with open(os.path.join(directory, "kmalloc-mm.diff.yaml"), "w") as f:
+            f.write(content.replace("symbol: kzalloc_node", "symbol: kmalloc",
+                                    1)
+                    .replace("file: include/linux/slab.h", "file: mm/slab.c",
+                             1))
+    deltas = compare_results(old_dir, new_dir)
+
+    assert [(d.symbol_name, d.status, d.path) for d in deltas
+            if d.symbol_name == "kmalloc"] == [
+        ("kmalloc", SymbolDelta.Status.ADDED,
+         os.path.join(new_dir, "kmalloc.diff.yaml")),
+        ("kmalloc", SymbolDelta.Status.UNCHANGED,
+         os.path.join(new_dir, "kmalloc-mm.diff.yaml"))]
+
+
+def test_compare_results(result_dirs):
+    old_dir, new_dir = result_dirs
+    deltas = compare_results(old_dir, new_dir)
+
+    assert [(d.symbol_name, d.status) for d in deltas] == [
+        ("kfree", SymbolDelta.Status.REMOVED),
+        ("kmalloc", SymbolDelta.Status.ADDED),
+        ("kmalloc_node", SymbolDelta.Status.CHANGED),
+        ("kzalloc_node", SymbolDelta.Status.UNCHANGED)
+    ]
+    assert deltas[2].changes == [
+        "new location: include/linux/slab.h:578 -> include/linux/slab.h:580",
+        "callstacks"
+    ]
+
+
+def test_compare_results_unchanged_not_parsed(result_dirs, monkeypatch):
+    old_dir, new_dir = result_dirs
+    shutil.rmtree(new_dir)
+    shutil.copytree(old_dir, new_dir)
+
+    def load(self):
+        raise AssertionError("unchanged result parsed")
+    monkeypatch.setattr(ResultFile, "load", load)
+
+    deltas = compare_results(old_dir, new_dir)
+    assert all(d.status == SymbolDelta.Status.UNCHANGED for d in deltas)
+
+
+def test_compare_results_reordered(result_dirs):
+    """Results whose symbols follow the diff are matched the same."""
+    import yaml
+    old_dir, new_dir = result_dirs
+    for filename in os.listdir(new_dir):
+        path = os.path.join(new_dir, filename)
+        with open(path, "r") as f:
+            content = yaml.safe_load(f)
+        with open(path, "w") as f:
+            # Keys are sorted, so the diff comes before the symbol.
+            yaml.safe_dump(content, f)
+
+    deltas = compare_results(old_dir, new_dir, failures=[])
+    assert [(d.symbol_name, d.status) for d in deltas] == [
+        ("kfree", SymbolDelta.Status.REMOVED),
+        ("kmalloc", SymbolDelta.Status.ADDED),
+        ("kmalloc_node", SymbolDelta.Status.CHANGED),
+        ("kzalloc_node", SymbolDelta.Status.CHANGED)
+    ]
+    assert deltas[3].changes == ["formatting"]
+
+
+def test_compare_results_failures(result_dirs):
+    old_dir, new_dir = result_dirs
+    with open(os.path.join(old_dir, "broken.diff.yaml"), "w") as f:
+        f.write("symbol: [broken\n")
+    with open(os.path.join(old_dir, "kmalloc_node.diff.yaml"), "a") as f:
+        f.write("affected-symbols: [broken\n")
+
+    with pytest.raises(Exception):
+        compare_results(old_dir, new_dir)
+    failures = []
+    deltas = compare_results(old_dir, new_dir, failures=failures)
+    assert [failure.filename for failure in failures] == [
+        os.path.join(old_dir, "broken.diff.yaml"),
+        os.path.join(old_dir, "kmalloc_node.diff.yaml")]
+    assert [(d.symbol_name, d.status, d.changes) for d in deltas][1:3] == [
+        ("kmalloc", SymbolDelta.Status.ADDED, []),
+        ("kmalloc_node", SymbolDelta.Status.CHANGED, [])]
+
+
+def test_generate_compare_filter(result_dirs):
+    from diffkemp_htmlgen.filters import SymbolFilter
+    old_dir, new_dir = result_dirs
+    with tempfile.TemporaryDirectory() as output_dir:
+        HTMLGenerator(new_dir, output_dir, compare_dir=old_dir,
+                      symbol_filter=SymbolFilter(names=["kmalloc_*"])
+                      ).generate()
+        with open(os.path.join(output_dir, "delta.html"), "r") as f:
+            delta_page = f.read()
+        assert "<li>changed: 1</li>" in delta_page
+        assert "<li>new: 0</li>" in delta_page
+        assert "<li>gone: 0</li>" in delta_page
+        assert '<a href="kmalloc_node.html">kmalloc_node</a>' in delta_page
+        assert "kfree" not in delta_page
+
+
+def test_generate_compare_keep_going(result_dirs):
+    old_dir, new_dir = result_dirs
+    with open(os.path.join(old_dir, "broken.diff.yaml"), "w") as f:
+        f.write("symbol: [broken\n")
+    with tempfile.TemporaryDirectory() as output_dir:
+        htmlgen = HTMLGenerator(new_dir, output_dir, compare_dir=old_dir,
+                                keep_going=True)
+        htmlgen.generate()
+        assert [failure.filename for failure in htmlgen.failures] == \
+            [os.path.join(old_dir, "broken.diff.yaml")]
+        assert os.path.isfile(os.path.join(output_dir, "delta.html"))
+        with open(os.path.join(output_dir, "report.html"), "r") as f:
+            assert "broken.diff.yaml" in f.read()
+
+
+def test_generate_compare(result_dirs):
+    old_dir, new_dir = result_dirs
+    with tempfile.TemporaryDirectory() as output_dir:
+        htmlgen = HTMLGenerator(new_dir, output_dir, compare_dir=old_dir)
+        htmlgen.generate()
+
+        with open(os.path.join(output_dir, "index.html"), "r") as f:
+            assert 'href="delta.html"' in f.read()
+        with open(os.path.join(output_dir, "delta.html"), "r") as f:
+            delta_page = f.read()
+        assert "<li>changed: 1</li>" in delta_page
+        assert "<li>unchanged: 1</li>" in delta_page
+        assert '<a href="kmalloc.html">kmalloc</a>' in delta_page
+        assert '<td class="delta gone">gone</td>' in delta_page
+        assert "kzalloc_node" not in delta_page
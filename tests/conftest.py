@@ -0,0 +1,4 @@
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "performance: performance regression tests (deselect "
+                   "with -m 'not performance')")
@@ -72,3 +72,18 @@ def test_diff():
                                       "nsigned int state, int wake_flags)")
     assert len(fragment.lines_left) == 0
     assert len(fragment.lines_right) == 21
+
+
+def test_diff_lines():
+    diff_str = ("*************** f(void)\n"
+                "*** 1,2 ***\n"
+                "! a = 1;\n"
+                "  b = 2;\n"
+                "--- 1,2 ---\n"
+                "! a = 2;\n"
+                "  b = 2;")
+    fragments = list(Diff.iter_fragments(diff_str))
+
+    assert len(fragments) == 1
+    assert list(fragments[0].lines_left) == ["! a = 1;", "  b = 2;"]
+    assert fragments[0].lines_right[0] == "! a = 2;"
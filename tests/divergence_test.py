@@ -0,0 +1,50 @@
+from diffkemp_htmlgen.htmlgen import *
+from diffkemp_htmlgen.divergence import *
+
+
+def callstack(*calls):
+    return [Call(name, Location("mm/slab.c", line)) for name, line in calls]
+
+
+def statuses(divergence):
+    return [str(status) for status, _, _ in divergence.rows]
+
+
+def test_divergence_same():
+    old = callstack(("kzalloc", 10), ("kmalloc", 20))
+    new = callstack(("kzalloc", 10), ("kmalloc", 25))
+    divergence = CallstackDivergence(old, new)
+
+    assert statuses(divergence) == ["same", "moved"]
+    assert divergence.divergence is None
+
+
+def test_divergence_changed():
+    old = callstack(("kzalloc", 10), ("kmalloc_node", 20), ("__kmalloc", 30),
+                    ("slab_alloc", 40))
+    new = callstack(("kzalloc", 10), ("kmalloc_array", 21), ("kvmalloc", 22),
+                    ("__kmalloc", 30), ("slab_alloc", 40))
+    divergence = CallstackDivergence(old, new)
+
+    assert statuses(divergence) == ["same", "changed", "added", "same",
+                                    "same"]
+    assert divergence.divergence == 1
+    assert divergence.rows[2][1] is None
+    assert divergence.rows[2][2] is new[2]
+
+
+def test_divergence_removed():
+    old = callstack(("kzalloc", 10), ("kmalloc", 20))
+    divergence = CallstackDivergence(old, [])
+
+    assert statuses(divergence) == ["removed", "removed"]
+    assert divergence.divergence == 0
+
+
+def test_divergence_deep():
+    old = callstack(*[("f{}".format(i), i) for i in range(5000)])
+    new = old[:2500] + callstack(("g", 1)) + old[2500:]
+    divergence = CallstackDivergence(old, new)
+
+    assert len(divergence.rows) == 5001
+    assert divergence.divergence == 2500
@@ -0,0 +1,67 @@
+from diffkemp_htmlgen.export import *
+from diffkemp_htmlgen.htmlgen import *
+import io
+import json
+import os
+import pytest
+import tempfile
+
+
+@pytest.fixture
+def test_dir(request):
+    """Gets the current test directory."""
+    return request.fspath.dirname
+
+
+@pytest.fixture
+def external_symbols(test_dir):
+    htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"), "")
+    differences = htmlgen._collect_differences(htmlgen.input_dir)
+    return htmlgen._collect_external_symbols(differences)
+
+
+def test_call_to_dict():
+    call = Call("init_rescuer", Location("kernel/workqueue.c", 4094))
+    assert call_to_dict(call) == {"symbol": "init_rescuer",
+                                  "file": "kernel/workqueue.c",
+                                  "line": 4094}
+
+
+def test_affection_to_dict_external():
+    affection = Affection(ExternalSymbol("__alloc_pages_nodemask",
+                                         ExternalSymbol.Kind.FUNCTION),
+                          [], [])
+    with pytest.raises(ValueError):
+        affection_to_dict(affection)
+
+
+def test_write_ndjson(external_symbols):
+    stream = io.StringIO()
+    assert write_ndjson(external_symbols.items(), stream) == 1
+
+    lines = stream.getvalue().split("\n")
+    assert len(lines) == 2 and lines[1] == ""
+    record = json.loads(lines[0])
+    assert record["symbol"] == "__alloc_pages_nodemask"
+    assert record["kind"] == "function"
+    assert len(record["affected-by"]) == 1
+
+    affection = record["affected-by"][0]
+    assert affection["symbol"] == "kmalloc_node"
+    assert affection["kind"] == "function"
+    assert affection["location"] == {"file": "include/linux/slab.h",
+                                     "line": 541}
+    assert [call["symbol"] for call in affection["callstack-old"]] == [
+        "init_rescuer", "alloc_worker", "kzalloc_node", "kmalloc_node"]
+    assert affection["callstack-new"][0] == {"symbol": "init_rescuer",
+                                             "file": "kernel/workqueue.c",
+                                             "line": 4117}
+
+
+def test_generate_ndjson_only(test_dir):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                                html=False, ndjson=True)
+        htmlgen.generate()
+
+        assert os.listdir(tmpdir) == [HTMLGenerator.ndjson_file]
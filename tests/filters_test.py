@@ -0,0 +1,59 @@
+from diffkemp_htmlgen.htmlgen import *
+from diffkemp_htmlgen.filters import *
+import os
+import pytest
+
+
+@pytest.fixture
+def test_dir(request):
+    return request.fspath.dirname
+
+
+@pytest.fixture
+def result_file(test_dir):
+    return os.path.join(test_dir, "differences", "kmalloc_node.diff.yaml")
+
+
+@pytest.mark.parametrize("symbol_filter, selected", [
+    (SymbolFilter(), True),
+    (SymbolFilter(names=["kmalloc*"]), True),
+    (SymbolFilter(names=["kzalloc*", "vmalloc"]), False),
+    (SymbolFilter(name_regex="_node$"), True),
+    (SymbolFilter(name_regex="^node"), False),
+    (SymbolFilter(path_prefixes=["include/linux/"]), True),
+    (SymbolFilter(path_prefixes=["mm/"]), False),
+    (SymbolFilter(kinds=[InternalSymbol.Kind.FUNCTION]), True),
+    (SymbolFilter(kinds=[InternalSymbol.Kind.TYPE,
+                         InternalSymbol.Kind.MACRO]), False),
+    (SymbolFilter(kabi_symbols=["__alloc_pages_nodemask"]), True),
+    (SymbolFilter(kabi_symbols=["kfree"]), False),
+    (SymbolFilter(names=["kmalloc*"], kinds=[InternalSymbol.Kind.TYPE]),
+     False),
+])
+def test_matches_file(result_file, symbol_filter, selected):
+    assert symbol_filter.matches_file(result_file) == selected
+
+
+def test_matches_file_unreadable(tmpdir):
+    assert SymbolFilter(names=["kmalloc"]).matches_file(
+        os.path.join(tmpdir, "missing.yaml"))
+
+
+def test_bool():
+    assert not SymbolFilter()
+    assert SymbolFilter(kabi_symbols=["kfree"])
+
+
+def test_restrict(result_file):
+    difference = load_difference(result_file)
+    kabi_symbols = [affection.symbol.name
+                    for affection in difference.affected_symbols]
+
+    restricted = SymbolFilter(kabi_symbols=kabi_symbols[:1]).restrict(
+        difference)
+    assert [affection.symbol.name
+            for affection in restricted.affected_symbols] == kabi_symbols[:1]
+    # The given difference is not modified.
+    assert [affection.symbol.name
+            for affection in difference.affected_symbols] == kabi_symbols
+    assert restricted.symbol_old is difference.symbol_old
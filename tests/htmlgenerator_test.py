@@ -1,8 +1,10 @@
 from diffkemp_htmlgen.htmlgen import *
 import tempfile
 import os
+import re
 import pytest
-from subprocess import call
+from subprocess import call, check_output
+import sys
 import yaml
 from yattag import Doc, indent
 
@@ -227,71 +229,85 @@ def test__diff_to_html(htmlgen):
     html = indent(htmlgen.doc.getvalue())
     expected_html = """<table class="table diff-table">
   <tr>
-    <td class="heading" colspan="2">
+    <td class="heading" colspan="4">
       <pre>kmalloc_node</pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter" data-line="544" data-marker=" "></td>
     <td class="line">
-      <pre>  544      if (__builtin_constant_p(size) &amp;&amp;</pre>
+      <pre>  if (__builtin_constant_p(size) &amp;&amp;</pre>
     </td>
+    <td class="gutter" data-line="581" data-marker=" "></td>
     <td class="line">
-      <pre>  581      if (__builtin_constant_p(size) &amp;&amp;</pre>
+      <pre>  if (__builtin_constant_p(size) &amp;&amp;</pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter" data-line="545" data-marker="-"></td>
     <td class="line removed">
-      <pre>  545 -        size &lt;= KMALLOC_MAX_CACHE_SIZE &amp;&amp; !(flags &amp; GFP_DMA)) {</pre>
+      <pre>      size &lt;= KMALLOC_MAX_CACHE_SIZE &amp;&amp; !(flags &amp; GFP_DMA)) {</pre>
     </td>
+    <td class="gutter" data-line="582" data-marker="+"></td>
     <td class="line added">
-      <pre>  582 +        size &lt;= KMALLOC_MAX_CACHE_SIZE) {</pre>
+      <pre>      size &lt;= KMALLOC_MAX_CACHE_SIZE) {</pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter" data-line="546" data-marker=" "></td>
     <td class="line">
-      <pre>  546          unsigned int i = kmalloc_index(size);</pre>
+      <pre>      unsigned int i = kmalloc_index(size);</pre>
     </td>
+    <td class="gutter" data-line="583" data-marker=" "></td>
     <td class="line">
-      <pre>  583          unsigned int i = kmalloc_index(size);</pre>
+      <pre>      unsigned int i = kmalloc_index(size);</pre>
     </td>
   </tr>
   <tr>
-    <td class="heading" colspan="2">
+    <td class="heading" colspan="4">
       <pre>kmalloc_node</pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter" data-line="550" data-marker=" "></td>
     <td class="line">
-      <pre>  550  </pre>
+      <pre></pre>
     </td>
+    <td class="gutter" data-line="587" data-marker=" "></td>
     <td class="line">
-      <pre>  587  </pre>
+      <pre></pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter" data-line="551" data-marker="-"></td>
     <td class="line removed">
-      <pre>  551 -        return kmem_cache_alloc_node_trace(kmalloc_caches[i],</pre>
+      <pre>      return kmem_cache_alloc_node_trace(kmalloc_caches[i],</pre>
     </td>
+    <td class="gutter" data-line="588" data-marker="+"></td>
     <td class="line added">
-      <pre>  588 +        return kmem_cache_alloc_node_trace(</pre>
+      <pre>      return kmem_cache_alloc_node_trace(</pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter"></td>
     <td class="line empty"></td>
+    <td class="gutter" data-line="589" data-marker="+"></td>
     <td class="line added">
-      <pre>  589 +                kmalloc_caches[kmalloc_type(flags)][i],</pre>
+      <pre>              kmalloc_caches[kmalloc_type(flags)][i],</pre>
     </td>
   </tr>
   <tr>
+    <td class="gutter" data-line="552" data-marker=" "></td>
     <td class="line">
-      <pre>  552                          flags, node, size);</pre>
+      <pre>                      flags, node, size);</pre>
     </td>
+    <td class="gutter" data-line="590" data-marker=" "></td>
     <td class="line">
-      <pre>  590                          flags, node, size);</pre>
+      <pre>                      flags, node, size);</pre>
     </td>
   </tr>
 </table>"""
-    return html == expected_html
+    assert html == expected_html
 
 
 def test__generate_head(htmlgen):
@@ -299,6 +315,16 @@ def test__generate_head(htmlgen):
     html = indent(htmlgen.doc.getvalue())
     expected_html = """<meta charset="utf-8" />
 <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css" />
+<link rel="stylesheet" href="htmlgen.css" />"""
+    assert html == expected_html
+
+
+def test__generate_head_highlight(htmlgen):
+    htmlgen.highlight_syntax = True
+    htmlgen._generate_head()
+    html = indent(htmlgen.doc.getvalue())
+    expected_html = """<meta charset="utf-8" />
+<link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css" />
 <link rel="stylesheet" href="pygments.css" />
 <link rel="stylesheet" href="htmlgen.css" />"""
     assert html == expected_html
@@ -359,3 +385,715 @@ def test_generate(test_dir):
         assert call(["diff", "-r", "--exclude=pygments.css",
                      os.path.join(tmpdir, "output_html"),
                      os.path.join(test_dir, "output_html")]) == 0
+
+
+def test_import_is_lazy():
+    """
+    Importing the module and creating a generator should not import modules
+    that are only needed for parsing, highlighting or parallel processing.
+    """
+    code = ("import sys\n"
+            "from diffkemp_htmlgen.htmlgen import HTMLGenerator\n"
+            "HTMLGenerator('input', 'output')\n"
+            "print(' '.join(sys.modules))")
+    modules = check_output([sys.executable, "-c", code]).decode().split()
+    for module in ["pygments", "yaml", "concurrent.futures"]:
+        assert module not in modules
+
+
+def test_generate_bundle_assets(test_dir):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                                highlight_syntax=True, bundle_assets=True)
+        htmlgen.generate()
+
+        styles = sorted(f for f in os.listdir(tmpdir) if f.endswith(".css"))
+        assert len(styles) == 3
+        assert [s.split(".")[0] for s in styles] == ["bootstrap", "htmlgen",
+                                                     "pygments"]
+        with open(os.path.join(tmpdir, "index.html"), "r") as f:
+            index = f.read()
+        with open(os.path.join(tmpdir, "kabi",
+                               "__alloc_pages_nodemask-function.html"),
+                  "r") as f:
+            kabi_page = f.read()
+        assert htmlgen.bootstrap not in index
+        for style in styles:
+            assert 'href="{}"'.format(style) in index
+            assert 'href="../{}"'.format(style) in kabi_page
+
+        # Unchanged assets are not rewritten.
+        mtimes = [os.stat(os.path.join(tmpdir, s)).st_mtime_ns
+                  for s in styles]
+        htmlgen.generate()
+        assert mtimes == [os.stat(os.path.join(tmpdir, s)).st_mtime_ns
+                          for s in styles]
+
+        # Stylesheets of previous runs are removed.
+        HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                      graphical_diff=True, bundle_assets=True).generate()
+        new_styles = sorted(f for f in os.listdir(tmpdir)
+                            if f.endswith(".css"))
+        assert len(new_styles) == 2
+        assert new_styles[0] == styles[0]
+        assert new_styles[1].startswith("htmlgen.")
+        assert new_styles[1] != styles[1]
+
+
+def test_bundled_bootstrap_classes():
+    """The bundled subset of Bootstrap covers the classes of the pages."""
+    for klass in ["container", "py-4", "table", "form-control"]:
+        assert "." + klass + " {" in css.bootstrap_css
+
+
+@pytest.fixture
+def broken_input_dir(test_dir):
+    """
+    Creates an input directory with a valid result, a result that cannot be
+    parsed and a result whose diff cannot be rendered.
+    """
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as file:
+        content = file.read()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "kmalloc_node.diff.yaml"), "w") as f:
+            f.write(content)
+        with open(os.path.join(tmpdir, "missing_key.diff.yaml"), "w") as f:
+            f.write(content.replace("diff-kind:", "kind:"))
+        with open(os.path.join(tmpdir, "bad_diff.diff.yaml"), "w") as f:
+            f.write(content.replace("symbol: kmalloc_node",
+                                    "symbol: kzalloc_node").replace(
+                "*** 544,546 ***", "*** x,546 ***"))
+        yield tmpdir
+
+
+def test_generate_broken_input(broken_input_dir):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(broken_input_dir, tmpdir,
+                                graphical_diff=True)
+        with pytest.raises(KeyError):
+            htmlgen.generate()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_generate_keep_going(broken_input_dir, jobs):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(broken_input_dir, tmpdir,
+                                graphical_diff=True, keep_going=True,
+                                jobs=jobs)
+        htmlgen.generate()
+
+        failures = sorted(htmlgen.failures,
+                          key=lambda failure: failure.filename)
+        assert [(os.path.basename(failure.filename), failure.phase)
+                for failure in failures] == [
+            ("bad_diff.diff.yaml", Failure.Phase.RENDER),
+            ("missing_key.diff.yaml", Failure.Phase.PARSE)
+        ]
+        assert failures[0].error == \
+            "ValueError: invalid literal for int() with base 10: 'x'"
+        assert failures[1].error == "KeyError: 'diff-kind'"
+
+        assert os.path.exists(os.path.join(tmpdir, "kmalloc_node.html"))
+        assert not os.path.exists(os.path.join(tmpdir, "kzalloc_node.html"))
+        with open(os.path.join(tmpdir, "index.html"), "r") as f:
+            index = f.read()
+        assert 'href="report.html"' in index
+        assert "kzalloc_node" not in index
+        with open(os.path.join(tmpdir, "report.html"), "r") as f:
+            report = f.read()
+        assert "<p>2 file(s) could not be processed.</p>" in report
+        assert "<pre>KeyError: 'diff-kind'</pre>" in report
+
+
+def test_generate_keep_going_kabi(test_dir, monkeypatch):
+    """Failures to render pages of KABI symbols are reported."""
+    def fail(self, symbol, affections):
+        raise RecursionError("too deep")
+    monkeypatch.setattr(HTMLGenerator, "_external_symbol_to_html", fail)
+    input_dir = os.path.join(test_dir, "differences")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(RecursionError):
+            HTMLGenerator(input_dir, tmpdir).generate()
+
+        htmlgen = HTMLGenerator(input_dir, tmpdir, keep_going=True)
+        htmlgen.generate()
+        assert [(failure.filename, failure.phase)
+                for failure in htmlgen.failures] == [
+            ("kabi/__alloc_pages_nodemask-function.html",
+             Failure.Phase.RENDER)]
+        assert os.listdir(os.path.join(tmpdir, "kabi")) == []
+        with open(os.path.join(tmpdir, "report.html"), "r") as f:
+            report = f.read()
+        assert "<td>kabi/__alloc_pages_nodemask-function.html</td>" in report
+        assert "<pre>RecursionError: too deep</pre>" in report
+
+
+def test_read_manifest():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manifest = os.path.join(tmpdir, "manifest")
+        with open(manifest, "w") as f:
+            f.write("# architecture results\n"
+                    "x86_64/results  x86_64/html\n"
+                    "\n"
+                    "/abs/s390x /abs/s390x-html\n")
+        assert read_manifest(manifest) == [
+            (os.path.join(tmpdir, "x86_64/results"),
+             os.path.join(tmpdir, "x86_64/html")),
+            ("/abs/s390x", "/abs/s390x-html")
+        ]
+
+        with open(manifest, "w") as f:
+            f.write("results\n")
+        with pytest.raises(ValueError):
+            read_manifest(manifest)
+
+
+def test_generate_batch(test_dir):
+    input_dir = os.path.join(test_dir, "differences")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator("", "", graphical_diff=True,
+                                highlight_syntax=True, jobs=2)
+        output_dirs = [os.path.join(tmpdir, "a"), os.path.join(tmpdir, "b")]
+        htmlgen.generate_batch([(input_dir, output_dir)
+                                for output_dir in output_dirs],
+                               os.path.join(tmpdir, "index.html"))
+
+        for output_dir in output_dirs:
+            assert os.path.exists(os.path.join(output_dir,
+                                               "kmalloc_node.html"))
+        with open(os.path.join(output_dirs[0], "kmalloc_node.html")) as f:
+            page = f.read()
+        with open(os.path.join(output_dirs[1], "kmalloc_node.html")) as f:
+            assert f.read() == page
+        # The second run only reuses the highlighted code.
+        cache = htmlgen._highlight.cache_info()
+        assert cache.hits >= cache.misses
+
+        with open(os.path.join(tmpdir, "index.html"), "r") as f:
+            index = f.read()
+        assert '<a href="a/index.html">' in index
+        assert '<a href="b/index.html">' in index
+        assert "<td>1</td>" in index
+
+
+def test__cached_diff_to_html(htmlgen, difference, monkeypatch):
+    other = Difference(difference.symbol_old, difference.symbol_new,
+                       difference.diff, [])
+    htmlgen.graphical_diff = True
+    htmlgen._count_diffs([difference, other])
+
+    htmlgen._diff_to_html(difference.diff.strip())
+    expected_html = htmlgen.doc.getvalue()
+
+    rendered = []
+    original = HTMLGenerator._diff_to_html
+
+    def _diff_to_html(self, diff_str):
+        rendered.append(diff_str)
+        original(self, diff_str)
+    monkeypatch.setattr(HTMLGenerator, "_diff_to_html", _diff_to_html)
+
+    for _ in range(2):
+        htmlgen.doc, htmlgen.tag, htmlgen.text = Doc().tagtext()
+        htmlgen._cached_diff_to_html(difference.diff.strip())
+        assert htmlgen.doc.getvalue() == expected_html
+    assert len(rendered) == 1
+
+    # Options are part of the key.
+    htmlgen.graphical_diff = False
+    htmlgen._cached_diff_to_html(difference.diff.strip())
+    assert len(rendered) == 2
+
+
+@pytest.mark.parametrize("graphical_diff", [False, True])
+def test_generate_streamed_diff(test_dir, graphical_diff):
+    """Pages with streamed diffs differ only in whitespace between tags."""
+    pages = []
+    for stream_diff_size in [HTMLGenerator.stream_diff_size, 0]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"),
+                                    tmpdir, graphical_diff=graphical_diff)
+            htmlgen.stream_diff_size = stream_diff_size
+            htmlgen.generate()
+            with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+                pages.append(re.sub(r">\s+<", "><", f.read()))
+    assert htmlgen.stream_diff_placeholder not in pages[1]
+    assert pages[0] == pages[1]
+
+
+def test__call_graph_to_html(htmlgen):
+    from diffkemp_htmlgen.callgraph import CallGraph
+    symbol = InternalSymbol("kmalloc_node", InternalSymbol.Kind.FUNCTION,
+                            Location("mm/slab.c", 1))
+    calls = [Call("kzalloc", Location("mm/slab.c", 10)),
+             Call("kmalloc_node", Location("mm/slab.c", 20))]
+    graph = CallGraph()
+    graph.add(calls, symbol)
+    # A recursive call leads back to an already rendered node.
+    graph.add(calls + [calls[0]], symbol)
+
+    htmlgen._call_graph_to_html(graph, "old")
+    html = htmlgen.doc.getvalue()
+    assert html.count("kzalloc at mm/slab.c:10") == 2
+    assert html.count('id="old-call-0"') == 1
+    assert '<a href="#old-call-0">' in html
+    assert html.count('<a href="../kmalloc_node.html">') == 2
+
+
+def test__call_graph_to_html_deep(htmlgen):
+    """Callstacks deeper than the recursion limit are rendered."""
+    import sys
+    from diffkemp_htmlgen.callgraph import CallGraph
+    depth = sys.getrecursionlimit() + 100
+    symbol = InternalSymbol("kmalloc_node", InternalSymbol.Kind.FUNCTION,
+                            Location("mm/slab.c", 1))
+    graph = CallGraph()
+    graph.add([Call("f{}".format(line), Location("mm/slab.c", line))
+               for line in range(depth)], symbol)
+
+    htmlgen._call_graph_to_html(graph, "old")
+    html = htmlgen.doc.getvalue()
+    assert html.count("<details open>") == depth - 1
+    assert html.endswith("</ul></details></li>" * (depth - 1) + "</ul>")
+    assert html.index("f0 at") < html.index("f1 at") < \
+        html.index("kmalloc_node</a>")
+
+
+def test__callstack_divergence_to_html(htmlgen, difference):
+    htmlgen.callstack_diff = True
+    affection = difference.affected_symbols[0]
+    internal_affection = Affection(difference.symbol_old,
+                                   affection.callstack_old,
+                                   affection.callstack_new)
+
+    htmlgen._affection_external_to_html(affection)
+    html = htmlgen.doc.getvalue()
+    assert "callstack-table" in html
+    assert html.count("<tr") == len(affection.callstack_new)
+
+    # The divergence is shared with the page of the KABI symbol.
+    assert htmlgen._callstack_divergence(internal_affection) is \
+        htmlgen._callstack_divergence(affection)
+
+
+@pytest.mark.parametrize("stream_diff_size",
+                         [HTMLGenerator.stream_diff_size, 0])
+def test_generate_views(test_dir, stream_diff_size):
+    views = ["plain", "highlighted", "graphical"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                                views=views)
+        htmlgen.stream_diff_size = stream_diff_size
+        htmlgen.generate()
+        assert os.path.isfile(os.path.join(tmpdir, "pygments.css"))
+        with open(os.path.join(tmpdir, "htmlgen.css"), "r") as f:
+            style = f.read()
+        with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+            page = f.read()
+
+    for view in views:
+        assert 'id="view-{}"'.format(view) in page
+        assert 'class="diff-view view-{}"'.format(view) in page
+        assert "#view-{0}:checked ~ .diff-views .view-{0}".format(view) \
+            in style
+    assert page.count("checked=") == 1
+    assert page.count('<table class="table diff-table">') == 1
+    assert htmlgen.stream_diff_placeholder not in page
+    # The options are restored after rendering the views.
+    assert not htmlgen.graphical_diff and not htmlgen.highlight_syntax
+
+
+def test_generate_views_parsed_once(test_dir, monkeypatch):
+    """Graphical views are rendered from the same parsed fragments."""
+    views = ["graphical", "graphical-highlighted"]
+    pages = []
+    for options in [dict(views=views), dict(graphical_diff=True),
+                    dict(graphical_diff=True, highlight_syntax=True)]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                          **options).generate()
+            with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+                pages.append(re.sub(r">\s+<", "><", f.read()))
+    for page in pages[1:]:
+        table = page[page.index("<table class"):page.index("</table>")]
+        assert table in pages[0]
+
+    iter_fragments = Diff.iter_fragments
+    calls = []
+
+    def counted(input):
+        calls.append(input)
+        return iter_fragments(input)
+    monkeypatch.setattr(Diff, "iter_fragments", staticmethod(counted))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                      views=views).generate()
+    assert len(calls) == 1
+
+
+def test_parse_views():
+    assert parse_views("plain,graphical") == ["plain", "graphical"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_views("plain,fancy")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_generate_filtered(broken_input_dir, jobs):
+    from diffkemp_htmlgen.filters import SymbolFilter
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(broken_input_dir, tmpdir, keep_going=True,
+                                jobs=jobs, symbol_filter=SymbolFilter(
+                                    names=["kmalloc*"]))
+        htmlgen.generate()
+        # The file whose diff cannot be rendered is not selected, the one
+        # that cannot be scanned is selected and reported.
+        assert htmlgen.difference_count == 1
+        assert [os.path.basename(failure.filename)
+                for failure in htmlgen.failures] == ["missing_key.diff.yaml"]
+        assert os.path.exists(os.path.join(tmpdir, "kmalloc_node.html"))
+        assert not os.path.exists(os.path.join(tmpdir, "kzalloc_node.html"))
+
+
+def test_generate_filtered_reordered(test_dir):
+    """Filters apply to files whose symbols are described after the diff."""
+    from diffkemp_htmlgen.filters import SymbolFilter
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as f:
+        content = yaml.safe_load(f)
+    with tempfile.TemporaryDirectory() as input_dir:
+        for name, kind in [("kmalloc_node", "function"),
+                           ("kmem_cache", "type")]:
+            content.update({"symbol": name, "diff-kind": kind})
+            with open(os.path.join(input_dir, name + ".yaml"), "w") as f:
+                # Keys are sorted, so the diff comes before the symbol.
+                yaml.safe_dump(content, f)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            htmlgen = HTMLGenerator(input_dir, tmpdir,
+                                    symbol_filter=SymbolFilter(
+                                        kinds=[InternalSymbol.Kind.TYPE]))
+            htmlgen.generate()
+            assert htmlgen.difference_count == 1
+            assert os.path.exists(os.path.join(tmpdir, "kmem_cache.html"))
+            assert not os.path.exists(os.path.join(tmpdir,
+                                                   "kmalloc_node.html"))
+
+
+def test_generate_cache(broken_input_dir, monkeypatch):
+    import diffkemp_htmlgen.scan
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(broken_input_dir, tmpdir, keep_going=True,
+                                cache_results=True)
+        htmlgen.generate()
+        assert os.path.isfile(os.path.join(tmpdir, htmlgen.cache_file))
+        with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+            page = f.read()
+
+        # Only the changed file and the one that could not be parsed are
+        # scanned again.
+        path = os.path.join(broken_input_dir, "bad_diff.diff.yaml")
+        os.utime(path, ns=(0, 0))
+        scanned = []
+        original = diffkemp_htmlgen.scan.scan_difference_tolerant
+
+        def scan_difference_tolerant(path):
+            scanned.append(os.path.basename(path))
+            return original(path)
+        monkeypatch.setattr(diffkemp_htmlgen.scan, "scan_difference_tolerant",
+                            scan_difference_tolerant)
+        htmlgen.generate()
+        assert sorted(scanned) == ["bad_diff.diff.yaml",
+                                   "missing_key.diff.yaml"]
+        assert htmlgen.difference_count == 2
+        assert len(htmlgen.failures) == 1
+        with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+            assert f.read() == page
+
+
+def test_generate_deterministic(test_dir, monkeypatch):
+    """The output does not depend on the order of the input files."""
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as file:
+        content = file.read()
+    outputs = []
+    with tempfile.TemporaryDirectory() as input_dir:
+        for name in ["kzalloc_node", "kmalloc_node", "__kmalloc"]:
+            with open(os.path.join(input_dir, name + ".yaml"), "w") as f:
+                f.write(content.replace("symbol: kmalloc_node",
+                                        "symbol: " + name).replace(
+                    "name:  __alloc_pages_nodemask", "name: " + name + "_abi"))
+
+        listdir = os.listdir
+        for order in [sorted, lambda names: sorted(names, reverse=True)]:
+            monkeypatch.setattr(os, "listdir",
+                                lambda path: order(listdir(path)))
+            with tempfile.TemporaryDirectory() as tmpdir:
+                HTMLGenerator(input_dir, tmpdir, ndjson=True).generate()
+                output = dict()
+                for root, _, files in os.walk(tmpdir):
+                    for filename in files:
+                        path = os.path.join(root, filename)
+                        with open(path, "rb") as f:
+                            output[os.path.relpath(path, tmpdir)] = f.read()
+                outputs.append(output)
+
+    assert outputs[0] == outputs[1]
+    index = outputs[0]["index.html"].decode()
+    assert index.index("__kmalloc.html") < index.index("kmalloc_node.html") \
+        < index.index("kzalloc_node.html")
+
+
+def test_generate_unchanged(test_dir):
+    """Regenerating the same output writes no files."""
+    input_dir = os.path.join(test_dir, "differences")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        HTMLGenerator(input_dir, tmpdir).generate()
+        mtimes = {filename: os.stat(os.path.join(tmpdir, filename)).st_mtime_ns
+                  for filename in os.listdir(tmpdir)}
+        htmlgen = HTMLGenerator(input_dir, tmpdir)
+        htmlgen.generate()
+        assert htmlgen.output.written == 0
+        assert htmlgen.output.skipped > 0
+        assert {filename: os.stat(os.path.join(tmpdir,
+                                               filename)).st_mtime_ns
+                for filename in os.listdir(tmpdir)} == mtimes
+
+
+def test_generate_same_names(test_dir):
+    """Symbols with the same names get separate pages."""
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as file:
+        content = file.read()
+    with tempfile.TemporaryDirectory() as input_dir:
+        for filename, old, new in [
+                ("a.yaml", "", ""),
+                ("b.yaml", "include/linux/slab.h", "include/linux/slub.h"),
+                ("c.yaml", "symbol: kmalloc_node", "symbol: Kmalloc_node"),
+                ("d.yaml", "symbol: kmalloc_node",
+                 "symbol: " + "kmalloc_node" * 30)]:
+            with open(os.path.join(input_dir, filename), "w") as f:
+                f.write(content.replace(old, new))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            htmlgen = HTMLGenerator(input_dir, tmpdir)
+            htmlgen.generate()
+            assert htmlgen.difference_count == 4
+            pages = [filename for filename in sorted(os.listdir(tmpdir))
+                     if filename.endswith(".html")]
+            pages.remove("index.html")
+            assert len(pages) == 4
+            # The names collide when ignoring case.
+            assert "Kmalloc_node.html" in pages
+            assert len([page for page in pages
+                        if page.startswith("kmalloc_node-")]) == 2
+            assert all(len(page) < 255 for page in pages)
+            with open(os.path.join(tmpdir, "index.html"), "r") as f:
+                index = f.read()
+            for page in pages:
+                assert 'href="{}"'.format(page) in index
+            kabi_page = os.listdir(os.path.join(tmpdir, "kabi"))[0]
+            with open(os.path.join(tmpdir, "kabi", kabi_page), "r") as f:
+                page = f.read()
+            for filename in pages:
+                assert 'href="../{}"'.format(filename) in page
+
+
+def test_generate_reserved_names(test_dir):
+    """Symbols do not get the names of the other pages of the output."""
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as file:
+        content = file.read()
+    with tempfile.TemporaryDirectory() as input_dir:
+        for name in ["index", "Report"]:
+            with open(os.path.join(input_dir, name + ".yaml"), "w") as f:
+                f.write(content.replace("symbol: kmalloc_node",
+                                        "symbol: " + name))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            htmlgen = HTMLGenerator(input_dir, tmpdir, keep_going=True)
+            htmlgen.generate()
+            pages = sorted(filename for filename in os.listdir(tmpdir)
+                           if filename.endswith(".html"))
+            assert len(pages) == 4
+            assert pages[0].startswith("Report-")
+            assert pages[1].startswith("index-")
+            assert pages[2] == "index.html"
+            assert pages[3] == "report.html"
+
+
+def test_generate_size_budget(test_dir):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                                graphical_diff=True, page_size_budget=10)
+        htmlgen.generate()
+        assert [fallback.page for fallback in htmlgen.fallbacks] == \
+            ["kmalloc_node.html"]
+        with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+            page = f.read()
+        assert "diff-table" not in page
+        assert "<pre>" in page
+        with open(os.path.join(tmpdir, "index.html"), "r") as f:
+            assert 'href="report.html"' in f.read()
+        with open(os.path.join(tmpdir, "report.html"), "r") as f:
+            report = f.read()
+        assert "<p>1 diff(s) were rendered as plain text.</p>" in report
+        assert '<a href="kmalloc_node.html">kmalloc_node</a>' in report
+
+
+def test__budgeted_diff_to_html(htmlgen, monkeypatch):
+    """Diffs are rendered as plain text when the deadline passes."""
+    import itertools
+    import time
+    diff = ("*************** inline gfp_t foo(...)\n"
+            "*** 1 ****\n"
+            "! a\n"
+            "--- 1 ----\n"
+            "! b\n")
+    htmlgen.graphical_diff = htmlgen.highlight_syntax = True
+    htmlgen.page_time_budget = 1
+    htmlgen._page_deadline = 0.5
+    clock = itertools.count()
+    monkeypatch.setattr(time, "monotonic", lambda: next(clock))
+    htmlgen._page_diff_to_html(diff, diff_digest(diff))
+    assert htmlgen.doc.getvalue() == \
+        "<pre>" + escape(diff, quote=False) + "</pre>"
+    assert htmlgen._page_fallbacks == ["rendering took more than 1 s"]
+    assert htmlgen.graphical_diff and htmlgen.highlight_syntax
+    assert htmlgen._deadline is None
+
+    # The same diff is not tried again.
+    htmlgen._page_deadline = next(clock) + 100
+    htmlgen._page_diff_to_html(diff, diff_digest(diff))
+    assert len(htmlgen._page_fallbacks) == 2
+
+
+@pytest.mark.parametrize("graphical_diff", [False, True])
+def test__write_budgeted_diff(htmlgen, monkeypatch, graphical_diff):
+    """Streamed diffs are written as plain text when the deadline passes."""
+    import io
+    import itertools
+    import time
+    diff = ("*************** inline gfp_t foo(...)\n"
+            "*** 1 ****\n"
+            "! a\n"
+            "--- 1 ----\n"
+            "! b\n")
+    htmlgen.graphical_diff = graphical_diff
+    htmlgen.highlight_syntax = True
+    htmlgen.page_time_budget = 1
+    htmlgen._page_deadline = 0.5
+    clock = itertools.count()
+    monkeypatch.setattr(time, "monotonic", lambda: next(clock))
+    stream = io.StringIO()
+    htmlgen._write_budgeted_diff(stream, diff)
+    assert stream.getvalue().endswith(
+        "<pre>" + escape(diff, quote=False) + "</pre>")
+    assert ("</table>" in stream.getvalue()) == graphical_diff
+    assert htmlgen._page_fallbacks == ["rendering took more than 1 s"]
+    assert htmlgen._deadline is None
+
+    # The deadline has already passed.
+    stream = io.StringIO()
+    htmlgen._write_budgeted_diff(stream, diff)
+    assert stream.getvalue() == "<pre>" + escape(diff, quote=False) + "</pre>"
+
+
+def test_generate_search_index(test_dir):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        htmlgen = HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                                search_index=True)
+        htmlgen.generate()
+        with open(os.path.join(tmpdir, "index.html"), "r") as f:
+            assert 'href="search.html"' in f.read()
+        with open(os.path.join(tmpdir, "search.html"), "r") as f:
+            page = f.read()
+        assert 'id="search-input"' in page
+        assert 'src="search/documents.js"' in page
+        with open(os.path.join(tmpdir, "search", "documents.js"), "r") as f:
+            assert f.read() == ('diffkempSearch.setDocuments('
+                                '[["kmalloc_node","kmalloc_node.html"]], 1);\n')
+        with open(os.path.join(tmpdir, "search", "shard-0.js"), "r") as f:
+            assert '"GFP_DMA":[0,4]' in f.read()
+
+
+def test_generate_search_index_shards(test_dir, monkeypatch):
+    """Shards of previous runs are removed."""
+    from diffkemp_htmlgen.search import SearchIndex
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(SearchIndex, "shard_postings", 4)
+        HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                      search_index=True).generate()
+        search_dir = os.path.join(tmpdir, "search")
+        assert len(os.listdir(search_dir)) > 2
+        monkeypatch.setattr(SearchIndex, "shard_postings", 16384)
+        HTMLGenerator(os.path.join(test_dir, "differences"), tmpdir,
+                      search_index=True).generate()
+        assert sorted(os.listdir(search_dir)) == ["documents.js",
+                                                  "shard-0.js"]
+
+
+def test_generate_from(test_dir):
+    """Loaded differences are rendered the same as their files."""
+    from diffkemp_htmlgen.output import CallbackWriter, ZipWriter
+    import zipfile
+    input_dir = os.path.join(test_dir, "differences")
+    with open(os.path.join(input_dir, "kmalloc_node.diff.yaml"), "r") as f:
+        content = yaml.safe_load(f)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        HTMLGenerator(input_dir, tmpdir, graphical_diff=True).generate()
+        expected = dict()
+        for root, _, filenames in os.walk(tmpdir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                with open(path, "r") as f:
+                    expected[os.path.relpath(path, tmpdir)] = f.read()
+
+        for item in [content, Difference.from_yaml(content)]:
+            files = dict()
+            htmlgen = HTMLGenerator(
+                "", "", graphical_diff=True,
+                output=CallbackWriter(lambda path, content:
+                                      files.update({path: content})))
+            htmlgen.generate_from(iter([item]))
+            assert files == expected
+
+        archive_path = os.path.join(tmpdir, "output.zip")
+        with ZipWriter(archive_path) as output:
+            HTMLGenerator("", "", graphical_diff=True,
+                          output=output).generate_from([content])
+        with zipfile.ZipFile(archive_path) as archive:
+            assert archive.read("kmalloc_node.html").decode() == \
+                expected["kmalloc_node.html"]
+
+
+def test_generate_from_filter(test_dir):
+    """The differences passed in are not modified by filters."""
+    from diffkemp_htmlgen.filters import SymbolFilter
+    from diffkemp_htmlgen.output import CallbackWriter
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as f:
+        content = yaml.safe_load(f)
+    affection = dict(content["affected-symbols"][0])
+    affection["symbol"] = {"name": "kfree", "kind": "function"}
+    content["affected-symbols"].append(affection)
+    difference = Difference.from_yaml(content)
+    affections = list(difference.affected_symbols)
+    htmlgen = HTMLGenerator(
+        "", "", output=CallbackWriter(lambda *args: None),
+        symbol_filter=SymbolFilter(
+            kabi_symbols=[affections[0].symbol.name]))
+    htmlgen.generate_from([difference])
+    assert htmlgen.external_symbol_count == 1
+    assert difference.affected_symbols == affections
+
+
+def test_generate_from_invalid():
+    from diffkemp_htmlgen.output import CallbackWriter
+    htmlgen = HTMLGenerator("", "", keep_going=True,
+                            output=CallbackWriter(lambda *args: None))
+    htmlgen.generate_from([{"symbol": "foo"}])
+    assert [(failure.filename, failure.phase)
+            for failure in htmlgen.failures] == [("<difference 0>",
+                                                  Failure.Phase.PARSE)]
+    htmlgen.keep_going = False
+    with pytest.raises(KeyError):
+        htmlgen.generate_from([{"symbol": "foo"}])
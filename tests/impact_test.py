@@ -0,0 +1,66 @@
+from diffkemp_htmlgen.htmlgen import *
+from diffkemp_htmlgen.impact import *
+import pytest
+
+
+def make_difference(name, kind, affected):
+    """
+    Creates a difference affecting the given KABI symbols, each with
+    a callstack of the given depth.
+    """
+    location = Location("mm/slab.c", 1)
+    symbol = InternalSymbol(name, kind, location)
+    affections = [Affection(ExternalSymbol(kabi, ExternalSymbol.Kind.FUNCTION),
+                            [Call(name, location)] * depth,
+                            [Call(name, location)] * depth)
+                  for kabi, depth in affected]
+    return Difference(symbol, symbol, "", affections)
+
+
+@pytest.fixture
+def impact():
+    differences = {
+        "kmalloc_node": make_difference(
+            "kmalloc_node", InternalSymbol.Kind.FUNCTION,
+            [("kmalloc", 3), ("kzalloc", 2), ("kmalloc", 1)]),
+        "GFP_DMA": make_difference(
+            "GFP_DMA", InternalSymbol.Kind.MACRO, [("kmalloc", 4)]),
+        "kmem_cache": make_difference(
+            "kmem_cache", InternalSymbol.Kind.TYPE,
+            [("kmem_cache_alloc", 5), ("kzalloc", 5)]),
+        "unused": make_difference("unused", InternalSymbol.Kind.FUNCTION, []),
+    }
+    return ImpactStatistics(differences)
+
+
+def test_fan_out(impact):
+    assert [impact.fan_out[impact.difference_index[name]]
+            for name in ["kmalloc_node", "GFP_DMA", "kmem_cache", "unused"]]\
+        == [2, 1, 2, 0]
+
+
+def test_fan_in(impact):
+    assert [symbol.name for symbol in impact.external_symbols] == [
+        "kmalloc", "kzalloc", "kmem_cache_alloc"]
+    # kmalloc_node affects kmalloc twice, but is counted once.
+    assert list(impact.fan_in) == [2, 2, 1]
+    assert impact.affection_count == 6
+
+
+def test_min_depth(impact):
+    assert list(impact.min_depth) == [1, 2, 5]
+    assert impact.depth(0) == "1"
+
+
+def test_kind_totals(impact):
+    assert impact.internal_kind_totals == {
+        InternalSymbol.Kind.FUNCTION: 2,
+        InternalSymbol.Kind.MACRO: 1,
+        InternalSymbol.Kind.TYPE: 1
+    }
+    assert impact.external_kind_totals[ExternalSymbol.Kind.FUNCTION] == 3
+
+
+def test_most_impacted(impact):
+    assert impact.most_impacted(2) == [0, 1]
+    assert impact.most_impacted(10) == [0, 1, 2]
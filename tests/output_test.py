@@ -0,0 +1,87 @@
+from diffkemp_htmlgen.output import *
+import os
+import pytest
+
+
+def test_write(tmpdir):
+    output = OutputWriter()
+    path = os.path.join(tmpdir, "page.html")
+    assert output.write(path, "content")
+    os.utime(path, ns=(0, 0))
+    assert not output.write(path, "content")
+    assert os.stat(path).st_mtime_ns == 0
+    assert output.write(path, "changed")
+    with open(path, "r") as f:
+        assert f.read() == "changed"
+    assert (output.written, output.skipped) == (2, 1)
+    assert os.listdir(tmpdir) == ["page.html"]
+
+
+def test_remove_others(tmpdir):
+    import re
+    output = OutputWriter()
+    for filename in ["a.1.css", "a.2.css", "b.css"]:
+        output.write(os.path.join(tmpdir, filename), "")
+    output.remove_others(str(tmpdir), re.compile(r"a\.[0-9]\.css"),
+                         ["a.2.css"])
+    assert sorted(os.listdir(tmpdir)) == ["a.2.css", "b.css"]
+    assert output.removed == 1
+
+
+def test_open(tmpdir):
+    output = OutputWriter()
+    path = os.path.join(tmpdir, "page.html")
+    for content in ["content", "content", "changed"]:
+        with output.open(path) as f:
+            f.write(content)
+            # The original file is not touched while it is written.
+            if os.path.exists(path):
+                with open(path, "r") as original:
+                    assert original.read() == "content"
+    with open(path, "r") as f:
+        assert f.read() == "changed"
+    assert (output.written, output.skipped) == (2, 1)
+    assert os.listdir(tmpdir) == ["page.html"]
+
+
+def test_open_exception(tmpdir):
+    output = OutputWriter()
+    path = os.path.join(tmpdir, "page.html")
+    output.write(path, "content")
+    with pytest.raises(RuntimeError):
+        with output.open(path) as f:
+            f.write("partial")
+            raise RuntimeError()
+    with open(path, "r") as f:
+        assert f.read() == "content"
+    assert os.listdir(tmpdir) == ["page.html"]
+
+
+def test_callback_writer():
+    files = dict()
+    output = CallbackWriter(lambda path, content: files.update({path:
+                                                                content}))
+    output.make_directory("kabi")
+    assert output.write("index.html", "index")
+    with output.open(os.path.join("kabi", "page.html")) as f:
+        f.write("page")
+    assert not output.exists("index.html")
+    assert files == {"index.html": "index",
+                     os.path.join("kabi", "page.html"): "page"}
+    assert output.written == 2
+
+
+def test_zip_writer(tmpdir):
+    import zipfile
+    paths = [os.path.join(tmpdir, name) for name in ["a.zip", "b.zip"]]
+    for path in paths:
+        with ZipWriter(path) as output:
+            output.write("index.html", "index")
+            with output.open(os.path.join("kabi", "page.html")) as f:
+                f.write("page")
+    with zipfile.ZipFile(paths[0]) as archive:
+        assert archive.namelist() == ["index.html", "kabi/page.html"]
+        assert archive.read("kabi/page.html") == b"page"
+    # Archives of the same files are identical.
+    with open(paths[0], "rb") as a, open(paths[1], "rb") as b:
+        assert a.read() == b.read()
@@ -0,0 +1,43 @@
+from diffkemp_htmlgen.pages import *
+
+
+def test_add():
+    pages = PageNames()
+    assert pages.add("a", "foo", "foo a.c") == "foo"
+    assert pages.add("b", "foo", "foo b.c") != "foo"
+    assert pages.add("c", "Foo", "Foo c.c").startswith("Foo-")
+    assert pages.add("d", "foo-function", "foo", "kabi/") == "foo-function"
+    assert pages["a"] == "foo.html"
+    assert pages["d"] == "kabi/foo-function.html"
+    assert len(set(pages.pages.values())) == 4
+
+
+def test_add_reserved():
+    pages = PageNames(["index"])
+    assert pages.add("a", "index", "index a.c").startswith("index-")
+    assert pages.add("b", "Index", "Index b.c").startswith("Index-")
+    assert pages.add("c", "index", "index c.c", "kabi/") == "index"
+
+
+def test_add_stable():
+    """Ids depend only on the identities of the symbols."""
+    pages = PageNames()
+    pages.add("a", "foo", "foo a.c")
+    other = PageNames()
+    other.add("x", "foo", "foo x.c")
+    assert pages.add("b", "foo", "foo b.c") == other.add("b", "foo", "foo b.c")
+
+
+def test_add_same_identity():
+    pages = PageNames()
+    names = [pages.add(key, "foo", "foo a.c") for key in range(3)]
+    assert len(set(names)) == 3
+
+
+def test_add_long():
+    pages = PageNames()
+    name = pages.add("a", "x" * 1000, "x")
+    assert len(name.encode()) <= PageNames.max_name_length + \
+        PageNames.id_length + 1
+    assert pages.add("b", "x" * 1000, "y") != name
+    assert len(pages.add("c", "ž" * 1000, "z").encode()) <= 255
@@ -0,0 +1,197 @@
+"""
+Performance regression tests, which check upper bounds of the memory used by
+generate() and of the numbers of expensive operations it performs.
+Run them alone with -m performance or skip them with -m 'not performance'.
+"""
+from diffkemp_htmlgen.htmlgen import HTMLGenerator
+import builtins
+import os
+import pytest
+import tracemalloc
+import yaml
+
+pytestmark = pytest.mark.performance
+
+# Number of differences in the corpus, the diffs of every other one are the
+# same.
+difference_count = 20
+# Number of rows of each diff and of the streamed diff.
+diff_rows = 24
+streamed_diff_rows = 3000
+# Diffs longer than this are streamed in the tests.
+stream_diff_size = 64 * 1024
+
+
+def make_diff(rows, seed):
+    """Generates a context diff with the given number of rows."""
+    lines_left = []
+    lines_right = []
+    for i in range(rows):
+        if i % 3 == 0:
+            lines_left.append("!     x = kmalloc(size_{}, GFP_DMA);".format(
+                seed))
+            lines_right.append("!     x = kmalloc(size_{}, 0);".format(seed))
+        else:
+            lines_left.append("      if (x < SIZE_{} && y > {}) {{".format(
+                seed, i))
+            lines_right.append(lines_left[-1])
+    lines = ["*************** function_{}".format(seed),
+             "*** 1,{} ***".format(rows)]
+    lines += lines_left
+    lines.append("--- 1,{} ---".format(rows))
+    lines += lines_right
+    return "\n".join(lines) + "\n"
+
+
+def make_difference(name, diff):
+    location = {"file": "include/linux/slab.h", "line": 541}
+    call = {"symbol": name, "file": "mm/slab.c", "line": 10}
+    return {"symbol": name, "diff-kind": "function",
+            "location-old": location, "location-new": location, "diff": diff,
+            "affected-symbols": [{"symbol": {"name": "kabi_" + name,
+                                             "kind": "function"},
+                                  "callstack-old": [call],
+                                  "callstack-new": [call]}]}
+
+
+def write_difference(path, difference):
+    """Writes the difference in the format of DiffKemp."""
+    diff = difference.pop("diff")
+    with open(path, "w") as f:
+        yaml.safe_dump(difference, f)
+        # Dumping long diffs is slow, write them as literal blocks.
+        f.write("diff: |\n" + "".join("  " + line + "\n"
+                                      for line in diff.splitlines()))
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("corpus"))
+    for index in range(difference_count):
+        name = "symbol_{}".format(index)
+        write_difference(os.path.join(directory, name + ".yaml"),
+                         make_difference(name, make_diff(
+                             diff_rows, index % 2 * index)))
+    return directory
+
+
+@pytest.fixture(scope="module")
+def streamed_corpus(tmp_path_factory):
+    """A single difference with a diff that is streamed into its page."""
+    directory = str(tmp_path_factory.mktemp("streamed_corpus"))
+    diff = make_diff(streamed_diff_rows, 0)
+    assert len(diff) > stream_diff_size
+    write_difference(os.path.join(directory, "symbol.yaml"),
+                     make_difference("symbol", diff))
+    return directory
+
+
+def distinct_diffs(directory):
+    """Returns the distinct diffs of the differences in the directory."""
+    diffs = set()
+    for filename in os.listdir(directory):
+        with open(os.path.join(directory, filename), "r") as f:
+            diffs.add(yaml.safe_load(f)["diff"])
+    return diffs
+
+
+def peak_memory(function):
+    """
+    Returns the peak memory in bytes allocated by the function. It is called
+    once before measuring, so that modules are imported and caches filled.
+    """
+    function()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("graphical_diff", [False, True])
+def test_streamed_diff_memory(streamed_corpus, tmp_path, graphical_diff):
+    """The memory needed for a page is a small multiple of its diff."""
+    htmlgen = HTMLGenerator(streamed_corpus, str(tmp_path),
+                            graphical_diff=graphical_diff)
+    htmlgen.stream_diff_size = stream_diff_size
+    size = os.path.getsize(os.path.join(streamed_corpus, "symbol.yaml"))
+    assert peak_memory(htmlgen.generate) < 4 * size + 2 * 1024 * 1024
+
+
+def test_generate_memory(corpus, tmp_path):
+    """The memory does not grow with the number of pages."""
+    htmlgen = HTMLGenerator(corpus, str(tmp_path), graphical_diff=True)
+    assert peak_memory(htmlgen.generate) < 2 * 1024 * 1024
+
+
+@pytest.mark.parametrize("graphical_diff", [False, True])
+def test_highlight_calls(corpus, tmp_path, monkeypatch, graphical_diff):
+    """Pygments is invoked at most once for every distinct line of code."""
+    calls = []
+    original = HTMLGenerator._highlight_uncached
+
+    def _highlight_uncached(self, text):
+        calls.append(text)
+        return original(self, text)
+    monkeypatch.setattr(HTMLGenerator, "_highlight_uncached",
+                        _highlight_uncached)
+    htmlgen = HTMLGenerator(corpus, str(tmp_path),
+                            graphical_diff=graphical_diff,
+                            highlight_syntax=True)
+    htmlgen.generate()
+
+    diffs = distinct_diffs(corpus)
+    if graphical_diff:
+        # Line numbers and markers are not highlighted, so the same code is
+        # highlighted once wherever it appears.
+        code = set()
+        for diff in diffs:
+            for line in diff.splitlines():
+                if line.startswith("*************** "):
+                    code.add(line[len("*************** "):])
+                elif not line.startswith(("***", "---")):
+                    code.add(line[2:])
+        assert len(calls) <= len(code)
+    else:
+        # Diffs are highlighted as a whole.
+        assert len(calls) <= len(diffs)
+
+
+def test_writes_per_page(corpus, tmp_path, monkeypatch):
+    """Every output file is written once, and only if it changes."""
+    writes = []
+    original = builtins.open
+
+    def counting_open(file, mode="r", *args, **kwargs):
+        if "w" in mode or "a" in mode:
+            writes.append(file)
+        return original(file, mode, *args, **kwargs)
+    monkeypatch.setattr(builtins, "open", counting_open)
+
+    htmlgen = HTMLGenerator(corpus, str(tmp_path), graphical_diff=True)
+    htmlgen.generate()
+    # Pages of differences and KABI symbols, the index and the stylesheet.
+    assert len(writes) == 2 * difference_count + 2
+    assert htmlgen.output.written == len(writes)
+
+    writes.clear()
+    htmlgen.generate()
+    assert writes == []
+
+
+def test_yaml_loads_per_file(corpus, tmp_path, monkeypatch):
+    """Every input file is parsed at most twice, the diff separately."""
+    import diffkemp_htmlgen.scan
+    loads = []
+    original = diffkemp_htmlgen.scan.safe_load
+
+    def safe_load(content):
+        loads.append(len(content))
+        return original(content)
+    monkeypatch.setattr(diffkemp_htmlgen.scan, "safe_load", safe_load)
+
+    HTMLGenerator(corpus, str(tmp_path)).generate()
+    assert len(loads) <= 2 * difference_count
+    assert sum(loads) <= sum(os.path.getsize(os.path.join(corpus, filename))
+                             for filename in os.listdir(corpus))
@@ -0,0 +1,97 @@
+from diffkemp_htmlgen.htmlgen import Difference, Failure
+from diffkemp_htmlgen.scan import *
+import os
+import pytest
+import yaml
+
+
+@pytest.fixture
+def test_dir(request):
+    return request.fspath.dirname
+
+
+def test_read_header(test_dir):
+    path = os.path.join(test_dir, "differences", "kmalloc_node.diff.yaml")
+    header = read_header(path)
+    with open(path, "r") as f:
+        full = yaml.safe_load(f)
+
+    assert "diff" not in header
+    del full["diff"]
+    assert header == full
+
+
+def test_read_header_diff_last(tmpdir):
+    path = os.path.join(tmpdir, "result.yaml")
+    with open(path, "w") as f:
+        f.write("symbol: kmalloc\ndiff: |\n  *** 1,2 ***\n\n  x: y\n")
+
+    assert read_header(path) == {"symbol": "kmalloc"}
+
+
+def test_read_header_invalid(tmpdir):
+    path = os.path.join(tmpdir, "result.yaml")
+    with open(path, "w") as f:
+        f.write("- kmalloc\n")
+
+    with pytest.raises(ValueError):
+        read_header(path)
+
+
+def test_read_header_no_affections(test_dir):
+    path = os.path.join(test_dir, "differences", "kmalloc_node.diff.yaml")
+    header = read_header(path, affections=False)
+
+    assert header["symbol"] == "kmalloc_node"
+    assert "affected-symbols" not in header
+
+
+def test_read_header_reordered(test_dir, tmpdir):
+    """Files with keys in another order than DiffKemp's are parsed too."""
+    with open(os.path.join(test_dir, "differences",
+                           "kmalloc_node.diff.yaml"), "r") as f:
+        full = yaml.safe_load(f)
+    path = os.path.join(tmpdir, "result.yaml")
+    for order in [["diff", "symbol"], ["symbol", "diff"]]:
+        content = {key: full[key] for key in order}
+        content.update(full)
+        with open(path, "w") as f:
+            yaml.safe_dump(content, f, sort_keys=False)
+        header = read_header(path, affections=False)
+        assert header["symbol"] == "kmalloc_node"
+        assert header["location-new"] == full["location-new"]
+        assert "diff" not in header
+
+
+def test_scan_difference(test_dir):
+    from diffkemp_htmlgen.htmlgen import load_difference
+    path = os.path.join(test_dir, "differences", "kmalloc_node.diff.yaml")
+    scanned = scan_difference(path)
+    loaded = load_difference(path)
+
+    for symbol in ["symbol_old", "symbol_new"]:
+        assert getattr(scanned, symbol).name == getattr(loaded, symbol).name
+        assert getattr(scanned, symbol).kind == getattr(loaded, symbol).kind
+        assert str(getattr(scanned, symbol).location) == \
+            str(getattr(loaded, symbol).location)
+    assert [affection.symbol for affection in scanned.affected_symbols] == \
+        [affection.symbol for affection in loaded.affected_symbols]
+    # The diff is read on access.
+    assert scanned._diff is None
+    assert scanned.diff == loaded.diff
+    assert scanned.diff_size() >= len(loaded.diff)
+
+    scanned.diff = "changed"
+    assert scanned.diff == "changed"
+    assert scanned.diff_digest() == Difference(
+        loaded.symbol_old, loaded.symbol_new, "changed", []).diff_digest()
+
+
+def test_scan_difference_tolerant(tmpdir):
+    path = os.path.join(tmpdir, "result.yaml")
+    with open(path, "w") as f:
+        f.write("symbol: kmalloc\n")
+
+    failure = scan_difference_tolerant(path)
+    assert isinstance(failure, Failure)
+    assert failure.phase == Failure.Phase.PARSE
@@ -0,0 +1,38 @@
+from diffkemp_htmlgen.search import *
+import json
+
+
+def test_add():
+    index = SearchIndex()
+    index.add("foo", "foo.html", "x = GFP_DMA;\nreturn GFP_DMA | GFP_KERNEL;")
+    index.add("bar", "bar.html", "if (flags & GFP_KERNEL)")
+    assert index.documents == [("foo", "foo.html"), ("bar", "bar.html")]
+    assert index.postings["GFP_DMA"].tolist() == [0, 1, 0, 2]
+    assert index.postings["GFP_KERNEL"].tolist() == [0, 2, 1, 1]
+    # Short tokens and keywords are not indexed.
+    assert "x" not in index.postings
+    assert "return" not in index.postings
+    assert index.posting_count == 5
+
+
+def test_shard_of():
+    assert all(shard_of("GFP_DMA", 1) == 0 for _ in range(2))
+    assert 0 <= shard_of("GFP_DMA", 7) < 7
+    assert len({shard_of("token_{}".format(i), 4) for i in range(64)}) == 4
+
+
+def test_write():
+    index = SearchIndex()
+    index.shard_postings = 2
+    index.add("foo", "foo.html", "GFP_DMA GFP_KERNEL\nflags")
+    files = dict()
+    index.write(lambda filename, content: files.update({filename: content}))
+
+    assert index.shard_count() == 1
+    assert sorted(files) == ["documents.js", "shard-0.js"]
+    assert files["documents.js"] == \
+        'diffkempSearch.setDocuments([["foo","foo.html"]], 1);\n'
+    prefix = "diffkempSearch.addShard(0, "
+    assert files["shard-0.js"].startswith(prefix)
+    assert json.loads(files["shard-0.js"][len(prefix):-3]) == {
+        "GFP_DMA": [0, 1], "GFP_KERNEL": [0, 1], "flags": [0, 2]}
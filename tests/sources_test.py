@@ -0,0 +1,151 @@
+from diffkemp_htmlgen.htmlgen import *
+from diffkemp_htmlgen.sources import *
+import os
+import pytest
+import tempfile
+
+
+SLAB_H = """#ifndef _LINUX_SLAB_H
+#define _LINUX_SLAB_H
+
+#define KMALLOC_SHIFT_HIGH(x) \\
+    ((x) + PAGE_SHIFT)
+
+static inline void *kmalloc_node(size_t size, gfp_t flags, int node)
+{
+    if (size) {
+        return NULL;
+    }
+    return __kmalloc_node(size, flags, node);
+}
+
+struct kmem_cache;
+
+struct kmem_cache_cpu {
+    void **freelist;
+};
+
+#endif
+"""
+
+
+@pytest.fixture
+def source_dir():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.makedirs(os.path.join(tmpdir, "include", "linux"))
+        with open(os.path.join(tmpdir, "include", "linux", "slab.h"),
+                  "w") as f:
+            f.write(SLAB_H)
+        open(os.path.join(tmpdir, "empty.h"), "w").close()
+        yield tmpdir
+
+
+@pytest.fixture
+def sources(source_dir):
+    tree = SourceTree(source_dir)
+    yield tree
+    tree.close()
+
+
+def test_source_file_lines(source_dir):
+    file = SourceFile(os.path.join(source_dir, "include", "linux", "slab.h"))
+    assert len(file) == 21
+    assert file.lines(1, 3) == ["#ifndef _LINUX_SLAB_H",
+                                "#define _LINUX_SLAB_H"]
+    assert file.lines(3, 4) == [""]
+    assert file.lines(21, 100) == ["#endif"]
+    assert file.lines(22, 100) == []
+    file.close()
+
+
+def test_source_file_empty(source_dir):
+    file = SourceFile(os.path.join(source_dir, "empty.h"))
+    assert len(file) == 0
+    assert file.lines(1, 2) == []
+    file.close()
+
+
+def test_source_tree_file(sources):
+    file = sources.file("include/linux/slab.h")
+    assert file is not None
+    assert sources.file("include/linux/slab.h") is file
+    assert sources.file("include/linux/mm.h") is None
+
+
+def test_source_tree_excerpt(sources):
+    assert sources.excerpt(Location("include/linux/slab.h", 12), 1) == \
+        (11, ["    }", "    return __kmalloc_node(size, flags, node);",
+              "}"])
+    assert sources.excerpt(Location("include/linux/slab.h", 1), 1) == \
+        (1, ["#ifndef _LINUX_SLAB_H", "#define _LINUX_SLAB_H"])
+    assert sources.excerpt(Location("include/linux/slab.h", 50)) is None
+    assert sources.excerpt(Location("include/linux/mm.h", 1)) is None
+
+
+def test_source_tree_many_files():
+    resource = pytest.importorskip("resource")
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = 256 if hard == resource.RLIM_INFINITY else min(256, hard)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for index in range(limit + 100):
+            with open(os.path.join(tmpdir, "{}.c".format(index)), "w") as f:
+                f.write("int x{};\n".format(index))
+        tree = SourceTree(tmpdir)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+        try:
+            for index in range(limit + 100):
+                assert tree.excerpt(Location("{}.c".format(index), 1)) == \
+                    (1, ["int x{};".format(index)])
+            assert len(tree._files) == SourceTree.max_open_files
+            # Files which were closed are opened again.
+            assert tree.excerpt(Location("0.c", 1)) == (1, ["int x0;"])
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+            tree.close()
+
+
+@pytest.mark.parametrize("name, kind, line, length", [
+    ("kmalloc_node", InternalSymbol.Kind.FUNCTION, 7, 7),
+    ("KMALLOC_SHIFT_HIGH", InternalSymbol.Kind.MACRO, 4, 2),
+    ("kmem_cache", InternalSymbol.Kind.TYPE, 15, 1),
+    ("kmem_cache_cpu", InternalSymbol.Kind.TYPE, 17, 3),
+])
+def test_source_tree_symbol_body(sources, name, kind, line, length):
+    symbol = InternalSymbol(name, kind, Location("include/linux/slab.h",
+                                                 line))
+    start, lines = sources.symbol_body(symbol)
+    assert start == line
+    assert len(lines) == length
+    assert name in lines[0]
+
+
+def test_generate_sources(request):
+    input_dir = os.path.join(request.fspath.dirname, "differences")
+    with tempfile.TemporaryDirectory() as source_dir, \
+            tempfile.TemporaryDirectory() as tmpdir:
+        # Place kmalloc_node and the calls from the test results at the lines
+        # at which they are in the old tree.
+        os.makedirs(os.path.join(source_dir, "include", "linux"))
+        os.makedirs(os.path.join(source_dir, "kernel"))
+        with open(os.path.join(source_dir, "include", "linux", "slab.h"),
+                  "w") as f:
+            f.write("\n" * 540 + "void *kmalloc_node(int node)\n{\n"
+                    "\treturn NULL;\n}\n")
+        with open(os.path.join(source_dir, "kernel", "workqueue.c"),
+                  "w") as f:
+            f.write("\n" * 4093 + "\tinit_rescuer(wq);\n")
+
+        htmlgen = HTMLGenerator(input_dir, tmpdir, old_source_dir=source_dir)
+        htmlgen.generate()
+        assert htmlgen.old_sources is None
+
+        with open(os.path.join(tmpdir, "kmalloc_node.html"), "r") as f:
+            page = f.read()
+        assert "<li>old source: <pre>  541  void *kmalloc_node(" \
+            "int node)\n  542  {\n  543  \treturn NULL;\n  544  }</pre>" in page
+        assert "new source:" not in page
+        assert ("<details><summary>init_rescuer at kernel/workqueue.c:4094"
+                "</summary><pre> 4091  \n 4092  \n 4093  \n 4094  \t"
+                "init_rescuer(wq);</pre></details>") in page
+        # All calls except for the one in slab.h (which is too short).
+        assert page.count("<details>") == 3